@@ -0,0 +1,116 @@
+"""Latency of control commands, from sending a batch to its reply and to the painted frame.
+
+Runs the overlay and the control server on the offscreen Qt platform, a
+client thread sends the batches over the local socket:
+
+    python benchmarks/bench_control.py --output control.json
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import threading
+import time
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+# Before metrics is imported, the frame latency is recorded by the overlay
+os.environ.setdefault("FOCUS_FRAME_LATENCY", "1")
+# Served beside a running instance, whose socket is left alone
+os.environ["FOCUS_FRAME_SOCKET"] = "focus-frame-bench-{}".format(os.getpid())
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from PyQt5.QtWidgets import QApplication
+from PyQt5.QtCore import QT_VERSION_STR, PYQT_VERSION_STR
+import metrics
+from metrics import summarize
+
+# name -> batches sent in turn, so every batch changes the overlay
+BATCHES = {
+    "nudge": [[{"cmd": "nudge", "dx": 8}], [{"cmd": "nudge", "dx": -8}]],
+    "preset": [[{"cmd": "preset", "name": "preset 1"}], [{"cmd": "preset", "name": "preset 0"}]],
+    "batch": [
+        [
+            {"cmd": "block", "x": 300 + dx, "y": 200, "w": 640, "h": 480},
+            {"cmd": "alpha", "value": 120 + dx},
+            {"cmd": "color", "value": color},
+        ]
+        for dx, color in ((0, "#202020"), (10, "#000000"))
+    ],
+    "state": [[{"cmd": "state"}]],
+}
+
+
+def run_client(iterations, results):
+    from control_client import send_commands
+
+    for name, batches in BATCHES.items():
+        samples = []
+        for i in range(iterations):
+            start = time.perf_counter()
+            reply = send_commands(batches[i % len(batches)], timeout=2000)
+            samples.append(time.perf_counter() - start)
+            assert reply and reply["ok"], reply
+            # Give the frame time to be painted before the next batch
+            time.sleep(0.02)
+        results.append({"name": "round_trip_" + name, **summarize(samples)})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--output", help="write the JSON report to this file instead of stdout")
+    args = parser.parse_args()
+
+    app = QApplication(sys.argv)
+    from overlay_manager import OverlayManager
+    from preset_model import PresetModel
+    from collection_file import default_preset
+    from control import ControlServer
+    from autosave import Autosave
+
+    model = PresetModel()
+    manager = OverlayManager(model)
+    screen = manager.primary_geometry()
+    presets = [default_preset("preset {}".format(i), screen) for i in range(2)]
+    presets[1]["x"] = 0
+    model.reset("benchmark", presets)
+    manager.show()
+    # Nothing is journaled without a collection path
+    server = ControlServer(model, manager, Autosave())
+    server.listen()
+    QApplication.processEvents()
+
+    results = []
+    client = threading.Thread(target=run_client, args=(args.iterations, results))
+    client.start()
+    while client.is_alive():
+        app.processEvents()
+        time.sleep(0.0005)
+    server.close()
+    manager.close()
+
+    results.append({"name": "command_to_frame", **summarize(metrics.control_latency.samples)})
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "qt": QT_VERSION_STR,
+            "pyqt": PYQT_VERSION_STR,
+            "platform": platform.platform(),
+            "qpa": app.platformName(),
+            "iterations": args.iterations,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": results,
+    }
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(text)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""Load time and size of preset collections in JSON and in the binary format.
+
+Generates collections of several sizes in a temporary directory and prints
+machine-readable JSON:
+
+    python benchmarks/bench_load.py --output load.json
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from autosave import write_atomic
+from binary_collection import BinaryCollection, BINARY_EXTENSION
+from collection_file import read_collection
+from metrics import summarize
+
+SIZES = [100, 10000, 100000]
+COLORS = ["#000000", "#202020", "#1e1e2e", "#ffffff"]
+
+
+def make_collection(preset_count):
+    presets = []
+    for i in range(preset_count):
+        presets.append(
+            {
+                "preset_name": "preset {}".format(i),
+                "alpha": 100 + i % 150,
+                "xy_abs": i % 2 == 0,
+                "x": 100 + i % 1000,
+                "y": 80 + i % 700,
+                "wh_abs": True,
+                "w": 400 + i % 300,
+                "h": 300 + i % 200,
+                "color": COLORS[i % len(COLORS)],
+            }
+        )
+    return {"preset_collection_name": "benchmark", "presets": presets}
+
+
+def timed(fn, iterations):
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def bench_size(directory, preset_count, iterations):
+    collection = make_collection(preset_count)
+    json_path = os.path.join(directory, "{}.json".format(preset_count))
+    binary_path = os.path.join(directory, "{}{}".format(preset_count, BINARY_EXTENSION))
+    write_atomic(json_path, collection)
+    write_atomic(binary_path, collection)
+
+    def open_binary():
+        with BinaryCollection(binary_path) as binary:
+            binary.name
+
+    def column_binary():
+        with BinaryCollection(binary_path) as binary:
+            binary.column("x")
+
+    params = {
+        "presets": preset_count,
+        "json_bytes": os.path.getsize(json_path),
+        "binary_bytes": os.path.getsize(binary_path),
+    }
+    scenarios = {
+        "load_json": lambda: read_collection(json_path),
+        "load_binary": lambda: read_collection(binary_path),
+        "open_binary": open_binary,
+        "column_binary": column_binary,
+    }
+    return [
+        {"name": name, **params, **summarize(timed(fn, iterations))} for name, fn in scenarios.items()
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=10)
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES)
+    parser.add_argument("--output", help="write the JSON report to this file instead of stdout")
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for preset_count in args.sizes:
+            results += bench_size(directory, preset_count, args.iterations)
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "iterations": args.iterations,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": results,
+    }
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(text)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
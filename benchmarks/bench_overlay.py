@@ -0,0 +1,327 @@
+"""Headless paint and interaction benchmarks for the overlay and settings panel.
+
+Runs on the offscreen QPA platform and prints machine-readable JSON:
+
+    python benchmarks/bench_overlay.py --output bench.json
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from PyQt5.QtWidgets import QApplication
+from PyQt5.QtGui import QColor, QMouseEvent
+from PyQt5.QtCore import Qt, QEvent, QPoint, QPointF, QRect, QT_VERSION_STR, PYQT_VERSION_STR
+from metrics import summarize
+
+RESOLUTIONS = {
+    "1080p": (1920, 1080),
+    "1440p": (2560, 1440),
+    "4k": (3840, 2160),
+    "8k": (7680, 4320),
+}
+COLORS = {
+    "black": QColor(0, 0, 0),
+    "grey": QColor(128, 128, 128),
+}
+ALPHAS = [1, 150, 255]
+# Focus blocks per preset for the drag benchmark with holes
+HOLE_COUNTS = [1, 12, 48]
+# Share of the screen covered by the block for the window topology benchmark
+COVERAGES = [0.25, 0.5, 0.9]
+
+
+def timed(fn, iterations):
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def mouse_event(event_type, pos):
+    return QMouseEvent(event_type, QPointF(pos), Qt.LeftButton, Qt.LeftButton, Qt.NoModifier)
+
+
+def make_window(size):
+    from overlay import OverlayWindow
+
+    window = OverlayWindow()
+    window.setGeometry(0, 0, *size)
+    window.show()
+    window.set_focus_block(QRect(size[0] // 4, size[1] // 4, size[0] // 2, size[1] // 2))
+    QApplication.processEvents()
+    return window
+
+
+def bench_paint(iterations, engines):
+    results = []
+    for res_name, size in RESOLUTIONS.items():
+        window = make_window(size)
+        for engine in engines:
+            window.set_paint_engine(engine)
+            for color_name, color in COLORS.items():
+                for alpha in ALPHAS:
+                    color = QColor(color)
+                    color.setAlpha(alpha)
+                    window.set_overlay_color(color)
+                    params = {
+                        "resolution": res_name,
+                        "engine": engine,
+                        "color": color_name,
+                        "alpha": alpha,
+                    }
+
+                    # Surface rebuilt on every paint, e.g. color changes
+                    def cold():
+                        window.surface = None
+                        window.repaint()
+
+                    # Identical frame, e.g. compositor expose
+                    results.append({"name": "paint_cold", **params, **summarize(timed(cold, iterations))})
+                    results.append(
+                        {"name": "paint_cached", **params, **summarize(timed(window.repaint, iterations))}
+                    )
+        window.close()
+        window.deleteLater()
+    return results
+
+
+def drag_stream(window, start, steps):
+    """Feed a drag through mouseMoveEvent, one coalesced frame per step"""
+    samples = []
+    window.mousePressEvent(mouse_event(QEvent.MouseButtonPress, start))
+    for step in steps:
+        begin = time.perf_counter()
+        window.mouseMoveEvent(mouse_event(QEvent.MouseMove, start + step))
+        window.frame_timer.stop()
+        window.apply_pending_move()
+        # Paints the damage the move posted, not the whole window
+        QApplication.processEvents()
+        samples.append(time.perf_counter() - begin)
+    window.mouseReleaseEvent(mouse_event(QEvent.MouseButtonRelease, start + steps[-1]))
+    return samples
+
+
+def bench_drag(iterations, engines):
+    results = []
+    for res_name, size in RESOLUTIONS.items():
+        window = make_window(size)
+        for engine in engines:
+            window.set_paint_engine(engine)
+            block = window.focus_block
+            move_steps = [QPoint(i % 40 * 4, i % 30 * 3) for i in range(iterations)]
+            resize_steps = [QPoint(i % 40 * 4, i % 30 * 3) for i in range(iterations)]
+            params = {"resolution": res_name, "engine": engine}
+            results.append(
+                {"name": "drag_move", **params, **summarize(drag_stream(window, block.center(), move_steps))}
+            )
+            window.set_focus_block(block)
+            results.append(
+                {
+                    "name": "drag_resize",
+                    **params,
+                    **summarize(drag_stream(window, block.bottomRight(), resize_steps)),
+                }
+            )
+            window.set_focus_block(block)
+        window.close()
+        window.deleteLater()
+    return results
+
+
+def hole_grid(size, count):
+    """count small blocks spread over a screen of size"""
+    columns = 8
+    rows = (count + columns - 1) // columns
+    w, h = size[0] // (columns * 2), size[1] // (rows * 2 + 1)
+    return [
+        QRect((i % columns * 2 + 1) * w - w // 2, (i // columns * 2 + 1) * h, w, h)
+        for i in range(count)
+    ]
+
+
+def bench_holes(iterations, engines):
+    """Dragging one block among many on a 4k screen"""
+    results = []
+    size = RESOLUTIONS["4k"]
+    window = make_window(size)
+    for engine in engines:
+        window.set_paint_engine(engine)
+        for count in HOLE_COUNTS:
+            blocks = hole_grid(size, count)
+            window.set_focus_blocks(blocks)
+            steps = [QPoint(i % 40 * 4, i % 30 * 3) for i in range(iterations)]
+            params = {"resolution": "4k", "engine": engine, "holes": count}
+            results.append(
+                {
+                    "name": "drag_move_holes",
+                    **params,
+                    **summarize(drag_stream(window, blocks[-1].center(), steps)),
+                }
+            )
+    window.close()
+    window.deleteLater()
+    return results
+
+
+def bench_fade(iterations):
+    """Fading the overlay in, repainted or through the window opacity.
+
+    The window opacity case is skipped where the platform ignores it, e.g.
+    offscreen, there it would time nothing.
+    """
+    from overlay import platform_window_opacity
+
+    modes = (False, True) if platform_window_opacity() else (False,)
+    results = []
+    for res_name, size in RESOLUTIONS.items():
+        window = make_window(size)
+        for window_opacity in modes:
+            window.set_window_opacity(window_opacity)
+            QApplication.processEvents()
+            samples = []
+            for i in range(iterations):
+                color = QColor(0, 0, 0, round(150 * (i + 1) / iterations))
+                start = time.perf_counter()
+                window.set_overlay_color(color)
+                # Runs the repaint the change asked for, if any
+                QApplication.processEvents()
+                samples.append(time.perf_counter() - start)
+            params = {"resolution": res_name, "window_opacity": window_opacity}
+            results.append({"name": "fade_step", **params, **summarize(samples)})
+        window.close()
+        window.deleteLater()
+    return results
+
+
+def bench_topology(iterations):
+    """Moving the block with every window topology, on the size of the primary screen.
+
+    blended_pixels is the area of the shown windows, what the compositor
+    blends for each frame.
+    """
+    from strip_overlay import WINDOW_TOPOLOGIES
+
+    results = []
+    screen = QApplication.primaryScreen()
+    size = screen.geometry().size()
+    for name, topology in WINDOW_TOPOLOGIES.items():
+        overlay = topology(screen)
+        overlay.show()
+        windows = overlay.windows if hasattr(overlay, "windows") else lambda: [overlay]
+        for coverage in COVERAGES:
+            scale = coverage ** 0.5
+            block = QRect(0, 0, int(size.width() * scale), int(size.height() * scale))
+            block.moveCenter(QPoint(size.width() // 2, size.height() // 2))
+            overlay.set_focus_block(block)
+            QApplication.processEvents()
+            samples = []
+            for i in range(iterations):
+                start = time.perf_counter()
+                overlay.set_focus_block(block.translated(i % 2 * 8, 0))
+                # Only what the move damaged, as on screen
+                QApplication.processEvents()
+                samples.append(time.perf_counter() - start)
+            blended = sum(window.width() * window.height() for window in windows())
+            params = {"topology": name, "coverage": coverage, "blended_pixels": blended}
+            results.append({"name": "topology_move", **params, **summarize(samples)})
+        overlay.close()
+        overlay.deleteLater()
+    return results
+
+
+def make_panel(preset_count):
+    from overlay_manager import OverlayManager
+    from preset_model import PresetModel
+    from autosave import Autosave
+    from collection_file import default_preset
+    from settings import SettingsPanel
+
+    model = PresetModel()
+    manager = OverlayManager(model)
+    screen = manager.primary_geometry()
+    presets = [default_preset("preset {}".format(i), screen) for i in range(preset_count)]
+    for i, preset in enumerate(presets):
+        preset["x"] += i % 50
+        preset["alpha"] = 100 + i % 100
+        preset["xy_abs"] = i % 2 == 0
+    model.reset("benchmark", presets)
+    manager.show()
+    # Nothing is journaled without a collection path
+    panel = SettingsPanel(manager, model, Autosave())
+    panel.show()
+    QApplication.processEvents()
+    return manager, panel
+
+
+def bench_panel(iterations, preset_count):
+    manager, panel = make_panel(preset_count)
+    window = next(iter(manager.windows.values()))
+    block = window.focus_block
+    results = [
+        {
+            "name": "drag_move_with_panel",
+            **summarize(drag_stream(window, block.center(), [QPoint(i % 40, i % 30) for i in range(iterations)])),
+        }
+    ]
+
+    index = [0]
+
+    def switch():
+        index[0] = (index[0] + 1) % preset_count
+        panel.change_preset(index[0])
+        QApplication.processEvents()
+
+    results.append({"name": "change_preset", "presets": preset_count, **summarize(timed(switch, iterations))})
+    panel.close()
+    manager.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=30)
+    parser.add_argument("--presets", type=int, default=20)
+    parser.add_argument("--engines", nargs="+", default=None)
+    parser.add_argument("--output", help="write the JSON report to this file instead of stdout")
+    args = parser.parse_args()
+
+    app = QApplication(sys.argv)
+    from paint_engines import PAINT_ENGINES
+
+    engines = args.engines or list(PAINT_ENGINES)
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "qt": QT_VERSION_STR,
+            "pyqt": PYQT_VERSION_STR,
+            "platform": platform.platform(),
+            "qpa": app.platformName(),
+            "iterations": args.iterations,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": bench_paint(args.iterations, engines)
+        + bench_drag(args.iterations, engines)
+        + bench_holes(args.iterations, engines)
+        + bench_topology(args.iterations)
+        + bench_fade(args.iterations)
+        + bench_panel(args.iterations, args.presets),
+    }
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(text)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
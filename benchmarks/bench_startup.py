@@ -0,0 +1,120 @@
+"""Startup time and resident memory of the full UI and the overlay-only mode.
+
+Starts the app on the offscreen Qt platform with --startup-profile, once per
+run and mode, and reads the profile it prints once started:
+
+    python benchmarks/bench_startup.py --output startup.json
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+MAIN = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src", "main.py")
+sys.path.insert(0, os.path.dirname(MAIN))
+
+from metrics import summarize
+
+MODES = {
+    "full": [],
+    "overlay_only": ["--overlay-only"],
+}
+# Seconds to wait for a started app to print its profile
+STARTUP_TIMEOUT = 20
+
+
+def write_collection(directory, preset_count):
+    from collection_file import default_preset
+
+    path = os.path.join(directory, "startup.json")
+    presets = [default_preset("preset {}".format(i)) for i in range(preset_count)]
+    with open(path, "w") as file:
+        json.dump({"preset_collection_name": "startup", "presets": presets}, file)
+    return path
+
+
+def run_once(mode_args, collection, directory):
+    """(phase -> ms, resident MB) of one start"""
+    env = dict(
+        os.environ,
+        QT_QPA_PLATFORM=os.environ.get("QT_QPA_PLATFORM", "offscreen"),
+        # The settings of the user are left alone
+        XDG_CONFIG_HOME=directory,
+        # And so is a running instance, which would take the launch over
+        FOCUS_FRAME_SOCKET="focus-frame-bench-{}".format(os.getpid()),
+    )
+    process = subprocess.Popen(
+        [sys.executable, MAIN, "--startup-profile", "--collection", collection, *mode_args],
+        stderr=subprocess.PIPE,
+        stdout=subprocess.DEVNULL,
+        env=env,
+        text=True,
+    )
+    phases = {}
+    rss = None
+    deadline = time.time() + STARTUP_TIMEOUT
+    try:
+        for line in process.stderr:
+            line = line.rstrip()
+            name, _, value = line[:-3].rpartition(" ")
+            if line.endswith(" ms"):
+                phases[name.strip()] = float(value)
+            elif line.endswith(" MB"):
+                rss = float(value)
+                break
+            if time.time() > deadline:
+                break
+    finally:
+        process.terminate()
+        process.wait()
+    return phases, rss
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--presets", type=int, default=20)
+    parser.add_argument("--output", help="write the JSON report to this file instead of stdout")
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        collection = write_collection(directory, args.presets)
+        for mode, mode_args in MODES.items():
+            totals = []
+            rss = []
+            for _ in range(args.runs):
+                phases, resident = run_once(mode_args, collection, directory)
+                totals.append(phases.get("total", 0) / 1000)
+                if resident is not None:
+                    rss.append(resident)
+            result = {"name": "startup", "mode": mode, **summarize(totals)}
+            if rss:
+                result["resident_mb"] = sum(rss) / len(rss)
+            results.append(result)
+
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "runs": args.runs,
+            "presets": args.presets,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": results,
+    }
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(text)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
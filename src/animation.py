@@ -0,0 +1,123 @@
+import time
+from PyQt5.QtWidgets import QApplication
+from PyQt5.QtGui import QColor
+from PyQt5.QtCore import Qt, QObject, QRect, QTimer
+from metrics import stats
+
+
+def lerp(start, end, t):
+    return start + (end - start) * t
+
+
+def lerp_rect(start: QRect, end: QRect, t):
+    return QRect(
+        round(lerp(start.x(), end.x(), t)),
+        round(lerp(start.y(), end.y(), t)),
+        round(lerp(start.width(), end.width(), t)),
+        round(lerp(start.height(), end.height(), t)),
+    )
+
+
+def lerp_rects(start, end, t):
+    """Blocks that are not in start appear where they end"""
+    return [
+        lerp_rect(start[idx], rect, t) if idx < len(start) else QRect(rect)
+        for idx, rect in enumerate(end)
+    ]
+
+
+def lerp_color(start: QColor, end: QColor, t):
+    return QColor(
+        round(lerp(start.red(), end.red(), t)),
+        round(lerp(start.green(), end.green(), t)),
+        round(lerp(start.blue(), end.blue(), t)),
+        round(lerp(start.alpha(), end.alpha(), t)),
+    )
+
+
+class TransitionAnimator(QObject):
+    """Tweens the overlay blocks and color on one refresh-aligned clock.
+
+    Every tick shows the state for the current time, so a late tick skips
+    frames instead of queueing them. Skipped frames are counted.
+    """
+
+    def __init__(self, overlay_manager, duration=0.2):
+        super().__init__()
+        self.overlay_manager = overlay_manager
+        self.duration = duration
+        self.enabled = False
+
+        refresh_rate = QApplication.primaryScreen().refreshRate() or 60
+        self.frame_interval = 1 / refresh_rate
+        self.timer = QTimer(self)
+        self.timer.setTimerType(Qt.PreciseTimer)
+        self.timer.setInterval(max(1, int(self.frame_interval * 1000)))
+        self.timer.timeout.connect(self.tick)
+
+        self.start_rects = self.end_rects = None
+        self.start_color = self.end_color = None
+        self.on_finished = None
+        self.start_time = self.last_tick = 0
+
+        self.frames = 0
+        self.dropped_frames = 0
+
+    def is_active(self):
+        return self.timer.isActive()
+
+    def is_animating_to(self, rects=None, color=None):
+        if not self.is_active():
+            return False
+        if rects is not None:
+            return rects == self.end_rects
+        return color is not None and color.rgba() == self.end_color.rgba()
+
+    def animate_to(self, rects=None, color=None, on_finished=None):
+        """Start from what is shown now, a running transition is retargeted"""
+        self.start_rects = list(self.overlay_manager.focus_blocks)
+        self.end_rects = list(rects) if rects is not None else self.start_rects
+        self.start_color = QColor(self.overlay_manager.overlay_color)
+        self.end_color = QColor(color) if color is not None else self.start_color
+        self.on_finished = on_finished
+        self.start_time = self.last_tick = time.perf_counter()
+        if not self.timer.isActive():
+            self.timer.start()
+
+    def retarget(self, rects):
+        """Change where a running transition ends without restarting it"""
+        self.end_rects = list(rects)
+
+    def tick(self):
+        now = time.perf_counter()
+        missed = int((now - self.last_tick) / self.frame_interval) - 1
+        if missed > 0:
+            self.dropped_frames += missed
+            stats.count("animation_dropped_frames", missed)
+        self.last_tick = now
+        self.frames += 1
+        stats.count("animation_frames")
+
+        progress = min(1.0, (now - self.start_time) / self.duration)
+        # Smoothstep easing
+        t = progress * progress * (3 - 2 * progress)
+        self.overlay_manager.set_focus_blocks(lerp_rects(self.start_rects, self.end_rects, t))
+        self.overlay_manager.set_overlay_color(lerp_color(self.start_color, self.end_color, t))
+        if progress >= 1.0:
+            self.timer.stop()
+            self.finish_callback()
+
+    def finish(self):
+        """Jump to the end of a running transition"""
+        if not self.is_active():
+            return
+        self.timer.stop()
+        self.overlay_manager.set_focus_blocks(self.end_rects)
+        self.overlay_manager.set_overlay_color(self.end_color)
+        self.finish_callback()
+
+    def finish_callback(self):
+        on_finished = self.on_finished
+        self.on_finished = None
+        if on_finished:
+            on_finished()
@@ -0,0 +1,247 @@
+import copy
+import json
+import os
+import queue
+import tempfile
+import threading
+from PyQt5.QtCore import QObject, pyqtSignal
+from metrics import stats
+from binary_collection import encode_collection, is_binary_path
+from validator import SCHEMA_VERSION
+
+JOURNAL_SUFFIX = ".journal"
+
+
+def journal_path(path):
+    return path + JOURNAL_SUFFIX
+
+
+def file_stamp(path):
+    """Identifies the version of the main file a journal was started on"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+def write_atomic(path, collection):
+    """Write the collection next to path and rename it over path, in the format of its extension"""
+    if is_binary_path(path):
+        data = encode_collection(collection)
+    else:
+        data = json.dumps(collection, indent=4).encode("utf-8")
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=".", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as file:
+            file.write(data)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def apply_entry(collection, entry):
+    """Apply one journal entry to a collection dict"""
+    op = entry["op"]
+    presets = collection["presets"]
+    if op == "set":
+        presets[entry["idx"]].update(entry["fields"])
+    elif op == "insert":
+        presets.insert(entry["idx"], entry["preset"])
+    elif op == "remove":
+        del presets[entry["idx"]]
+    elif op == "name":
+        collection["preset_collection_name"] = entry["name"]
+
+
+def replay_journal(collection, path):
+    """Apply the edits journaled for path, returns the number of entries applied"""
+    try:
+        with open(journal_path(path), "r") as file:
+            lines = file.read().splitlines()
+    except OSError:
+        return 0
+    if not lines:
+        return 0
+
+    try:
+        header = json.loads(lines[0])
+    except ValueError:
+        return 0
+    # Journal of another version of the file
+    if header.get("op") != "base" or header.get("stamp") != file_stamp(path):
+        return 0
+
+    applied = 0
+    for line in lines[1:]:
+        try:
+            apply_entry(collection, json.loads(line))
+        except (ValueError, KeyError, IndexError):
+            # Torn last line of a crash
+            break
+        applied += 1
+    return applied
+
+
+class Autosave(QObject):
+    """Journals every model edit and compacts the journal into the collection file.
+
+    All file access happens on a worker thread. Edits are appended to
+    `<path>.journal` as they come, after `quiet_period` seconds without
+    edits the collection is written with an atomic rename and the journal
+    starts over. A crash loses at most the edits not yet appended.
+    """
+
+    saved = pyqtSignal(str)
+    failed = pyqtSignal(str, str)
+    # Active collection path, "" when none, emitted on the GUI thread
+    opened = pyqtSignal(str)
+    # Every file write with the stamp it left, so our own writes can be told apart
+    written = pyqtSignal(str, object)
+
+    def __init__(self, quiet_period=2.0):
+        super().__init__()
+        self.quiet_period = quiet_period
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(target=self.run, name="autosave", daemon=True)
+        self.thread.start()
+
+    # GUI thread
+
+    def open(self, path, collection):
+        """Start journaling edits of the collection stored at path, None stops.
+
+        collection is a collection dict or a (name, PresetTable) pair, the
+        worker turns the table into presets, so loading does not wait for it.
+        """
+        if path and isinstance(collection, tuple):
+            collection = (collection[0], collection[1].copy())
+        else:
+            collection = copy.deepcopy(collection) if path else None
+        self.queue.put(("open", path, collection))
+        self.opened.emit(path or "")
+
+    def rebase(self, path, collection):
+        """The file at path was changed elsewhere, take collection as its content.
+
+        Edits not written yet are dropped instead of being written over it.
+        """
+        self.queue.put(("rebase", path, copy.deepcopy(collection)))
+
+    def record(self, entry):
+        self.queue.put(("entry", entry))
+
+    def write(self, path, collection):
+        """Write a copy of the collection to path, e.g. save and export"""
+        self.queue.put(("write", path, copy.deepcopy(collection)))
+
+    def close(self):
+        """Compact what is pending and stop the worker"""
+        self.queue.put(("stop",))
+        self.thread.join()
+
+    # Worker thread
+
+    def run(self):
+        self.path = None
+        self.collection = None
+        self.journal = None
+        dirty = False
+        while True:
+            try:
+                item = self.queue.get(timeout=self.quiet_period if dirty else None)
+            except queue.Empty:
+                self.compact()
+                dirty = False
+                continue
+
+            kind = item[0]
+            if kind == "entry":
+                if self.path:
+                    try:
+                        apply_entry(self.collection, item[1])
+                    except (KeyError, IndexError) as e:
+                        # Out of sync with the model, stop rather than write garbage
+                        self.failed.emit(self.path, "autosave stopped: {!r}".format(e))
+                        self.close_journal()
+                        self.path = None
+                        dirty = False
+                        continue
+                    self.append(item[1])
+                    dirty = True
+            elif kind == "open":
+                if dirty:
+                    self.compact()
+                    dirty = False
+                self.close_journal()
+                self.path, self.collection = item[1], item[2]
+                if isinstance(self.collection, tuple):
+                    name, table = self.collection
+                    self.collection = {
+                        "schema_version": SCHEMA_VERSION,
+                        "preset_collection_name": name,
+                        "presets": table.to_dicts(),
+                    }
+            elif kind == "rebase":
+                if item[1] == self.path:
+                    self.close_journal()
+                    try:
+                        os.remove(journal_path(self.path))
+                    except OSError:
+                        pass
+                    self.collection = item[2]
+                    dirty = False
+            elif kind == "write":
+                if item[1] == self.path:
+                    self.compact(report=True)
+                    dirty = False
+                else:
+                    self.write_file(item[1], item[2])
+            elif kind == "stop":
+                if dirty:
+                    self.compact()
+                self.close_journal()
+                return
+
+    def append(self, entry):
+        try:
+            if self.journal is None:
+                self.journal = open(journal_path(self.path), "w")
+                self.journal.write(json.dumps({"op": "base", "stamp": file_stamp(self.path)}) + "\n")
+            self.journal.write(json.dumps(entry, separators=(",", ":")) + "\n")
+            self.journal.flush()
+        except OSError as e:
+            self.failed.emit(self.path, str(e))
+
+    def compact(self, report=False):
+        if not self.path:
+            return
+        if self.write_file(self.path, self.collection, report):
+            # The collection file has everything, start a new journal on next edit
+            self.close_journal()
+            try:
+                os.remove(journal_path(self.path))
+            except OSError:
+                pass
+
+    def write_file(self, path, collection, report=True):
+        try:
+            with stats.timer("preset_save"):
+                write_atomic(path, collection)
+        except (OSError, ValueError) as e:
+            self.failed.emit(path, str(e))
+            return False
+        self.written.emit(path, file_stamp(path))
+        if report:
+            self.saved.emit(path)
+        return True
+
+    def close_journal(self):
+        if self.journal is not None:
+            self.journal.close()
+            self.journal = None
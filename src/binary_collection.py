@@ -0,0 +1,384 @@
+import mmap
+import struct
+import sys
+import zlib
+from array import array
+from itertools import compress
+from validator import (
+    COLLECTION_FIELDS,
+    PRESET_FIELDS,
+    OPTIONAL_PRESET_FIELDS,
+    HOLE_FIELDS,
+    SCHEMA_VERSION,
+)
+from preset_table import PresetTable, NUMBER_FIELDS, XY_ABS, WH_ABS, INT_FLAGS, hole_dicts
+
+BINARY_EXTENSION = ".ffpc"
+MAGIC = b"FFPC"
+FORMAT_VERSION = 2
+
+# magic, format version, schema version, crc32 of everything after the header,
+# preset count, string count, string index of the collection name, column types
+HEADER = struct.Struct("<4sHHIIII8s")
+
+# Presets are stored column by column, little endian:
+#   one column of 8 byte numbers per NUMBER_FIELDS, see column types
+#   name and color string indices, uint32
+#   flags, one byte
+#   hole count, uint32 (since format version 2)
+#   x, y, w, h of every hole as 8 byte floats, preset by preset (since 2)
+#   int flags of every hole, one byte, bit i for HOLE_FIELDS[i] (since 2)
+#   string offsets, uint32, string count + 1
+#   utf-8 string blob
+# The flags are those of PresetTable
+INT_COLUMN = b"q"
+FLOAT_COLUMN = b"d"
+# Floats and ints, read back using the int flags
+MIXED_COLUMN = b"m"
+
+
+class BinaryFormatError(ValueError):
+    """Not a binary preset collection, or a damaged one"""
+
+
+def is_binary_path(path):
+    return path.lower().endswith(BINARY_EXTENSION)
+
+
+def little_endian(values):
+    if sys.byteorder != "little":
+        values.byteswap()
+    return values
+
+
+def encode_collection(collection):
+    """Bytes of a valid collection dict, names and colors are stored once"""
+    presets = collection["presets"]
+    strings = []
+    string_index = {}
+
+    def intern(text):
+        idx = string_index.get(text)
+        if idx is None:
+            idx = string_index[text] = len(strings)
+            strings.append(text.encode("utf-8"))
+        return idx
+
+    name_idx = intern(collection["preset_collection_name"])
+    extra = collection.keys() - COLLECTION_FIELDS
+    if extra:
+        raise BinaryFormatError(
+            "the collection has fields the binary format cannot hold: {}".format(
+                ", ".join(sorted(extra))
+            )
+        )
+    for preset in presets:
+        extra = preset.keys() - PRESET_FIELDS.keys() - OPTIONAL_PRESET_FIELDS.keys()
+        if extra:
+            raise BinaryFormatError(
+                "preset {!r} has fields the binary format cannot hold: {}".format(
+                    preset["preset_name"], ", ".join(sorted(extra))
+                )
+            )
+
+    flags = array(
+        "B", ((XY_ABS if p["xy_abs"] else 0) | (WH_ABS if p["wh_abs"] else 0) for p in presets)
+    )
+    column_types = b""
+    sections = []
+    for key in NUMBER_FIELDS:
+        values = [preset[key] for preset in presets]
+        int_rows = [type(value) is int for value in values]
+        if all(int_rows):
+            column_types += INT_COLUMN
+            sections.append(array("q", values))
+        else:
+            column_types += MIXED_COLUMN if any(int_rows) else FLOAT_COLUMN
+            sections.append(array("d", values))
+            if any(int_rows):
+                for row, is_int in enumerate(int_rows):
+                    if is_int:
+                        flags[row] |= INT_FLAGS[key]
+    sections.append(array("I", (intern(preset["preset_name"]) for preset in presets)))
+    sections.append(array("I", (intern(preset["color"]) for preset in presets)))
+    sections.append(flags)
+
+    holes = [preset.get("holes", ()) for preset in presets]
+    sections.append(array("I", map(len, holes)))
+    sections.append(
+        array("d", (hole[key] for row in holes for hole in row for key in HOLE_FIELDS))
+    )
+    sections.append(
+        array(
+            "B",
+            (
+                sum(1 << i for i, key in enumerate(HOLE_FIELDS) if type(hole[key]) is int)
+                for row in holes
+                for hole in row
+            ),
+        )
+    )
+
+    offsets = array("I", [0])
+    for text in strings:
+        offsets.append(offsets[-1] + len(text))
+    sections.append(offsets)
+
+    payload = b"".join(little_endian(section).tobytes() for section in sections) + b"".join(strings)
+    header = HEADER.pack(
+        MAGIC,
+        FORMAT_VERSION,
+        collection.get("schema_version", SCHEMA_VERSION),
+        zlib.crc32(payload),
+        len(presets),
+        len(strings),
+        name_idx,
+        column_types,
+    )
+    return header + payload
+
+
+class BinaryCollection:
+    """Memory mapped binary collection.
+
+    Only the header is decoded when opening, besides the checksum, columns
+    and strings are read when asked for. Columns come back as arrays, so
+    nothing is built per preset unless to_collection is called.
+    """
+
+    def __init__(self, path):
+        with open(path, "rb") as file:
+            try:
+                self.buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                # Empty file
+                self.buffer = b""
+        try:
+            self.read_header()
+        except BinaryFormatError:
+            self.close()
+            raise
+        self.string_table = None
+
+    def read_header(self):
+        if len(self.buffer) < HEADER.size:
+            raise BinaryFormatError("file is too short for a binary preset collection")
+        (
+            magic,
+            version,
+            self.schema_version,
+            crc,
+            self.preset_count,
+            self.string_count,
+            self.name_idx,
+            column_types,
+        ) = HEADER.unpack_from(self.buffer)
+        if magic != MAGIC:
+            raise BinaryFormatError("not a binary preset collection")
+        if version > FORMAT_VERSION:
+            raise BinaryFormatError(
+                "format version {} is newer than the supported {}".format(version, FORMAT_VERSION)
+            )
+
+        count = self.preset_count
+        self.column_types = {}
+        self.offsets = {}
+        position = HEADER.size
+        for key, column_type in zip(NUMBER_FIELDS, column_types):
+            column_type = bytes([column_type])
+            if column_type not in (INT_COLUMN, FLOAT_COLUMN, MIXED_COLUMN):
+                raise BinaryFormatError("unknown type of column {}".format(key))
+            self.column_types[key] = column_type
+            self.offsets[key] = position
+            position += count * 8
+        for key, size in (("name", 4), ("color", 4), ("flags", 1)):
+            self.offsets[key] = position
+            position += count * size
+        self.hole_count = 0
+        if version >= 2:
+            self.offsets["hole_counts"] = position
+            position += count * 4
+            if len(self.buffer) < position:
+                raise BinaryFormatError("file is truncated")
+            self.hole_count = sum(self.array_at("I", self.offsets["hole_counts"], count))
+            self.offsets["hole_values"] = position
+            position += self.hole_count * len(HOLE_FIELDS) * 8
+            self.offsets["hole_flags"] = position
+            position += self.hole_count
+        self.offsets["strings"] = position
+        self.blob_start = position + (self.string_count + 1) * 4
+        if len(self.buffer) < self.blob_start or self.name_idx >= self.string_count:
+            raise BinaryFormatError("file is truncated")
+        if zlib.crc32(memoryview(self.buffer)[HEADER.size :]) != crc:
+            raise BinaryFormatError("checksum mismatch, the file is damaged")
+
+    def __len__(self):
+        return self.preset_count
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if isinstance(self.buffer, mmap.mmap):
+            self.buffer.close()
+
+    def array_at(self, typecode, offset, count):
+        values = array(typecode)
+        values.frombytes(self.buffer[offset : offset + count * values.itemsize])
+        return little_endian(values)
+
+    def strings(self):
+        if self.string_table is None:
+            offsets = self.array_at("I", self.offsets["strings"], self.string_count + 1)
+            blob = self.buffer[self.blob_start :]
+            if offsets[-1] > len(blob) or any(a > b for a, b in zip(offsets, offsets[1:])):
+                raise BinaryFormatError("file is truncated")
+            spans = map(slice, offsets, offsets[1:])
+            if blob.isascii():
+                # Byte offsets are character offsets, decoded once
+                self.string_table = list(map(blob.decode("ascii").__getitem__, spans))
+            else:
+                self.string_table = [str(blob[span], "utf-8") for span in spans]
+        return self.string_table
+
+    def string(self, idx):
+        if self.string_table is not None:
+            return self.string_table[idx]
+        start, end = self.array_at("I", self.offsets["strings"] + idx * 4, 2)
+        if not start <= end <= len(self.buffer) - self.blob_start:
+            raise BinaryFormatError("file is truncated")
+        return str(self.buffer[self.blob_start + start : self.blob_start + end], "utf-8")
+
+    @property
+    def name(self):
+        return self.string(self.name_idx)
+
+    def column(self, key):
+        """Array of one field of every preset in file order, numbers as stored"""
+        if key in self.column_types:
+            typecode = "q" if self.column_types[key] == INT_COLUMN else "d"
+            return self.array_at(typecode, self.offsets[key], self.preset_count)
+        if key == "flags":
+            return self.array_at("B", self.offsets["flags"], self.preset_count)
+        indices = self.array_at("I", self.offsets[key], self.preset_count)
+        if indices and max(indices) >= self.string_count:
+            raise BinaryFormatError("string index out of range in column {}".format(key))
+        return indices
+
+    def holes(self):
+        """Holes of every preset as (x, y, w, h) tuples, empty ones for version 1 files"""
+        if not self.hole_count:
+            return [()] * self.preset_count
+        width = len(HOLE_FIELDS)
+        counts = self.array_at("I", self.offsets["hole_counts"], self.preset_count)
+        values = self.array_at("d", self.offsets["hole_values"], self.hole_count * width).tolist()
+        int_flags = self.array_at("B", self.offsets["hole_flags"], self.hole_count)
+        holes = []
+        for hole, flags in enumerate(int_flags):
+            numbers = values[hole * width : (hole + 1) * width]
+            holes.append(
+                tuple(int(value) if flags & 1 << i else value for i, value in enumerate(numbers))
+            )
+        # Most presets have none, only the rows with holes are visited
+        rows = [()] * self.preset_count
+        start = 0
+        for row in compress(range(self.preset_count), counts):
+            rows[row] = tuple(holes[start : start + counts[row]])
+            start += counts[row]
+        return rows
+
+    def names(self):
+        return list(map(self.strings().__getitem__, self.column("name")))
+
+    def to_table(self):
+        """PresetTable built from the columns, without a record per preset"""
+        table = PresetTable()
+        table.names = self.names()
+        # The int flags of whole int columns, set on every row in one translate
+        int_flags = 0
+        for key, flag in INT_FLAGS.items():
+            column = self.column(key)
+            if self.column_types[key] == INT_COLUMN:
+                column = array("d", column.tolist())
+                int_flags |= flag
+            table.numbers[key] = column
+        flags = self.column("flags")
+        if int_flags:
+            flags = array("B", flags.tobytes().translate(bytes(b | int_flags for b in range(256))))
+        table.flags = flags
+        # Few distinct colors, each string index is interned once
+        strings = self.strings()
+        colors = self.column("color")
+        color_idx = {idx: table.intern_color(strings[idx]) for idx in set(colors)}
+        table.color_idx = array("I", map(color_idx.__getitem__, colors))
+        table.holes = self.holes()
+        # The format has no fields outside the schema
+        table.extra = [None] * len(table.names)
+        return table
+
+    def values(self, key, flags):
+        """Numbers of a column with the type they had when written"""
+        column = self.column(key)
+        if self.column_types[key] != MIXED_COLUMN:
+            return column.tolist()
+        flag = INT_FLAGS[key]
+        return [
+            int(value) if row_flags & flag else value for value, row_flags in zip(column, flags)
+        ]
+
+    def to_collection(self):
+        """The collection as it would be read from JSON"""
+        strings = self.strings()
+        flags = self.column("flags")
+        presets = [
+            {
+                "preset_name": strings[name],
+                "alpha": alpha,
+                "xy_abs": bool(row_flags & XY_ABS),
+                "x": x,
+                "y": y,
+                "wh_abs": bool(row_flags & WH_ABS),
+                "w": w,
+                "h": h,
+                "color": strings[color],
+            }
+            for name, alpha, row_flags, x, y, w, h, color in zip(
+                self.column("name"),
+                self.values("alpha", flags),
+                flags,
+                self.values("x", flags),
+                self.values("y", flags),
+                self.values("w", flags),
+                self.values("h", flags),
+                self.column("color"),
+            )
+        ]
+        if self.hole_count:
+            for preset, holes in zip(presets, self.holes()):
+                if holes:
+                    preset["holes"] = hole_dicts(holes)
+        return {
+            "schema_version": self.schema_version,
+            "preset_collection_name": self.name,
+            "presets": presets,
+        }
+
+
+def read_binary(path):
+    with BinaryCollection(path) as collection:
+        return collection.to_collection()
+
+
+def read_binary_table(path):
+    """Name and PresetTable of the collection at path, without a dict per preset.
+
+    None when the collection is not of the current schema version, older ones
+    have to be migrated and newer ones rejected as dicts.
+    """
+    with BinaryCollection(path) as collection:
+        if collection.schema_version != SCHEMA_VERSION:
+            return None
+        return collection.name, collection.to_table()
@@ -0,0 +1,97 @@
+import json
+import os
+import sqlite3
+from validator import migrate_collection, is_well_formed
+from binary_collection import BINARY_EXTENSION, BinaryCollection, is_binary_path
+
+CATALOG_FILE = "catalog.sqlite3"
+COLLECTION_EXTENSIONS = (".json", BINARY_EXTENSION)
+
+
+class CollectionCatalog:
+    """SQLite index of the preset collection files of directories.
+
+    Only the collection name and preset count are kept per file. A file is
+    parsed again only when its mtime or size changed, presets are read when
+    a collection is opened.
+    """
+
+    def __init__(self, db_path):
+        self.db = sqlite3.connect(db_path)
+        self.db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS collections (
+                path TEXT PRIMARY KEY,
+                directory TEXT NOT NULL,
+                name TEXT,
+                preset_count INTEGER,
+                mtime_ns INTEGER NOT NULL,
+                size INTEGER NOT NULL,
+                valid INTEGER NOT NULL
+            )
+            """
+        )
+        self.db.execute(
+            "CREATE INDEX IF NOT EXISTS collections_directory ON collections (directory)"
+        )
+        self.db.commit()
+
+    def refresh(self, directory):
+        """Bring the index of directory up to date, returns the number of files parsed"""
+        directory = os.path.abspath(directory)
+        indexed = {
+            path: (mtime_ns, size)
+            for path, mtime_ns, size in self.db.execute(
+                "SELECT path, mtime_ns, size FROM collections WHERE directory = ?", (directory,)
+            )
+        }
+
+        parsed = 0
+        seen = set()
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if not entry.name.endswith(COLLECTION_EXTENSIONS) or not entry.is_file():
+                    continue
+                stat = entry.stat()
+                seen.add(entry.path)
+                if indexed.get(entry.path) == (stat.st_mtime_ns, stat.st_size):
+                    continue
+                name, count, valid = self.read_summary(entry.path)
+                parsed += 1
+                self.db.execute(
+                    "INSERT OR REPLACE INTO collections VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (entry.path, directory, name, count, stat.st_mtime_ns, stat.st_size, valid),
+                )
+
+        removed = [(path,) for path in indexed if path not in seen]
+        self.db.executemany("DELETE FROM collections WHERE path = ?", removed)
+        self.db.commit()
+        return parsed
+
+    def read_summary(self, path):
+        if is_binary_path(path):
+            # Name and count are in the header, the records are not looked at
+            try:
+                with BinaryCollection(path) as collection:
+                    return collection.name, len(collection), True
+            except (OSError, ValueError):
+                return None, 0, False
+        try:
+            with open(path, "r") as file:
+                data = migrate_collection(json.load(file))
+        except (OSError, ValueError):
+            return None, 0, False
+        if not is_well_formed(data):
+            return None, 0, False
+        return data["preset_collection_name"], len(data["presets"]), True
+
+    def collections(self, directory):
+        """(path, name, preset_count, mtime_ns) of the valid collections of directory"""
+        return self.db.execute(
+            "SELECT path, name, preset_count, mtime_ns FROM collections "
+            "WHERE directory = ? AND valid ORDER BY name COLLATE NOCASE",
+            (os.path.abspath(directory),),
+        ).fetchall()
+
+    def close(self):
+        self.db.close()
@@ -0,0 +1,106 @@
+import os
+import time
+from PyQt5.QtWidgets import (
+    QDialog,
+    QVBoxLayout,
+    QHBoxLayout,
+    QLabel,
+    QPushButton,
+    QTableWidget,
+    QTableWidgetItem,
+    QAbstractItemView,
+    QHeaderView,
+    QDialogButtonBox,
+    QFileDialog,
+)
+from PyQt5.QtCore import Qt, QSettings, QStandardPaths
+from catalog import CollectionCatalog, CATALOG_FILE
+
+
+def catalog_path():
+    directory = QStandardPaths.writableLocation(QStandardPaths.AppDataLocation)
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, CATALOG_FILE)
+
+
+class CatalogDialog(QDialog):
+    """Lists the preset collections of a directory from the catalog index"""
+
+    def __init__(self, parent, settings: QSettings):
+        super().__init__(parent)
+        self.settings = settings
+        self.catalog = CollectionCatalog(catalog_path())
+        self.selected_path = None
+
+        self.setWindowTitle("Preset Collection Catalog")
+        self.resize(500, 400)
+        layout = QVBoxLayout()
+
+        # Directory selection
+        directory_layout = QHBoxLayout()
+        self.directory_label = QLabel()
+        directory_layout.addWidget(self.directory_label, 1)
+        choose_button = QPushButton("Choose Directory")
+        choose_button.clicked.connect(self.choose_directory)
+        directory_layout.addWidget(choose_button)
+        refresh_button = QPushButton("Refresh")
+        refresh_button.clicked.connect(self.refresh)
+        directory_layout.addWidget(refresh_button)
+        layout.addLayout(directory_layout)
+
+        # Collections
+        self.table = QTableWidget(0, 3)
+        self.table.setHorizontalHeaderLabels(["Name", "Presets", "Modified"])
+        self.table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.table.setSelectionMode(QAbstractItemView.SingleSelection)
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.table.cellDoubleClicked.connect(lambda row, _: self.accept())
+        layout.addWidget(self.table)
+
+        buttons = QDialogButtonBox(QDialogButtonBox.Open | QDialogButtonBox.Cancel)
+        buttons.accepted.connect(self.accept)
+        buttons.rejected.connect(self.reject)
+        layout.addWidget(buttons)
+        self.setLayout(layout)
+
+        self.directory = self.settings.value("catalog_directory", "")
+        self.refresh()
+
+    def choose_directory(self):
+        directory = QFileDialog.getExistingDirectory(
+            self, "Preset Collection Directory", self.directory
+        )
+        if directory:
+            self.directory = directory
+            self.settings.setValue("catalog_directory", directory)
+            self.refresh()
+
+    def refresh(self):
+        self.directory_label.setText(self.directory or "No directory selected")
+        self.table.setRowCount(0)
+        if not self.directory or not os.path.isdir(self.directory):
+            return
+
+        self.catalog.refresh(self.directory)
+        rows = self.catalog.collections(self.directory)
+        self.table.setRowCount(len(rows))
+        for row, (path, name, preset_count, mtime_ns) in enumerate(rows):
+            name_item = QTableWidgetItem(name)
+            name_item.setData(Qt.UserRole, path)
+            name_item.setToolTip(path)
+            self.table.setItem(row, 0, name_item)
+            self.table.setItem(row, 1, QTableWidgetItem(str(preset_count)))
+            modified = time.strftime("%Y-%m-%d %H:%M", time.localtime(mtime_ns / 1e9))
+            self.table.setItem(row, 2, QTableWidgetItem(modified))
+
+    def accept(self):
+        item = self.table.item(self.table.currentRow(), 0)
+        if item is None:
+            return
+        self.selected_path = item.data(Qt.UserRole)
+        super().accept()
+
+    def done(self, result):
+        self.catalog.close()
+        super().done(result)
@@ -0,0 +1,96 @@
+import json
+import os
+from autosave import journal_path, replay_journal
+from binary_collection import is_binary_path, read_binary, read_binary_table
+from metrics import stats
+from preset_table import extra_fields
+from validator import COLLECTION_FIELDS, migrate_collection, validate_collection, describe_issue
+
+# Issues listed in an error message, the rest is counted
+MAX_LISTED_ISSUES = 10
+
+
+class CollectionError(Exception):
+    """A preset collection file could not be read or is not valid"""
+
+
+def default_preset(name, screen=None):
+    """Preset covering the middle of screen, a fixed block without one"""
+    if screen is None:
+        x, y, w, h = 100, 100, 400, 400
+    else:
+        x = screen.x() + screen.width() // 4
+        y = screen.y() + screen.height() // 4
+        w, h = screen.width() // 2, screen.height() // 2
+    return {
+        "preset_name": name,
+        "alpha": 150,
+        "x": x,
+        "y": y,
+        "w": w,
+        "h": h,
+        "xy_abs": True,
+        "wh_abs": True,
+        "color": "#000000",
+    }
+
+
+def read_collection(path):
+    """Read, migrate and validate the collection at path.
+
+    Returns the collection and the number of journaled edits recovered into
+    it, raises CollectionError when the file cannot be used.
+    """
+    try:
+        with stats.timer("preset_load"):
+            if is_binary_path(path):
+                data = migrate_collection(read_binary(path))
+            else:
+                with open(path, "r") as file:
+                    data = migrate_collection(json.load(file))
+    except (OSError, ValueError) as e:
+        raise CollectionError(str(e)) from e
+
+    # Edits journaled before a crash
+    recovered = replay_journal(data, path)
+    issues = validate_collection(data)
+    if issues:
+        details = [describe_issue(data, issue) for issue in issues[:MAX_LISTED_ISSUES]]
+        if len(issues) > MAX_LISTED_ISSUES:
+            details.append("... and {} more".format(len(issues) - MAX_LISTED_ISSUES))
+        raise CollectionError(
+            "The file does not contain a valid preset collection.\n\n" + "\n".join(details)
+        )
+    return data, recovered
+
+
+def load_collection(model, autosave, path):
+    """Make the collection at path the model's and journal its edits"""
+    if is_binary_path(path) and not os.path.exists(journal_path(path)):
+        # Written validated and checksummed, the columns go to the model as they are.
+        # Other schema versions are read as dicts below, to be migrated or rejected.
+        try:
+            with stats.timer("preset_load"):
+                loaded = read_binary_table(path)
+        except (OSError, ValueError) as e:
+            raise CollectionError(str(e)) from e
+        if loaded is not None:
+            name, table = loaded
+            if not len(table):
+                raise CollectionError("The file does not contain any presets.")
+            model.reset(name, table)
+            autosave.open(path, (name, table))
+            return
+
+    data, recovered = read_collection(path)
+    model.reset(
+        data["preset_collection_name"], data["presets"], extra_fields(data, COLLECTION_FIELDS)
+    )
+    autosave.open(path, model.to_dict())
+    if recovered:
+        autosave.write(path, model.to_dict())
+
+
+def load_default_collection(model, autosave, screen=None):
+    autosave.open(None, None)
+    model.reset("Untitiled", [default_preset("default", screen)])
@@ -0,0 +1,198 @@
+import json
+import time
+from PyQt5.QtGui import QColor
+from PyQt5.QtCore import QObject, QRect, QSettings, pyqtSignal
+from PyQt5.QtNetwork import QLocalServer
+import metrics
+from metrics import stats
+from collection_file import CollectionError, load_collection
+from control_client import is_stale, server_name
+
+
+class CommandError(Exception):
+    """A control command that cannot be applied"""
+
+
+class SocketInUse(Exception):
+    """Another instance serves the control socket"""
+
+
+class ControlServer(QObject):
+    """Control endpoint of the running instance.
+
+    Clients send one JSON batch per line, a list of commands or a single
+    one, e.g. [{"cmd": "preset", "name": "code"}, {"cmd": "nudge", "dx": 10}].
+    A batch is applied in one model transaction, so it is one repaint
+    however many commands it has. Every batch is answered with one line,
+    {"ok": ..., "results": [...]} with a result per command.
+    """
+
+    # A second instance was started without commands
+    raise_requested = pyqtSignal()
+
+    def __init__(self, model, overlay_manager, autosave):
+        super().__init__()
+        self.model = model
+        self.overlay_manager = overlay_manager
+        self.autosave = autosave
+        self.server = QLocalServer(self)
+        # Other users must not control the overlay
+        self.server.setSocketOptions(QLocalServer.UserAccessOption)
+        self.server.newConnection.connect(self.accept)
+        self.buffers = {}
+        self.commands = {
+            "collection": self.cmd_collection,
+            "preset": self.cmd_preset,
+            "block": self.cmd_block,
+            "nudge": self.cmd_nudge,
+            "alpha": self.cmd_alpha,
+            "color": self.cmd_color,
+            "visible": self.cmd_visible,
+            "state": self.cmd_state,
+            "raise": self.cmd_raise,
+        }
+
+    def listen(self):
+        """Start serving, a socket left behind by a crashed instance is replaced.
+
+        Raises SocketInUse while another instance has it, also when that one
+        is slow to answer. Checked first, with UserAccessOption Qt moves the
+        new socket over any existing one.
+        """
+        name = server_name()
+        if not is_stale(name):
+            raise SocketInUse("another instance is running but does not respond")
+        QLocalServer.removeServer(name)
+        return self.server.listen(name)
+
+    def close(self):
+        self.server.close()
+
+    def accept(self):
+        while self.server.hasPendingConnections():
+            socket = self.server.nextPendingConnection()
+            self.buffers[socket] = b""
+            socket.readyRead.connect(lambda socket=socket: self.read(socket))
+            socket.disconnected.connect(lambda socket=socket: self.drop(socket))
+
+    def drop(self, socket):
+        self.buffers.pop(socket, None)
+        socket.deleteLater()
+
+    def read(self, socket):
+        buffer = self.buffers.get(socket, b"") + bytes(socket.readAll())
+        *lines, self.buffers[socket] = buffer.split(b"\n")
+        for line in lines:
+            if not line.strip():
+                continue
+            try:
+                batch = json.loads(line)
+            except ValueError as e:
+                reply = {"ok": False, "error": "not JSON: {}".format(e)}
+            else:
+                reply = self.apply_batch(batch if isinstance(batch, list) else [batch])
+            socket.write(json.dumps(reply).encode("utf-8") + b"\n")
+            socket.flush()
+
+    def apply_batch(self, batch):
+        """Apply the commands of one batch, a failing command does not stop the others"""
+        start = time.perf_counter()
+        before = self.overlay_manager.view_state()
+        results = []
+        with stats.timer("control_batch"), self.model.transaction():
+            for command in batch:
+                try:
+                    if not isinstance(command, dict) or command.get("cmd") not in self.commands:
+                        raise CommandError("unknown command: {!r}".format(command))
+                    results.append(self.commands[command["cmd"]](command))
+                except CommandError as e:
+                    results.append({"error": str(e)})
+                except (KeyError, TypeError, ValueError) as e:
+                    results.append({"error": "bad arguments: {!r}".format(e)})
+        if stats.enabled:
+            stats.count("control_commands", len(batch))
+        # Only a batch that changed what is shown is followed by a frame
+        if metrics.control_latency and self.overlay_manager.view_state() != before:
+            self.overlay_manager.mark_latency(metrics.control_latency, start)
+        return {"ok": all("error" not in result for result in results), "results": results}
+
+    # Commands, each returns its result dict
+
+    def cmd_collection(self, command):
+        """Open a collection file, as if imported in the settings panel"""
+        try:
+            load_collection(self.model, self.autosave, command["path"])
+        except CollectionError as e:
+            raise CommandError(str(e))
+        QSettings("preset_collection_path", "").setValue("preset_collection_path", command["path"])
+        return {}
+
+    def cmd_preset(self, command):
+        row = self.model.row_of(command["name"])
+        if row < 0:
+            raise CommandError("no preset named {!r}".format(command["name"]))
+        self.model.set_current(row)
+        return {}
+
+    def cmd_block(self, command):
+        """Main block in pixels, fields left out keep their value"""
+        rect = self.model.geometry()
+        self.model.set_geometry(
+            QRect(
+                int(command.get("x", rect.x())),
+                int(command.get("y", rect.y())),
+                int(command.get("w", rect.width())),
+                int(command.get("h", rect.height())),
+            )
+        )
+        return {}
+
+    def cmd_nudge(self, command):
+        dx, dy = int(command.get("dx", 0)), int(command.get("dy", 0))
+        self.model.set_geometry(self.model.geometry().translated(dx, dy))
+        return {}
+
+    def cmd_alpha(self, command):
+        value = command["value"]
+        if type(value) is not int or not 0 <= value <= 255:
+            raise CommandError("alpha must be an integer from 0 to 255")
+        self.model.update(alpha=value)
+        return {}
+
+    def cmd_color(self, command):
+        value = command["value"]
+        if not isinstance(value, str) or not QColor(value).isValid():
+            raise CommandError("not a color: {!r}".format(value))
+        self.model.update(color=QColor(value).name())
+        return {}
+
+    def cmd_visible(self, command):
+        """value true, false or "toggle" """
+        value = command.get("value", "toggle")
+        if value == "toggle":
+            value = not self.overlay_manager.show_focus_block
+        elif not isinstance(value, bool):
+            raise CommandError("visible takes true, false or \"toggle\"")
+        self.overlay_manager.set_focus_block_visible(value)
+        return {}
+
+    def cmd_state(self, command):
+        rect = self.model.geometry()
+        return {
+            "collection": self.model.collection_name,
+            "preset": self.model.get("preset_name"),
+            "presets": self.model.names(),
+            "block": [rect.x(), rect.y(), rect.width(), rect.height()],
+            "holes": [
+                [hole.x(), hole.y(), hole.width(), hole.height()]
+                for hole in self.model.holes()[1:]
+            ],
+            "alpha": self.model.get("alpha"),
+            "color": self.model.get("color"),
+            "visible": self.overlay_manager.show_focus_block,
+            "tracking": self.overlay_manager.tracker.mode,
+        }
+
+    def cmd_raise(self, command):
+        self.raise_requested.emit()
+        return {}
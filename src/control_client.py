@@ -0,0 +1,47 @@
+import getpass
+import json
+import os
+from PyQt5.QtNetwork import QLocalSocket
+
+# How long a second instance waits for the running one
+CONNECT_TIMEOUT_MS = 200
+REPLY_TIMEOUT_MS = 2000
+# Socket name of the control endpoint, e.g. to run benchmarks beside a running instance
+SOCKET_ENV = "FOCUS_FRAME_SOCKET"
+
+
+def server_name():
+    """One control endpoint per user"""
+    return os.environ.get(SOCKET_ENV) or "focus-frame-{}".format(getpass.getuser())
+
+
+def is_stale(name):
+    """Whether the socket name is left behind by an instance that is gone.
+
+    A running instance that is slow to answer is not stale, its socket
+    must not be taken over.
+    """
+    socket = QLocalSocket()
+    socket.connectToServer(name)
+    if socket.waitForConnected(CONNECT_TIMEOUT_MS):
+        socket.disconnectFromServer()
+        return False
+    return socket.error() in (QLocalSocket.ConnectionRefusedError, QLocalSocket.ServerNotFoundError)
+
+
+def send_commands(commands, timeout=CONNECT_TIMEOUT_MS):
+    """Send a batch to the running instance and return its reply, None when none is running.
+
+    Kept apart from the server, a second instance only loads QtCore and QtNetwork.
+    """
+    socket = QLocalSocket()
+    socket.connectToServer(server_name())
+    if not socket.waitForConnected(timeout):
+        return None
+    socket.write(json.dumps(commands).encode("utf-8") + b"\n")
+    socket.waitForBytesWritten(REPLY_TIMEOUT_MS)
+    reply = b""
+    while not reply.endswith(b"\n") and socket.waitForReadyRead(REPLY_TIMEOUT_MS):
+        reply += bytes(socket.readAll())
+    socket.disconnectFromServer()
+    return json.loads(reply) if reply else {"ok": False, "error": "no reply"}
@@ -0,0 +1,98 @@
+from PyQt5.QtCore import Qt, QRect
+
+# Side of a cell of the hit test grid, in pixels
+GRID_CELL = 256
+
+# Column/row classes of a position relative to the block
+OUTSIDE, NEAR_START, INSIDE, NEAR_END = range(4)
+
+# (column, row) -> handle, "move" is the inner area of the block
+ZONES = {
+    (NEAR_START, NEAR_START): "top_left",
+    (NEAR_END, NEAR_START): "top_right",
+    (NEAR_START, NEAR_END): "bottom_left",
+    (NEAR_END, NEAR_END): "bottom_right",
+    (INSIDE, NEAR_START): "top",
+    (INSIDE, NEAR_END): "bottom",
+    (NEAR_START, INSIDE): "left",
+    (NEAR_END, INSIDE): "right",
+    (INSIDE, INSIDE): "move",
+}
+
+ZONE_CURSORS = {
+    "top_left": Qt.SizeFDiagCursor,
+    "bottom_right": Qt.SizeFDiagCursor,
+    "top_right": Qt.SizeBDiagCursor,
+    "bottom_left": Qt.SizeBDiagCursor,
+    "top": Qt.SizeVerCursor,
+    "bottom": Qt.SizeVerCursor,
+    "left": Qt.SizeHorCursor,
+    "right": Qt.SizeHorCursor,
+    "move": Qt.SizeAllCursor,
+    None: Qt.ArrowCursor,
+}
+
+
+class HitZones:
+    """Resize and move handles of the focus blocks, built once per blocks and tolerance.
+
+    Blocks are indexed in a grid of GRID_CELL sized cells, a lookup only
+    classifies the blocks whose handles reach into the cell under the
+    cursor. A moved block is updated in place.
+    """
+
+    def __init__(self, blocks, tolerance):
+        self.tolerance = tolerance
+        self.bounds = []
+        # (column, row) -> indices of the blocks reaching into the cell
+        self.grid = {}
+        for block in blocks:
+            self.bounds.append(None)
+            self.set_block(len(self.bounds) - 1, block)
+
+    def cells(self, bounds):
+        (left, right), (top, bottom) = bounds
+        tolerance = self.tolerance
+        for column in range((left - tolerance) // GRID_CELL, (right + tolerance) // GRID_CELL + 1):
+            for row in range((top - tolerance) // GRID_CELL, (bottom + tolerance) // GRID_CELL + 1):
+                yield column, row
+
+    def set_block(self, idx, block: QRect):
+        """Replace block idx, only the cells it left or entered are touched"""
+        old = self.bounds[idx]
+        new = ((block.left(), block.right()), (block.top(), block.bottom()))
+        if old == new:
+            return
+        old_cells = set(self.cells(old)) if old is not None else set()
+        new_cells = set(self.cells(new))
+        for cell in old_cells - new_cells:
+            indices = self.grid[cell]
+            indices.remove(idx)
+            if not indices:
+                del self.grid[cell]
+        for cell in new_cells - old_cells:
+            self.grid.setdefault(cell, []).append(idx)
+        self.bounds[idx] = new
+
+    def classify(self, value, bounds):
+        start, end = bounds
+        if abs(value - start) < self.tolerance:
+            return NEAR_START
+        if abs(value - end) < self.tolerance:
+            return NEAR_END
+        if start <= value <= end:
+            return INSIDE
+        return OUTSIDE
+
+    def zone_at(self, pos):
+        """Handle under pos and the index of its block, (None, None) outside of every handle.
+
+        Where blocks overlap the one painted last, the highest index, wins.
+        """
+        x, y = pos.x(), pos.y()
+        for idx in sorted(self.grid.get((x // GRID_CELL, y // GRID_CELL), ()), reverse=True):
+            x_bounds, y_bounds = self.bounds[idx]
+            zone = ZONES.get((self.classify(x, x_bounds), self.classify(y, y_bounds)))
+            if zone is not None:
+                return zone, idx
+        return None, None
@@ -0,0 +1,117 @@
+import os
+import threading
+from PyQt5.QtCore import QObject, QFileSystemWatcher, QTimer, pyqtSignal
+from autosave import Autosave, file_stamp
+from collection_file import read_collection
+from metrics import stats
+from preset_table import extra_fields
+from preset_model import PresetModel
+from validator import COLLECTION_FIELDS
+
+# Editors often write a file in several steps
+DEBOUNCE_MS = 300
+
+
+class CollectionWatcher(QObject):
+    """Reloads the active collection when its file is changed by someone else.
+
+    The file is parsed on a worker thread and only the presets that differ
+    are applied to the model. Writes of our own autosave are recognized by
+    the stamp they left and ignored.
+    """
+
+    # path, stamp, collection, emitted from the worker thread
+    parsed = pyqtSignal(str, object, object)
+
+    def __init__(self, model: PresetModel, autosave: Autosave):
+        super().__init__()
+        self.model = model
+        self.autosave = autosave
+        self.path = None
+        # Stamp of the version the model has and of the last one that did not parse
+        self.known_stamp = None
+        self.rejected_stamp = None
+        self.parsing = False
+
+        self.watcher = QFileSystemWatcher(self)
+        self.watcher.fileChanged.connect(self.schedule)
+        # A file replaced by rename is no longer watched, its directory still is
+        self.watcher.directoryChanged.connect(self.schedule)
+
+        self.debounce_timer = QTimer(self)
+        self.debounce_timer.setSingleShot(True)
+        self.debounce_timer.setInterval(DEBOUNCE_MS)
+        self.debounce_timer.timeout.connect(self.reload)
+
+        self.parsed.connect(self.apply)
+        self.autosave.opened.connect(self.watch)
+        self.autosave.written.connect(self.on_written)
+
+    def watch(self, path):
+        watched = self.watcher.files() + self.watcher.directories()
+        if watched:
+            self.watcher.removePaths(watched)
+        self.debounce_timer.stop()
+        self.path = path or None
+        self.known_stamp = None
+        self.rejected_stamp = None
+        if self.path:
+            self.known_stamp = file_stamp(self.path)
+            self.watcher.addPath(os.path.dirname(os.path.abspath(self.path)))
+            self.watcher.addPath(self.path)
+
+    def on_written(self, path, stamp):
+        if path == self.path:
+            self.known_stamp = stamp
+
+    def schedule(self, _=None):
+        if self.path:
+            self.debounce_timer.start()
+
+    def reload(self):
+        if self.path not in self.watcher.files() and os.path.exists(self.path):
+            self.watcher.addPath(self.path)
+        stamp = file_stamp(self.path)
+        if stamp is None or stamp in (self.known_stamp, self.rejected_stamp):
+            return
+        if self.parsing:
+            # Looked at again once the running parse is done
+            self.debounce_timer.start()
+            return
+        self.parsing = True
+        threading.Thread(
+            target=self.parse, args=(self.path, stamp), name="hot-reload", daemon=True
+        ).start()
+
+    def parse(self, path, stamp):
+        """Worker thread"""
+        try:
+            collection, _ = read_collection(path)
+        except Exception:
+            # Probably half written, the next write schedules another reload
+            collection = None
+        # Changed while being read
+        if file_stamp(path) != stamp:
+            collection = None
+        self.parsed.emit(path, stamp, collection)
+
+    def apply(self, path, stamp, collection):
+        self.parsing = False
+        if path != self.path:
+            return
+        if collection is None:
+            self.rejected_stamp = stamp
+            self.schedule()
+            return
+        # The model needs a current preset
+        if not collection["presets"]:
+            return
+
+        with stats.timer("hot_reload"):
+            self.model.apply_collection(
+                collection["preset_collection_name"],
+                collection["presets"],
+                extra_fields(collection, COLLECTION_FIELDS),
+            )
+        self.known_stamp = stamp
+        self.autosave.rebase(path, self.model.to_dict())
@@ -0,0 +1,94 @@
+from itertools import compress
+from PyQt5.QtCore import QRect
+from preset_table import XY_ABS, WH_ABS
+
+# Digits kept of normalized coordinates, well below a pixel on an 8k screen
+NORMALIZED_DIGITS = 6
+# Flags byte -> 1 for presets with a relative mode
+RELATIVE_ROWS = bytes(0 if flags & XY_ABS and flags & WH_ABS else 1 for flags in range(256))
+
+
+class ScreenLayout:
+    """Turns stored preset coordinates into pixels of the virtual desktop and back.
+
+    Absolute coordinates are pixels. Relative positions are fractions of the
+    primary screen, relative sizes fractions of the screen the block is
+    placed on: the primary screen for a relative position, the screen
+    holding the top left corner otherwise.
+    """
+
+    def __init__(self, primary=None, screens=()):
+        self.primary = QRect(primary) if primary is not None else QRect(0, 0, 1920, 1080)
+        self.screens = [QRect(screen) for screen in screens]
+        # Plain tuples for the per preset loop
+        self.primary_box = self.box(self.primary)
+        self.screen_boxes = [self.box(screen) for screen in self.screens]
+
+    @staticmethod
+    def box(screen):
+        return screen.x(), screen.y(), screen.width(), screen.height()
+
+    def reference_box(self, x, y, xy_abs):
+        if xy_abs:
+            for box in self.screen_boxes:
+                if box[0] <= x < box[0] + box[2] and box[1] <= y < box[1] + box[3]:
+                    return box
+        return self.primary_box
+
+    def reference_screen(self, x, y, xy_abs):
+        return QRect(*self.reference_box(x, y, xy_abs))
+
+    def pixel_box(self, x, y, w, h, xy_abs, wh_abs):
+        """(x, y, w, h) of the pixel rect"""
+        sx, sy, sw, sh = self.reference_box(x, y, xy_abs)
+        if not xy_abs:
+            x = sx + x * sw
+            y = sy + y * sh
+        if not wh_abs:
+            w = w * sw
+            h = h * sh
+        return round(x), round(y), round(w), round(h)
+
+    def pixel_rect(self, x, y, w, h, xy_abs, wh_abs):
+        return QRect(*self.pixel_box(x, y, w, h, xy_abs, wh_abs))
+
+    def stored_geometry(self, rect: QRect, xy_abs, wh_abs):
+        """x, y, w and h of rect as stored with the given modes"""
+        sx, sy, sw, sh = self.reference_box(rect.x(), rect.y(), xy_abs)
+        if xy_abs:
+            x, y = rect.x(), rect.y()
+        else:
+            x = round((rect.x() - sx) / sw, NORMALIZED_DIGITS)
+            y = round((rect.y() - sy) / sh, NORMALIZED_DIGITS)
+        if wh_abs:
+            w, h = rect.width(), rect.height()
+        else:
+            w = round(rect.width() / sw, NORMALIZED_DIGITS)
+            h = round(rect.height() / sh, NORMALIZED_DIGITS)
+        return {"x": x, "y": y, "w": w, "h": h}
+
+    def layout_table(self, table):
+        """Pixel boxes of every preset of a PresetTable, computed column by column.
+
+        The boxes of absolute presets are the rounded columns, only presets
+        with a relative mode go through pixel_box. Mostly relative tables
+        take one pass of pixel_box instead.
+        """
+        numbers = table.numbers
+        columns = [numbers[key] for key in ("x", "y", "w", "h")]
+        flags = table.flags
+        relative = flags.tobytes().translate(RELATIVE_ROWS)
+        pixel_box = self.pixel_box
+        if relative.count(1) > len(relative) // 2:
+            return [
+                pixel_box(x, y, w, h, row_flags & XY_ABS, row_flags & WH_ABS)
+                for x, y, w, h, row_flags in zip(*columns, flags)
+            ]
+        boxes = list(zip(*(map(round, column) for column in columns)))
+        x, y, w, h = columns
+        for row in compress(range(len(boxes)), relative):
+            row_flags = flags[row]
+            boxes[row] = pixel_box(
+                x[row], y[row], w[row], h[row], row_flags & XY_ABS, row_flags & WH_ABS
+            )
+        return boxes
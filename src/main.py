@@ -1,22 +1,236 @@
+import argparse
+import json
+import os
 import sys
-from PyQt5.QtWidgets import (
-    QApplication,
-)
-from overlay import OverlayWindow
-from settings import SettingsPanel
+import metrics
+from metrics import stats, STATS_ENV, StartupProfile
+
+# Wait this long for the first overlay frame before building the settings panel anyway
+PANEL_FALLBACK_MS = 500
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Dim everything but a focus block")
+    parser.add_argument(
+        "--startup-profile",
+        action="store_true",
+        help="print the time spent in each startup phase",
+    )
+    parser.add_argument(
+        "--overlay-only",
+        action="store_true",
+        help="show only the overlay, the settings panel is opened from the tray icon",
+    )
+    # Applied by the running instance when there is one
+    control = parser.add_argument_group("control")
+    control.add_argument("--collection", help="open this preset collection file")
+    control.add_argument("--preset", help="switch to the preset with this name")
+    control.add_argument("--block", type=int, nargs=4, metavar=("X", "Y", "W", "H"))
+    control.add_argument("--nudge", type=int, nargs=2, metavar=("DX", "DY"))
+    control.add_argument("--alpha", type=int)
+    control.add_argument("--color")
+    visibility = control.add_mutually_exclusive_group()
+    visibility.add_argument("--show", dest="visible", action="store_const", const=True)
+    visibility.add_argument("--hide", dest="visible", action="store_const", const=False)
+    visibility.add_argument("--toggle", dest="visible", action="store_const", const="toggle")
+    control.add_argument("--state", action="store_true", help="print the state as JSON")
+    # The rest is left to Qt
+    args, _ = parser.parse_known_args()
+    return args
+
+
+def control_commands(args):
+    """Batch of control commands given on the command line"""
+    commands = []
+    if args.collection is not None:
+        commands.append({"cmd": "collection", "path": os.path.abspath(args.collection)})
+    if args.preset is not None:
+        commands.append({"cmd": "preset", "name": args.preset})
+    if args.block:
+        commands.append({"cmd": "block", **dict(zip("xywh", args.block))})
+    if args.nudge:
+        commands.append({"cmd": "nudge", "dx": args.nudge[0], "dy": args.nudge[1]})
+    if args.alpha is not None:
+        commands.append({"cmd": "alpha", "value": args.alpha})
+    if args.color is not None:
+        commands.append({"cmd": "color", "value": args.color})
+    if args.visible is not None:
+        commands.append({"cmd": "visible", "value": args.visible})
+    if args.state:
+        commands.append({"cmd": "state"})
+    return commands
 
 
 def main():
+    profile = StartupProfile()
+    args = parse_args()
+
+    # A running instance takes the commands, a plain second launch raises it
+    from control_client import send_commands
+
+    commands = control_commands(args)
+    reply = send_commands(commands or [{"cmd": "raise"}])
+    if reply is not None:
+        if args.state or not reply["ok"]:
+            print(json.dumps(reply, indent=4))
+        sys.exit(0 if reply["ok"] else 1)
+    profile.mark("forward")
+
+    # Only what the overlay needs, the settings panel is imported once it is built
+    from PyQt5.QtWidgets import QApplication
+    from PyQt5.QtCore import Qt, QSettings, QTimer
+    from overlay_manager import OverlayManager
+    from preset_model import PresetModel
+    from autosave import Autosave
+    from paint_engines import PAINT_ENGINES, PAINT_ENGINE_ENV
+    from strip_overlay import TOPOLOGY_ENV, WINDOW_TOPOLOGIES
+    from collection_file import load_collection, load_default_collection
+    from hot_reload import CollectionWatcher
+    from tracking import TRACKING_ENV, TRACKING_MODES, TrackingUnavailable
+    from control import ControlServer, SocketInUse
+    from tray import TrayIcon
+
+    profile.mark("imports")
+
+    # Render every screen at its own device pixel ratio
+    QApplication.setAttribute(Qt.AA_EnableHighDpiScaling)
+    QApplication.setAttribute(Qt.AA_UseHighDpiPixmaps)
     app = QApplication(sys.argv)
+    app.setApplicationName("focus-frame")
+    # Kept running by the tray icon while no settings panel is open
+    app.setQuitOnLastWindowClosed(not args.overlay_only)
+    profile.mark("application")
+
+    # Presets shared by the overlay and the settings panel
+    model = PresetModel()
+
+    # Journal every edit and write the collection in the background
+    autosave = Autosave()
+    model.edited.connect(autosave.record)
+    app.aboutToQuit.connect(autosave.close)
+
+    # Follow changes made to the collection file by other programs
+    collection_watcher = CollectionWatcher(model, autosave)
+
+    # Create one overlay window per screen
+    overlay_manager = OverlayManager(model)
+    settings = QSettings("preset_collection_path", "")
+    if not os.environ.get(PAINT_ENGINE_ENV):
+        saved_engine = settings.value("paint_engine", "")
+        if saved_engine in PAINT_ENGINES:
+            overlay_manager.set_paint_engine(saved_engine)
+    if not os.environ.get(TOPOLOGY_ENV):
+        saved_topology = settings.value("topology", "")
+        if saved_topology in WINDOW_TOPOLOGIES:
+            overlay_manager.set_topology(saved_topology)
+    overlay_manager.animator.enabled = settings.value("animate_transitions", False, type=bool)
+    profile.mark("overlay")
+
+    # Load the given or the last collection, reported by the settings panel when it fails
+    load_error = None
+    path = os.path.abspath(args.collection) if args.collection else None
+    path = path or settings.value("preset_collection_path")
+    if path:
+        try:
+            load_collection(model, autosave, path)
+            settings.setValue("preset_collection_path", path)
+        except Exception as e:
+            load_error = str(e)
+    if not model.presets:
+        settings.setValue("preset_collection_path", "")
+        load_default_collection(model, autosave, overlay_manager.primary_geometry())
+    profile.mark("collection")
+
+    overlay_manager.show()
+    profile.mark("show")
+
+    # Follow the cursor or the active window, the environment wins over the saved mode
+    tracking = os.environ.get(TRACKING_ENV) or settings.value("tracking", "off")
+    if tracking in TRACKING_MODES:
+        try:
+            overlay_manager.tracker.set_mode(tracking)
+        except TrackingUnavailable as e:
+            print("Tracking disabled: {}".format(e), file=sys.stderr)
+
+    # Scripts and second instances control this one, the own arguments go the same way
+    control_server = ControlServer(model, overlay_manager, autosave)
+    try:
+        listening = control_server.listen()
+    except SocketInUse as e:
+        # Running, but it did not answer in time, one overlay is enough
+        print("Not started: {}".format(e), file=sys.stderr)
+        sys.exit(1)
+    if not listening:
+        error = control_server.server.errorString()
+        print("Control socket unavailable: {}".format(error), file=sys.stderr)
+    app.aboutToQuit.connect(control_server.close)
+    # The collection was opened above
+    commands = [command for command in commands if command["cmd"] != "collection"]
+    if commands:
+        reply = control_server.apply_batch(commands)
+        if args.state or not reply["ok"]:
+            print(json.dumps(reply, indent=4))
+
+    windows = {}
+
+    def show_settings_panel():
+        """Build the settings panel or bring it to the front"""
+        settings_panel = windows.get("settings_panel")
+        if settings_panel is not None:
+            settings_panel.raise_panel()
+            return settings_panel
+        from settings import SettingsPanel
+
+        settings_panel = SettingsPanel(overlay_manager, model, autosave)
+        if args.overlay_only:
+            # Built on demand, its widgets are freed again once it is closed
+            settings_panel.setAttribute(Qt.WA_DeleteOnClose)
+            settings_panel.destroyed.connect(lambda: windows.pop("settings_panel", None))
+        settings_panel.show()
+        windows["settings_panel"] = settings_panel
+        return settings_panel
+
+    control_server.raise_requested.connect(show_settings_panel)
+
+    started = []
+
+    def finish_startup():
+        if started:
+            return
+        started.append(True)
+        profile.mark("first frame")
+        if args.overlay_only:
+            # The panel is opened from the tray icon or by starting the app again
+            tray_icon = TrayIcon(overlay_manager)
+            tray_icon.settings_requested.connect(show_settings_panel)
+            tray_icon.show()
+            windows["tray_icon"] = tray_icon
+            profile.mark("tray icon")
+            if load_error:
+                print(load_error, file=sys.stderr)
+        else:
+            settings_panel = show_settings_panel()
+            profile.mark("settings panel")
+            if load_error:
+                settings_panel.show_import_error(load_error)
+        if args.startup_profile:
+            profile.report(sys.stderr)
+
+    # The settings panel or the tray icon is built once the overlay has painted
+    overlay_manager.first_frame_painted.connect(finish_startup)
+    QTimer.singleShot(PANEL_FALLBACK_MS, finish_startup)
 
-    # Create overlay window
-    overlay_window = OverlayWindow()
-    overlay_window.show()
+    # Report drag and control latency when measuring was requested
+    if metrics.drag_latency:
+        for recorder in (metrics.drag_latency, metrics.control_latency):
+            app.aboutToQuit.connect(
+                lambda recorder=recorder: print(json.dumps(recorder.summary()), file=sys.stderr)
+            )
 
-    # Create settings panel
-    settings_panel = SettingsPanel(overlay_window)
-    overlay_window.setSettingPanel(settings_panel)
-    settings_panel.show()
+    # Dump the hot path stats when a file was given
+    stats_path = os.environ.get(STATS_ENV)
+    if stats_path and stats_path != "1":
+        app.aboutToQuit.connect(lambda: stats.dump(stats_path))
 
     sys.exit(app.exec_())
 
@@ -0,0 +1,137 @@
+import json
+import os
+import time
+from collections import deque
+from contextlib import nullcontext
+
+LATENCY_ENV = "FOCUS_FRAME_LATENCY"
+# "1" enables the stats, any other value is also the file they are dumped to on exit
+STATS_ENV = "FOCUS_FRAME_STATS"
+# Samples kept per timer, so the stats can stay on all day
+MAX_SAMPLES = 10000
+
+
+def percentile(sorted_values, q):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    idx = min(len(sorted_values) - 1, max(0, round(q / 100 * (len(sorted_values) - 1))))
+    return sorted_values[idx]
+
+
+def summarize(samples):
+    """Count, mean and percentiles of samples given in seconds, reported in ms"""
+    values = sorted(sample * 1000 for sample in samples)
+    if not values:
+        return {"count": 0}
+    return {
+        "count": len(values),
+        "mean_ms": sum(values) / len(values),
+        "p50_ms": percentile(values, 50),
+        "p95_ms": percentile(values, 95),
+        "p99_ms": percentile(values, 99),
+        "max_ms": values[-1],
+    }
+
+
+class LatencyRecorder:
+    """Collects latency samples, e.g. from input event to painted frame"""
+
+    def __init__(self, name):
+        self.name = name
+        self.samples = []
+
+    def record(self, seconds):
+        self.samples.append(seconds)
+
+    def summary(self):
+        return {"name": self.name, **summarize(self.samples)}
+
+
+class Timer:
+    def __init__(self, stats, name):
+        self.stats = stats
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc):
+        self.stats.add_time(self.name, time.perf_counter() - self.start)
+
+
+def resident_memory():
+    """Resident set size in bytes, None where /proc is not available"""
+    try:
+        with open("/proc/self/statm") as file:
+            return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class StartupProfile:
+    """Time spent in each phase of startup"""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.last = self.start
+        self.phases = []
+
+    def mark(self, phase):
+        """End the running phase, named after what it did"""
+        now = time.perf_counter()
+        self.phases.append((phase, now - self.last))
+        self.last = now
+
+    def report(self, file):
+        for phase, seconds in self.phases:
+            print("{:<20} {:8.1f} ms".format(phase, seconds * 1000), file=file)
+        print("{:<20} {:8.1f} ms".format("total", (self.last - self.start) * 1000), file=file)
+        rss = resident_memory()
+        if rss is not None:
+            print("{:<20} {:8.1f} MB".format("resident memory", rss / 2**20), file=file)
+
+
+class Stats:
+    """Counters and timers of the hot paths.
+
+    Call sites check `enabled` first, so disabled stats cost one attribute lookup.
+    """
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.counters = {}
+        self.timers = {}
+        self.null_timer = nullcontext()
+
+    def count(self, name, n=1):
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def timer(self, name):
+        if not self.enabled:
+            return self.null_timer
+        return Timer(self, name)
+
+    def add_time(self, name, seconds):
+        if name not in self.timers:
+            self.timers[name] = deque(maxlen=MAX_SAMPLES)
+        self.timers[name].append(seconds)
+
+    def snapshot(self):
+        return {
+            "counters": dict(self.counters),
+            "timers": {name: summarize(samples) for name, samples in self.timers.items()},
+        }
+
+    def dump(self, path):
+        with open(path, "w") as file:
+            json.dump(self.snapshot(), file, indent=4)
+
+
+stats = Stats(enabled=bool(os.environ.get(STATS_ENV)))
+
+# Opt-in, None when measuring is disabled
+drag_latency = LatencyRecorder("drag") if os.environ.get(LATENCY_ENV) else None
+# From a control command to the frame showing it
+control_latency = LatencyRecorder("control") if os.environ.get(LATENCY_ENV) else None
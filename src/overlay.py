@@ -1,16 +1,80 @@
+import functools
+import os
+import time
 from PyQt5.QtWidgets import (
     QApplication,
     QMainWindow,
     QShortcut,
 )
-from PyQt5.QtGui import QColor, QPainter
-from PyQt5.QtCore import Qt, QRect, QPoint
+from PyQt5.QtGui import QColor, QPainter, QPixmap, QRegion
+from PyQt5.QtCore import Qt, QRect, QPoint, QTimer
 from PyQt5.QtGui import QKeySequence
+from paint_engines import get_paint_engine, PAINT_ENGINE_ENV
+from hit_zones import HitZones, ZONE_CURSORS
+import metrics
+from metrics import stats
+
+WINDOW_OPACITY_ENV = "FOCUS_FRAME_WINDOW_OPACITY"
+# Platforms whose compositor blends setWindowOpacity, offscreen and wayland ignore it
+OPACITY_PLATFORMS = ("xcb", "windows", "cocoa")
+
+
+@functools.lru_cache(maxsize=None)
+def x11_compositor_running():
+    """Whether a compositing manager owns _NET_WM_CM_S<screen>, read through python-xlib.
+
+    False when python-xlib is missing, the overlay then paints its alpha.
+    """
+    try:
+        from Xlib import X, display, error
+    except ImportError:
+        return False
+    try:
+        connection = display.Display()
+    except error.DisplayError:
+        return False
+    try:
+        atom = connection.intern_atom("_NET_WM_CM_S{}".format(connection.get_default_screen()))
+        owner = connection.get_selection_owner(atom)
+        return getattr(owner, "id", owner) != X.NONE
+    except (error.XError, error.ConnectionClosedError):
+        return False
+    finally:
+        connection.close()
+
+
+def window_opacity_supported():
+    """Whether the alpha of the overlay is left to the compositor, "0" or "1" in the env wins"""
+    forced = os.environ.get(WINDOW_OPACITY_ENV)
+    if forced in ("0", "1"):
+        return forced == "1"
+    return platform_window_opacity()
+
+
+def platform_window_opacity():
+    """Whether the platform blends the window opacity"""
+    platform = QApplication.platformName()
+    if platform == "xcb":
+        # Without a compositor the window opacity is ignored
+        return x11_compositor_running()
+    return platform in OPACITY_PLATFORMS
+
+
+def painted_color(color, window_opacity):
+    """Color the pixels are painted with, opaque when the window opacity carries the alpha"""
+    if not window_opacity:
+        return color
+    color = QColor(color)
+    color.setAlpha(255)
+    return color
 
 
 class OverlayWindow(QMainWindow):
-    def __init__(self):
+    """Overlay covering a single screen, the blocks are given in local coordinates"""
+
+    def __init__(self, screen=None, manager=None):
         super().__init__()
+        self.manager = manager
 
         # Default flag
         self.setWindowFlags(
@@ -21,170 +85,321 @@ class OverlayWindow(QMainWindow):
         )
         self.setAttribute(Qt.WA_TranslucentBackground)
 
-        # Get primary screen
-        self.primary_screen = QApplication.primaryScreen()
-        screen_geometry = self.primary_screen.geometry()
-        self.setGeometry(screen_geometry)
+        # Cover the given screen, primary screen by default
+        self.overlay_screen = screen or QApplication.primaryScreen()
+        self.screen_origin = QPoint(0, 0)
+        self.place_on_screen()
 
-        # Block init
-        self.focus_block = QRect(0, 0, 0, 0)
+        # Block init, the main block first
+        self.focus_blocks = []
+        self.hole_region = QRegion()
 
         # Overlay visual settings
         self.overlay_color = QColor(0, 0, 0, 150)
         self.show_focus_block = True
+        self.paint_engine = get_paint_engine(os.environ.get(PAINT_ENGINE_ENV))
+        # Alpha changes, show/hide and fades only change the window opacity, no repaint
+        self.window_opacity = window_opacity_supported()
+        if self.window_opacity:
+            self.apply_opacity()
+
+        # Pre-rendered overlay, repaints are a blit of the exposed area
+        self.surface = None
+        self.surface_key = None
+        self.surface_region = QRegion()
 
         self.block_selected = False
         self.resizing = False
         self.moving = False
         self.offset = None
+        # Index of the block being dragged
+        self.active_hole = 0
+
+        # Mouse moves are coalesced and applied once per display frame
+        self.pending_pos = None
+        self.pending_time = None
+        self.latency_start = None
+        self.frame_timer = QTimer(self)
+        self.frame_timer.setSingleShot(True)
+        self.frame_timer.setTimerType(Qt.PreciseTimer)
+        self.frame_timer.timeout.connect(self.apply_pending_move)
 
         # QShortcut(QKeySequence("Ctrl+T"), self).activated.connect(
         #     self.raiseSettingPanel
         # )
 
         self.adjust_tol = 50
+        self.hit_tol = 20
+        self.hit_zones = None
+        self.cursor_zone = None
+
+    @property
+    def focus_block(self):
+        """Main block"""
+        return QRect(self.focus_blocks[0]) if self.focus_blocks else QRect(0, 0, 0, 0)
+
+    def place_on_screen(self):
+        geometry = self.overlay_screen.geometry()
+        self.screen_origin = geometry.topLeft()
+        self.setGeometry(geometry)
+        if self.windowHandle():
+            self.windowHandle().setScreen(self.overlay_screen)
 
     def paintEvent(self, event):
-        if not self.show_focus_block:
+        # Hidden by the window opacity, the content is kept for showing again
+        if self.show_focus_block or self.window_opacity:
+            if stats.enabled:
+                stats.count("paint")
+                with stats.timer("paint"):
+                    self.paint_overlay(event)
+            else:
+                self.paint_overlay(event)
+        if self.manager and self.manager.latency_marks:
+            self.manager.frame_painted()
+
+    def paint_overlay(self, event):
+        if not self.hole_region.intersects(self.rect()):
+            # No part of any block on this screen, a solid fill is enough
+            self.surface = None
+            painter = QPainter(self)
+            painter.setCompositionMode(QPainter.CompositionMode_Source)
+            painter.fillRect(event.rect(), painted_color(self.overlay_color, self.window_opacity))
             return
 
+        self.render_surface()
+        dpr = self.surface.devicePixelRatio()
         painter = QPainter(self)
-        painter.setBrush(self.overlay_color)
-        painter.setPen(Qt.NoPen)
-
-        # Draw the overlay outside the focus block
-        painter.drawRect(self.rect())
-        # painter.setCompositionMode(QPainter.CompositionMode_Clear) # no selection
-        # painter.fillRect(self.focus_block, Qt.transparent)
-        painter.setCompositionMode(QPainter.CompositionMode_SourceOut)
-        painter.drawRect(self.focus_block)
-        # if alpha=0 then the focus block will be not selectable
-        # set to 1
-        painter.fillRect(self.focus_block, QColor(0, 0, 0, 1))
-
-    def is_near_resize_corner(self, pos, tolerance=20):
-        return (self.focus_block.bottomRight() - pos).manhattanLength() < tolerance
+        painter.setCompositionMode(QPainter.CompositionMode_Source)
+        for rect in event.region().rects():
+            source = QRect(
+                round(rect.x() * dpr),
+                round(rect.y() * dpr),
+                round(rect.width() * dpr),
+                round(rect.height() * dpr),
+            )
+            painter.drawPixmap(rect, self.surface, source)
+        painter.end()
 
-    def update_cursor(self, pos):
-        corner = self.is_near_resize_corner(pos)
-        edge = self.is_near_resize_edge(pos)
-
-        if corner:
-            if corner in ["top_left", "bottom_right"]:
-                self.setCursor(Qt.SizeFDiagCursor)
-            elif corner in ["top_right", "bottom_left"]:
-                self.setCursor(Qt.SizeBDiagCursor)
-        elif edge:
-            if edge in ["top", "bottom"]:
-                self.setCursor(Qt.SizeVerCursor)
-            elif edge in ["left", "right"]:
-                self.setCursor(Qt.SizeHorCursor)
-        elif self.focus_block.contains(pos):
-            self.setCursor(Qt.SizeAllCursor)
+        if self.latency_start is not None:
+            metrics.drag_latency.record(time.perf_counter() - self.latency_start)
+            self.latency_start = None
+
+    def render_surface(self):
+        """Bring the cached overlay surface up to date with the current inputs"""
+        clickable = not self.windowFlags() & Qt.WindowTransparentForInput
+        dpr = self.devicePixelRatioF()
+        color = painted_color(self.overlay_color, self.window_opacity)
+        key = (color.rgba(), self.size(), dpr, self.paint_engine.name, clickable)
+
+        if self.surface is None or key != self.surface_key:
+            # Full rebuild
+            stats.count("surface_rebuild")
+            self.surface = QPixmap(self.size() * dpr)
+            self.surface.setDevicePixelRatio(dpr)
+            self.surface.fill(Qt.transparent)
+            damage = None
+        elif self.surface_region != self.hole_region:
+            # Only blocks moved, redraw the pixels whose coverage changed
+            damage = self.surface_region.xored(self.hole_region)
+        else:
+            return
+
+        painter = QPainter(self.surface)
+        if damage is not None:
+            painter.setClipRegion(damage)
+            painter.setCompositionMode(QPainter.CompositionMode_Source)
+            painter.fillRect(self.rect(), Qt.transparent)
+            painter.setCompositionMode(QPainter.CompositionMode_SourceOver)
+        self.paint_engine.paint(painter, self.rect(), self.hole_region, color, clickable)
+        painter.end()
+
+        self.surface_key = key
+        self.surface_region = QRegion(self.hole_region)
+
+    def set_overlay_color(self, color: QColor):
+        if color.rgba() == self.overlay_color.rgba():
+            return
+        repaint = not self.window_opacity or color.rgb() != self.overlay_color.rgb()
+        self.overlay_color = QColor(color)
+        if self.window_opacity:
+            self.apply_opacity()
+        if repaint:
+            self.update()
+
+    def set_show_focus_block(self, show: bool):
+        if show == self.show_focus_block:
+            return
+        self.show_focus_block = show
+        if self.window_opacity:
+            self.apply_opacity()
         else:
-            self.setCursor(Qt.ArrowCursor)
+            self.update()
+
+    def set_window_opacity(self, enabled: bool):
+        """Leave the alpha to the compositor or paint it, e.g. to compare both"""
+        if enabled == self.window_opacity:
+            return
+        self.window_opacity = enabled
+        self.setWindowOpacity(1.0)
+        if enabled:
+            self.apply_opacity()
+        self.update()
+
+    def apply_opacity(self):
+        if stats.enabled:
+            stats.count("opacity_change")
+        self.setWindowOpacity(self.overlay_color.alphaF() if self.show_focus_block else 0.0)
+
+    def set_paint_engine(self, name):
+        self.paint_engine = get_paint_engine(name)
+        self.update()
+
+    def set_focus_blocks(self, rects):
+        """Move the focus blocks and repaint only the area of the blocks that changed"""
+        if rects == self.focus_blocks:
+            return False
+        # Pixels that are inside exactly one of the old and new block, per changed block
+        damage = QRegion()
+        changed = []
+        for idx in range(max(len(rects), len(self.focus_blocks))):
+            old = self.focus_blocks[idx] if idx < len(self.focus_blocks) else QRect()
+            new = rects[idx] if idx < len(rects) else QRect()
+            if old != new:
+                damage = damage.united(QRegion(old).xored(QRegion(new)))
+                changed.append(idx)
+        resized = len(rects) != len(self.focus_blocks)
+        self.focus_blocks = [QRect(rect) for rect in rects]
+        self.hole_region = QRegion()
+        for rect in self.focus_blocks:
+            self.hole_region = self.hole_region.united(rect)
+        if resized:
+            self.hit_zones = None
+        elif self.hit_zones is not None:
+            for idx in changed:
+                self.hit_zones.set_block(idx, self.focus_blocks[idx])
+        self.update(damage)
+        return True
+
+    def set_focus_block(self, rect: QRect):
+        """Single block, no further holes"""
+        return self.set_focus_blocks([rect])
+
+    def set_hit_tolerance(self, tolerance):
+        self.hit_tol = tolerance
+        self.hit_zones = None
+
+    def zone_at(self, pos):
+        """Handle under the cursor and the index of its block"""
+        if self.hit_zones is None:
+            self.hit_zones = HitZones(self.focus_blocks, self.hit_tol)
+        return self.hit_zones.zone_at(pos)
+
+    def update_cursor(self, pos):
+        zone, _ = self.zone_at(pos)
+        if zone != self.cursor_zone:
+            self.cursor_zone = zone
+            self.setCursor(ZONE_CURSORS[zone])
 
     def mousePressEvent(self, event):
         if event.button() == Qt.LeftButton:
-            corner = self.is_near_resize_corner(event.pos())
-            edge = self.is_near_resize_edge(event.pos())
-
-            if corner:
-                self.resizing = corner  # Store the corner being resized
-            elif edge:
-                self.resizing = edge  # Store the edge being resized
-            elif self.focus_block.contains(event.pos()):
+            zone, hole = self.zone_at(event.pos())
+            if zone:
+                self.active_hole = hole
+
+            if zone == "move":
                 self.moving = True
-                self.offset = event.pos() - self.focus_block.topLeft()
+                self.offset = event.pos() - self.focus_blocks[hole].topLeft()
+            elif zone:
+                self.resizing = zone  # Store the corner or edge being resized
+
+    def drag_bounds(self):
+        """Area the block may be dragged in, in local coordinates"""
+        if self.manager:
+            return self.manager.virtual_geometry().translated(-self.screen_origin)
+        return self.rect()
+
+    def frame_interval(self):
+        """Milliseconds per frame of the screen this window is on"""
+        refresh_rate = self.overlay_screen.refreshRate() or 60
+        return max(1, int(1000 / refresh_rate))
 
     def mouseMoveEvent(self, event):
-        self.update_cursor(event.pos())
+        # Only the latest position matters, it is applied on the next frame
+        if stats.enabled:
+            stats.count("mouse_received")
+        if self.pending_pos is None and metrics.drag_latency:
+            self.pending_time = time.perf_counter()
+        self.pending_pos = event.pos()
+        if not self.frame_timer.isActive():
+            self.frame_timer.start(self.frame_interval())
 
+    def apply_pending_move(self):
+        if self.pending_pos is None:
+            return
+        pos = self.pending_pos
+        self.pending_pos = None
+        self.update_cursor(pos)
+
+        if not self.resizing and not self.moving:
+            return
+
+        # Work on a copy so the old block is still known for the damage region
+        hole = self.active_hole
+        block = QRect(self.focus_blocks[hole])
+        bounds = self.drag_bounds()
+        bounds_right = bounds.x() + bounds.width()
+        bounds_bottom = bounds.y() + bounds.height()
         if isinstance(self.resizing, str):
             if "top" in self.resizing:
-                new_top = min(
-                    self.focus_block.bottom() - self.adjust_tol, max(0, event.y())
-                )
-                if new_top != self.focus_block.top():
-                    self.focus_block.setTop(new_top)
+                new_top = min(block.bottom() - self.adjust_tol, max(bounds.y(), pos.y()))
+                if new_top != block.top():
+                    block.setTop(new_top)
             if "bottom" in self.resizing:
                 new_bottom = max(
-                    self.focus_block.top() + self.adjust_tol,
-                    min(self.height(), event.y()),
+                    block.top() + self.adjust_tol,
+                    min(bounds_bottom, pos.y()),
                 )
-                if new_bottom != self.focus_block.bottom():
-                    self.focus_block.setBottom(new_bottom)
+                if new_bottom != block.bottom():
+                    block.setBottom(new_bottom)
             if "left" in self.resizing:
-                new_left = min(
-                    self.focus_block.right() - self.adjust_tol, max(0, event.x())
-                )
-                if new_left != self.focus_block.left():
-                    self.focus_block.setLeft(new_left)
+                new_left = min(block.right() - self.adjust_tol, max(bounds.x(), pos.x()))
+                if new_left != block.left():
+                    block.setLeft(new_left)
             if "right" in self.resizing:
                 new_right = max(
-                    self.focus_block.left() + self.adjust_tol,
-                    min(self.width(), event.x()),
+                    block.left() + self.adjust_tol,
+                    min(bounds_right, pos.x()),
                 )
-                if new_right != self.focus_block.right():
-                    self.focus_block.setRight(new_right)
+                if new_right != block.right():
+                    block.setRight(new_right)
         elif self.moving:
-            new_pos = event.pos() - self.offset
-            new_x = max(0, min(self.width() - self.focus_block.width(), new_pos.x()))
-            new_y = max(0, min(self.height() - self.focus_block.height(), new_pos.y()))
-            if new_x != self.focus_block.x() or new_y != self.focus_block.y():
-                self.focus_block.moveTopLeft(QPoint(new_x, new_y))
-
-        if hasattr(self, "settings") and self.settings:
-            if not self.settings.isActiveWindow():
-                self.settings.raise_()
-            presets = self.settings.presets[self.settings.current_preset_idx]
-            presets['x'] = self.focus_block.x()
-            presets['y'] = self.focus_block.y()
-            presets['w'] = self.focus_block.width()
-            presets['h'] = self.focus_block.height()
-            self.settings.update_xywh_spinbox()
-        self.update()
+            new_pos = pos - self.offset
+            new_x = max(bounds.x(), min(bounds_right - block.width(), new_pos.x()))
+            new_y = max(bounds.y(), min(bounds_bottom - block.height(), new_pos.y()))
+            if new_x != block.x() or new_y != block.y():
+                block.moveTopLeft(QPoint(new_x, new_y))
+
+        # Nothing moved, so nothing to repaint or write back
+        if block == self.focus_blocks[hole]:
+            return
+
+        if stats.enabled:
+            stats.count("mouse_applied")
+        if self.pending_time is not None:
+            self.latency_start = self.pending_time
+            self.pending_time = None
+
+        if self.manager:
+            self.manager.move_focus_block(hole, block.translated(self.screen_origin))
+        else:
+            blocks = list(self.focus_blocks)
+            blocks[hole] = block
+            self.set_focus_blocks(blocks)
 
     def mouseReleaseEvent(self, event):
+        self.frame_timer.stop()
+        self.apply_pending_move()
         self.resizing = False
         self.moving = False
+        self.cursor_zone = None
         self.setCursor(Qt.ArrowCursor)
-
-    def is_near_resize_corner(self, pos, tolerance=20):
-        corners = {
-            "top_left": self.focus_block.topLeft(),
-            "top_right": self.focus_block.topRight(),
-            "bottom_left": self.focus_block.bottomLeft(),
-            "bottom_right": self.focus_block.bottomRight(),
-        }
-        for key, corner in corners.items():
-            if (corner - pos).manhattanLength() < tolerance:
-                return key
-        return None
-
-    def is_near_resize_edge(self, pos, tolerance=20):
-        edges = {
-            "top": abs(pos.y() - self.focus_block.top()) < tolerance
-            and self.focus_block.contains(
-                QPoint(pos.x(), self.focus_block.center().y())
-            ),
-            "bottom": abs(pos.y() - self.focus_block.bottom()) < tolerance
-            and self.focus_block.contains(
-                QPoint(pos.x(), self.focus_block.center().y())
-            ),
-            "left": abs(pos.x() - self.focus_block.left()) < tolerance
-            and self.focus_block.contains(
-                QPoint(self.focus_block.center().x(), pos.y())
-            ),
-            "right": abs(pos.x() - self.focus_block.right()) < tolerance
-            and self.focus_block.contains(
-                QPoint(self.focus_block.center().x(), pos.y())
-            ),
-        }
-        for key, hit in edges.items():
-            if hit:
-                return key
-        return None
-
-    def setSettingPanel(self, settings):
-        self.settings = settings
@@ -0,0 +1,279 @@
+import os
+import time
+from PyQt5.QtWidgets import QApplication
+from PyQt5.QtGui import QColor
+from PyQt5.QtCore import Qt, QObject, QEvent, QRect, QTimer, pyqtSignal
+from strip_overlay import DEFAULT_TOPOLOGY, TOPOLOGY_ENV, WINDOW_TOPOLOGIES
+from animation import TransitionAnimator
+from tracking import Tracker
+from paint_engines import DEFAULT_PAINT_ENGINE, PAINT_ENGINE_ENV, PAINT_ENGINES
+from preset_model import PresetModel
+
+
+class OverlayManager(QObject):
+    """Keeps one overlay per screen, the blocks are given in global coordinates.
+
+    An overlay is a full screen OverlayWindow or, with the "strips"
+    topology, a StripOverlay of one window per band around the blocks.
+    """
+
+    screens_changed = pyqtSignal()
+    # Once, after the first window has painted
+    first_frame_painted = pyqtSignal()
+    # Overlay shown or hidden, also when not asked by the settings panel
+    visibility_changed = pyqtSignal(bool)
+
+    def __init__(self, model: PresetModel):
+        super().__init__()
+        self.model = model
+
+        # Block init, the main block first
+        self.focus_blocks = []
+        # Shown instead of the preset's main block while tracking
+        self.tracked_block = None
+
+        # Overlay visual settings
+        self.overlay_color = QColor(0, 0, 0, 150)
+        self.show_focus_block = True
+        self.size_adjustment = False
+        self.paint_engine_name = os.environ.get(PAINT_ENGINE_ENV)
+        if self.paint_engine_name not in PAINT_ENGINES:
+            self.paint_engine_name = DEFAULT_PAINT_ENGINE
+        self.topology = os.environ.get(TOPOLOGY_ENV)
+        if self.topology not in WINDOW_TOPOLOGIES:
+            self.topology = DEFAULT_TOPOLOGY
+
+        self.visible = False
+        self.painted = False
+        self.windows = {}
+        # (LatencyRecorder, start) recorded by the next painted frame
+        self.latency_marks = []
+
+        app = QApplication.instance()
+        for screen in app.screens():
+            self.add_screen(screen)
+        app.screenAdded.connect(self.add_screen)
+        app.screenRemoved.connect(self.remove_screen)
+        app.primaryScreenChanged.connect(self.update_model_screens)
+
+        # Preset switches and visibility toggles can be animated
+        self.animator = TransitionAnimator(self)
+        # The main block can follow the cursor or the active window
+        self.tracker = Tracker(self)
+
+        # The overlay only follows the model, one model change is one repaint
+        self.model.current_changed.connect(self.apply_preset)
+        self.model.geometry_changed.connect(self.apply_geometry)
+        self.model.appearance_changed.connect(self.apply_color)
+
+    def add_screen(self, screen):
+        self.windows[screen] = self.create_window(screen)
+        screen.geometryChanged.connect(lambda _, screen=screen: self.relayout_screen(screen))
+        self.update_model_screens()
+        self.screens_changed.emit()
+
+    def create_window(self, screen):
+        window = WINDOW_TOPOLOGIES[self.topology](screen, self)
+        window.set_overlay_color(self.overlay_color)
+        window.set_show_focus_block(self.show_focus_block)
+        window.set_paint_engine(self.paint_engine_name)
+        window.set_focus_blocks(self.local_blocks(window))
+        if not self.painted:
+            window.installEventFilter(self)
+        if self.size_adjustment:
+            window.setWindowFlags(self.window_flags())
+        if self.visible:
+            window.show()
+        return window
+
+    def remove_screen(self, screen):
+        window = self.windows.pop(screen, None)
+        if window:
+            window.close()
+            window.deleteLater()
+        self.update_model_screens()
+        self.screens_changed.emit()
+
+    def relayout_screen(self, screen):
+        window = self.windows.get(screen)
+        if window is None:
+            return
+        window.place_on_screen()
+        window.set_focus_blocks(self.local_blocks(window))
+        self.update_model_screens()
+        self.screens_changed.emit()
+
+    def update_model_screens(self, _=None):
+        """Relative presets are laid out again, the block follows if the current one moved"""
+        self.model.set_screens(
+            self.primary_geometry(), [screen.geometry() for screen in self.windows]
+        )
+
+    def eventFilter(self, obj, event):
+        # Only installed until the first frame, nothing to do on the hot path
+        if event.type() == QEvent.Paint and not self.painted:
+            self.painted = True
+            for window in self.windows.values():
+                window.removeEventFilter(self)
+            # Emitted once the frame is done
+            QTimer.singleShot(0, self.first_frame_painted.emit)
+        return False
+
+    def view_state(self):
+        """What the windows show, compared to tell whether a change needs a frame"""
+        return (
+            [QRect(rect) for rect in self.focus_blocks],
+            self.overlay_color.rgba(),
+            self.show_focus_block,
+            self.animator.is_active(),
+        )
+
+    def mark_latency(self, recorder, start):
+        """Record the time from start to the next frame, a mark that got no frame is dropped"""
+        self.latency_marks = [(recorder, start)]
+
+    def frame_painted(self):
+        now = time.perf_counter()
+        for recorder, start in self.latency_marks:
+            recorder.record(now - start)
+        self.latency_marks = []
+
+    def virtual_geometry(self):
+        geometry = QRect()
+        for screen in self.windows:
+            geometry = geometry.united(screen.geometry())
+        return geometry
+
+    def primary_geometry(self):
+        return QApplication.primaryScreen().geometry()
+
+    def screen_geometry_at(self, point):
+        """Geometry of the screen containing point, primary screen otherwise"""
+        screen = QApplication.screenAt(point)
+        if screen is None:
+            return self.primary_geometry()
+        return screen.geometry()
+
+    def window_flags(self):
+        flags = Qt.FramelessWindowHint | Qt.WindowStaysOnTopHint | Qt.SubWindow
+        if not self.size_adjustment:
+            flags |= Qt.WindowTransparentForInput
+        return flags
+
+    def show(self):
+        self.visible = True
+        for window in self.windows.values():
+            window.show()
+
+    def close(self):
+        self.visible = False
+        for window in self.windows.values():
+            window.close()
+
+    def local_blocks(self, window):
+        return [rect.translated(-window.screen_origin) for rect in self.focus_blocks]
+
+    def set_focus_blocks(self, rects):
+        if rects == self.focus_blocks:
+            return False
+        self.focus_blocks = [QRect(rect) for rect in rects]
+        for window in self.windows.values():
+            window.set_focus_blocks(self.local_blocks(window))
+        return True
+
+    def shown_blocks(self):
+        """Blocks of the current preset, the main block replaced while tracking"""
+        rects = self.model.holes()
+        if self.tracked_block is not None:
+            rects[0] = self.tracked_block
+        return rects
+
+    def set_tracked_block(self, rect):
+        """Show rect as the main block, None goes back to the preset's"""
+        if rect == self.tracked_block:
+            return
+        self.tracked_block = QRect(rect) if rect is not None else None
+        if self.animator.is_active():
+            self.animator.retarget(self.shown_blocks())
+        else:
+            self.set_focus_blocks(self.shown_blocks())
+
+    def apply_preset(self, index):
+        if self.animator.enabled and self.visible and self.show_focus_block:
+            self.animator.animate_to(self.shown_blocks(), self.model.color())
+
+    def apply_geometry(self, rect: QRect):
+        # The main block and the holes are shown together
+        rects = self.shown_blocks()
+        # Already on its way there
+        if self.animator.is_animating_to(rects=rects):
+            return
+        self.animator.finish()
+        self.set_focus_blocks(rects)
+
+    def apply_color(self, color: QColor):
+        if self.animator.is_animating_to(color=color):
+            return
+        self.animator.finish()
+        self.set_overlay_color(color)
+
+    def move_focus_block(self, hole, rect: QRect):
+        """Block dragged on one of the windows, the model notifies every view"""
+        self.model.set_hole_geometry(hole, rect)
+
+    def set_overlay_color(self, color: QColor):
+        self.overlay_color = QColor(color)
+        for window in self.windows.values():
+            window.set_overlay_color(color)
+
+    def set_show_focus_block(self, show: bool):
+        self.show_focus_block = show
+        for window in self.windows.values():
+            window.set_show_focus_block(show)
+
+    def set_focus_block_visible(self, show: bool):
+        """Show or hide the overlay, fading when animations are enabled"""
+        self.visibility_changed.emit(show)
+        if not self.animator.enabled:
+            self.set_show_focus_block(show)
+            return
+
+        color = self.model.color()
+        transparent = QColor(color)
+        transparent.setAlpha(0)
+        if show:
+            if not self.show_focus_block:
+                self.set_overlay_color(transparent)
+                self.set_show_focus_block(True)
+            self.animator.animate_to(color=color)
+        elif self.show_focus_block:
+
+            def hide():
+                self.set_show_focus_block(False)
+                self.set_overlay_color(color)
+
+            self.animator.animate_to(color=transparent, on_finished=hide)
+
+    def set_paint_engine(self, name):
+        self.paint_engine_name = name
+        for window in self.windows.values():
+            window.set_paint_engine(name)
+
+    def set_topology(self, name):
+        """Replace the windows of every screen by the given topology"""
+        if name == self.topology or name not in WINDOW_TOPOLOGIES:
+            return
+        self.topology = name
+        for screen, window in list(self.windows.items()):
+            window.close()
+            window.deleteLater()
+            self.windows[screen] = self.create_window(screen)
+
+    def set_size_adjustment(self, enabled: bool):
+        self.size_adjustment = enabled
+        flags = self.window_flags()
+        for window in self.windows.values():
+            window.setWindowFlags(flags)
+            window.place_on_screen()
+            if self.visible:
+                window.show()
@@ -0,0 +1,79 @@
+from PyQt5.QtGui import QColor, QPainter, QRegion
+from PyQt5.QtCore import Qt, QRect
+
+PAINT_ENGINE_ENV = "FOCUS_FRAME_PAINT_ENGINE"
+
+# if alpha=0 then the focus block will be not selectable, so fill it with alpha=1
+HOLE_COLOR = QColor(0, 0, 0, 1)
+
+
+class PaintEngine:
+    """Strategy that draws the overlay color everywhere except the focus blocks.
+
+    holes is the union of the focus blocks as a QRegion, its rects do not
+    overlap, so every pixel is painted once however many blocks there are.
+    """
+
+    name = ""
+
+    def paint(self, painter: QPainter, rect: QRect, holes: QRegion, color: QColor, clickable: bool):
+        raise NotImplementedError
+
+
+class CompositePaintEngine(PaintEngine):
+    """Fill everything, then punch the blocks out with SourceOut composition"""
+
+    name = "composite"
+
+    def paint(self, painter, rect, holes, color, clickable):
+        painter.setBrush(color)
+        painter.setPen(Qt.NoPen)
+
+        # Draw the overlay outside the focus blocks
+        painter.drawRect(rect)
+        painter.setCompositionMode(QPainter.CompositionMode_SourceOut)
+        for block in holes.rects():
+            painter.drawRect(block)
+            painter.fillRect(block, HOLE_COLOR)
+        painter.setCompositionMode(QPainter.CompositionMode_SourceOver)
+
+
+class BandPaintEngine(PaintEngine):
+    """Fill the bands around the blocks directly, no composition"""
+
+    name = "bands"
+
+    def paint(self, painter, rect, holes, color, clickable):
+        # The region splits the area outside of the blocks into bands
+        for band in QRegion(rect).subtracted(holes).rects():
+            painter.fillRect(band, color)
+        if clickable:
+            for block in holes.intersected(QRegion(rect)).rects():
+                painter.fillRect(block, HOLE_COLOR)
+
+
+class RegionPaintEngine(PaintEngine):
+    """Clip to the screen region minus the blocks and fill once"""
+
+    name = "region"
+
+    def paint(self, painter, rect, holes, color, clickable):
+        painter.save()
+        painter.setClipRegion(QRegion(rect).subtracted(holes), Qt.IntersectClip)
+        painter.fillRect(rect, color)
+        painter.restore()
+        if clickable:
+            for block in holes.intersected(QRegion(rect)).rects():
+                painter.fillRect(block, HOLE_COLOR)
+
+
+PAINT_ENGINES = {
+    engine.name: engine
+    for engine in (CompositePaintEngine, BandPaintEngine, RegionPaintEngine)
+}
+DEFAULT_PAINT_ENGINE = CompositePaintEngine.name
+
+
+def get_paint_engine(name):
+    """Return a paint engine by name, falling back to the default one"""
+    return PAINT_ENGINES.get(name, PAINT_ENGINES[DEFAULT_PAINT_ENGINE])()
@@ -0,0 +1,441 @@
+from contextlib import contextmanager
+from PyQt5.QtGui import QColor
+from PyQt5.QtCore import Qt, QAbstractListModel, QModelIndex, QRect, pyqtSignal
+from utils import hex_to_color
+from metrics import stats
+from validator import SCHEMA_VERSION
+from preset_table import Preset, PresetTable, hole_dicts
+from layout import ScreenLayout, NORMALIZED_DIGITS
+
+GEOMETRY_KEYS = ("x", "y", "w", "h")
+APPEARANCE_KEYS = ("alpha", "color")
+MODE_KEYS = ("xy_abs", "wh_abs")
+
+
+class PresetModel(QAbstractListModel):
+    """Preset collection shared by the overlay and the settings panel.
+
+    Writes are grouped in transactions, every transaction emits at most one
+    notification per kind of change, no matter how many fields were written.
+    As a list model it lists the preset names, with row level signals for
+    inserts, removals and renames, and keeps a name index so that lookups
+    do not scan the collection. The presets are kept in a PresetTable.
+
+    Relative coordinates are stored normalized, the pixel rects of all
+    presets are cached for the current screens and recomputed in one batch
+    when the screens change. Holes besides the main block are laid out
+    when asked for, only the current preset's are shown.
+    """
+
+    # Current preset changed, main block or any of its holes
+    geometry_changed = pyqtSignal(QRect)
+    appearance_changed = pyqtSignal(QColor)
+    mode_changed = pyqtSignal()
+    # Another preset became the current one
+    current_changed = pyqtSignal(int)
+    collection_name_changed = pyqtSignal(str)
+    # Journal entry of every edit, e.g. {"op": "set", "idx": 0, "fields": {"x": 10}}
+    edited = pyqtSignal(dict)
+
+    def __init__(self):
+        super().__init__()
+        self.collection_name = "Untitiled"
+        # Fields of the collection outside the schema, kept for to_dict
+        self.collection_extra = {}
+        self.presets = PresetTable()
+        self.current_idx = 0
+        # name -> row, moved rows are fixed in place, rebuilt lazily after a reset
+        self.name_rows = {}
+        self.layout = ScreenLayout()
+        # Pixel rect of every row as a tuple, computed lazily after a reset
+        self.pixel_boxes = None
+
+        self.transaction_depth = 0
+        self.pending = set()
+        self.pending_edits = {}
+
+    @contextmanager
+    def transaction(self):
+        self.transaction_depth += 1
+        try:
+            yield self
+        finally:
+            self.transaction_depth -= 1
+            if self.transaction_depth == 0:
+                self.flush()
+
+    def notify(self, kind):
+        self.pending.add(kind)
+        if self.transaction_depth == 0:
+            self.flush()
+
+    def emit_edit(self, entry):
+        # Field writes come first, they refer to the indices before this edit
+        self.flush_edits()
+        self.edited.emit(entry)
+
+    def flush_edits(self):
+        pending_edits = self.pending_edits
+        self.pending_edits = {}
+        for idx, fields in pending_edits.items():
+            self.edited.emit({"op": "set", "idx": idx, "fields": fields})
+
+    def flush(self):
+        self.flush_edits()
+        pending = self.pending
+        self.pending = set()
+        if stats.enabled:
+            for kind in pending:
+                stats.count("model_" + kind)
+        if "current" in pending:
+            self.current_changed.emit(self.current_idx)
+        if "geometry" in pending:
+            self.geometry_changed.emit(self.geometry())
+        if "appearance" in pending:
+            self.appearance_changed.emit(self.color())
+        if "mode" in pending:
+            self.mode_changed.emit()
+
+    def current(self):
+        """Copy of the current preset, written through update"""
+        return self.presets.row(self.current_idx)
+
+    def get(self, key):
+        """One field of the current preset"""
+        return self.presets.get(self.current_idx, key)
+
+    def geometry(self):
+        """Pixel rect of the current preset in virtual desktop coordinates"""
+        return QRect(*self.pixel_box(self.current_idx))
+
+    def holes(self):
+        """Pixel rects of every focus block of the current preset, the main block first"""
+        return [QRect(*box) for box in self.hole_boxes(self.current_idx)]
+
+    # Layout
+
+    def pixel_box(self, row):
+        """(x, y, w, h) of the pixel rect of row"""
+        if self.pixel_boxes is None:
+            with stats.timer("layout_batch"):
+                self.pixel_boxes = self.layout.layout_table(self.presets)
+        return self.pixel_boxes[row]
+
+    def pixel_rect(self, row):
+        return QRect(*self.pixel_box(row))
+
+    def hole_boxes(self, row):
+        boxes = [self.pixel_box(row)]
+        holes = self.presets.holes[row]
+        if holes:
+            xy_abs = self.presets.get(row, "xy_abs")
+            wh_abs = self.presets.get(row, "wh_abs")
+            pixel_box = self.layout.pixel_box
+            boxes.extend(pixel_box(x, y, w, h, xy_abs, wh_abs) for x, y, w, h in holes)
+        return boxes
+
+    def layout_row(self, row):
+        get = self.presets.get
+        return self.layout.pixel_box(*(get(row, key) for key in GEOMETRY_KEYS + MODE_KEYS))
+
+    def set_screens(self, primary: QRect, screens):
+        """Screens relative presets are laid out on, every cached rect is recomputed"""
+        self.layout = ScreenLayout(primary, screens)
+        if not len(self.presets):
+            self.pixel_boxes = None
+            return
+        old = self.pixel_boxes[self.current_idx] if self.pixel_boxes is not None else None
+        self.pixel_boxes = None
+        # Only the views of the current preset hear of it
+        if self.pixel_box(self.current_idx) != old or self.presets.holes[self.current_idx]:
+            self.notify("geometry")
+
+    def color(self):
+        color = hex_to_color(self.get("color"))
+        color.setAlpha(self.get("alpha"))
+        return color
+
+    # QAbstractListModel
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.presets)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or role not in (Qt.DisplayRole, Qt.EditRole):
+            return None
+        return self.presets.names[index.row()]
+
+    # Name index
+
+    def names(self):
+        return list(self.presets.names)
+
+    def name_index(self):
+        if self.name_rows is None:
+            self.name_rows = {name: row for row, name in enumerate(self.presets.names)}
+        return self.name_rows
+
+    def index_rows_from(self, row):
+        """Index the rows from row on again after they moved, the rows before kept theirs"""
+        names = self.presets.names
+        name_rows = self.name_rows
+        for idx in range(row, len(names)):
+            name_rows[names[idx]] = idx
+
+    def has_name(self, name):
+        return name in self.name_index()
+
+    def row_of(self, name):
+        """Row of the preset called name, -1 when there is none"""
+        return self.name_index().get(name, -1)
+
+    def update(self, **fields):
+        """Write fields of the current preset, unchanged values are skipped.
+
+        x, y, w and h are pixels in absolute mode and normalized otherwise,
+        holes (x, y, w, h) tuples in the same units.
+        """
+        idx = self.current_idx
+        relayout = False
+        for key, value in fields.items():
+            if key in GEOMETRY_KEYS:
+                mode = "xy_abs" if key in ("x", "y") else "wh_abs"
+                if self.presets.get(idx, mode):
+                    value = round(value)
+                else:
+                    value = round(value, NORMALIZED_DIGITS)
+            old = self.presets.get(idx, key)
+            if old == value and type(old) is type(value):
+                continue
+            self.presets.set(idx, key, value)
+            if key == "holes":
+                self.pending_edits.setdefault(idx, {})[key] = hole_dicts(value)
+                self.notify("geometry")
+                continue
+            self.pending_edits.setdefault(idx, {})[key] = value
+            if key in GEOMETRY_KEYS:
+                relayout = True
+            elif key in APPEARANCE_KEYS:
+                self.notify("appearance")
+            else:
+                relayout = relayout or key in MODE_KEYS
+                self.notify("mode")
+
+        if relayout:
+            rect = self.layout_row(idx)
+            if self.pixel_boxes is None or self.pixel_boxes[idx] != rect:
+                if self.pixel_boxes is not None:
+                    self.pixel_boxes[idx] = rect
+                self.notify("geometry")
+        # A stored value can change without moving the pixel rect, it is journaled all the same
+        if self.pending_edits and self.transaction_depth == 0:
+            self.flush_edits()
+
+    def set_geometry(self, rect: QRect):
+        """Move the current preset to a pixel rect, stored in its own modes"""
+        with self.transaction():
+            self.update(
+                **self.layout.stored_geometry(rect, self.get("xy_abs"), self.get("wh_abs"))
+            )
+
+    def stored_hole(self, rect: QRect):
+        """(x, y, w, h) of a pixel rect in the modes of the current preset"""
+        stored = self.layout.stored_geometry(rect, self.get("xy_abs"), self.get("wh_abs"))
+        return tuple(stored[key] for key in GEOMETRY_KEYS)
+
+    def set_holes(self, rects):
+        """Move every focus block of the current preset, the first rect is the main block"""
+        with self.transaction():
+            self.set_geometry(rects[0])
+            self.update(holes=tuple(self.stored_hole(rect) for rect in rects[1:]))
+
+    def set_hole_geometry(self, hole, rect: QRect):
+        """Move one focus block, 0 is the main block"""
+        if hole == 0:
+            self.set_geometry(rect)
+            return
+        holes = list(self.get("holes"))
+        holes[hole - 1] = self.stored_hole(rect)
+        self.update(holes=tuple(holes))
+
+    def add_hole(self, rect: QRect):
+        self.update(holes=self.get("holes") + (self.stored_hole(rect),))
+
+    def remove_hole(self, hole):
+        """Remove a focus block besides the main one"""
+        holes = list(self.get("holes"))
+        del holes[hole - 1]
+        self.update(holes=tuple(holes))
+
+    def set_mode(self, **modes):
+        """Switch xy_abs and wh_abs, converting the coordinates so the blocks stay put"""
+        rects = self.holes()
+        with self.transaction():
+            self.update(**modes)
+            self.set_holes(rects)
+
+    def set_current(self, idx):
+        if idx < 0 or idx >= len(self.presets) or idx == self.current_idx:
+            return
+        self.current_idx = idx
+        with self.transaction():
+            for kind in ("current", "geometry", "appearance", "mode"):
+                self.notify(kind)
+
+    def reset(self, collection_name, presets, extra=None):
+        """Replace the whole collection, this is not an edit of the old one.
+
+        presets is a PresetTable or the preset dicts of a collection, raises
+        ValueError when there is none. extra are the fields of the collection
+        outside the schema, written back by to_dict.
+        """
+        if not isinstance(presets, PresetTable):
+            presets = PresetTable.from_dicts(presets)
+        # Checked before the views are told, they need a current preset
+        if not len(presets):
+            raise ValueError("a preset collection needs at least one preset")
+        self.pending_edits = {}
+        self.beginResetModel()
+        self.collection_name = collection_name
+        self.collection_extra = dict(extra or {})
+        self.presets = presets
+        self.current_idx = 0
+        self.name_rows = None
+        self.pixel_boxes = None
+        self.endResetModel()
+        with self.transaction():
+            self.collection_name_changed.emit(collection_name)
+            for kind in ("current", "geometry", "appearance", "mode"):
+                self.notify(kind)
+
+    def set_collection_name(self, name):
+        self.collection_name = name
+        self.emit_edit({"op": "name", "name": name})
+        self.collection_name_changed.emit(name)
+
+    def insert_row(self, row, preset):
+        self.beginInsertRows(QModelIndex(), row, row)
+        self.presets.insert(row, preset)
+        if self.pixel_boxes is not None:
+            self.pixel_boxes.insert(row, self.layout_row(row))
+        if self.name_rows is not None:
+            self.index_rows_from(row)
+        # Before the view hears of it, so its current index agrees with ours
+        if row <= self.current_idx and len(self.presets) > 1:
+            self.current_idx += 1
+        self.endInsertRows()
+
+    def remove_row(self, idx):
+        self.beginRemoveRows(QModelIndex(), idx, idx)
+        name = self.presets.pop(idx).preset_name
+        if self.pixel_boxes is not None:
+            del self.pixel_boxes[idx]
+        if self.name_rows is not None:
+            if self.name_rows.get(name) == idx:
+                del self.name_rows[name]
+            self.index_rows_from(idx)
+            if name not in self.name_rows and name in self.presets.names:
+                # Another preset of the same name before it, rare enough for a rebuild
+                self.name_rows = None
+        if idx < self.current_idx or self.current_idx >= len(self.presets):
+            self.current_idx = max(0, self.current_idx - 1)
+        self.endRemoveRows()
+
+    def add(self, preset):
+        """Append a Preset or a preset dict"""
+        if not isinstance(preset, Preset):
+            preset = Preset.from_dict(preset)
+        row = len(self.presets)
+        self.insert_row(row, preset)
+        self.emit_edit({"op": "insert", "idx": row, "preset": preset.to_dict()})
+
+    def rename(self, idx, name):
+        name_rows = self.name_index()
+        name_rows.pop(self.presets.names[idx], None)
+        self.presets.set(idx, "preset_name", name)
+        name_rows[name] = idx
+        index = self.index(idx)
+        self.dataChanged.emit(index, index, [Qt.DisplayRole, Qt.EditRole])
+        self.emit_edit({"op": "set", "idx": idx, "fields": {"preset_name": name}})
+
+    def remove(self, idx):
+        with self.transaction():
+            self.remove_row(idx)
+            self.emit_edit({"op": "remove", "idx": idx})
+            for kind in ("current", "geometry", "appearance", "mode"):
+                self.notify(kind)
+
+    def apply_collection(self, collection_name, presets, extra=None):
+        """Bring the collection to presets with row level changes only where they differ.
+
+        Presets are matched by name and changed in place, the current preset
+        stays current as long as it exists. Like reset, this is not an edit.
+        """
+        presets = [Preset.from_dict(preset) for preset in presets]
+        self.collection_extra = dict(extra or {})
+        current_name = self.presets.names[self.current_idx] if len(self.presets) else None
+        new_names = {preset.preset_name for preset in presets}
+        with self.transaction():
+            if collection_name != self.collection_name:
+                self.collection_name = collection_name
+                self.collection_name_changed.emit(collection_name)
+
+            for row in reversed(range(len(self.presets))):
+                if self.presets.names[row] not in new_names:
+                    self.remove_row(row)
+
+            name_rows = self.name_index()
+            kept = [preset.preset_name for preset in presets if preset.preset_name in name_rows]
+            if kept != self.presets.names:
+                # Reordered, the views are rebuilt once
+                self.beginResetModel()
+                self.presets = PresetTable.from_presets(presets)
+                self.name_rows = None
+                self.pixel_boxes = None
+                self.current_idx = max(0, self.row_of(current_name))
+                self.endResetModel()
+                for kind in ("current", "geometry", "appearance", "mode"):
+                    self.notify(kind)
+                return
+
+            for row, preset in enumerate(presets):
+                if row >= len(self.presets) or self.presets.names[row] != preset.preset_name:
+                    self.insert_row(row, preset)
+                    continue
+                old = self.presets.row(row)
+                if old == preset:
+                    continue
+                if old.extra != preset.extra:
+                    self.presets.set(row, "extra", preset.extra)
+                relayout = False
+                for key in GEOMETRY_KEYS + APPEARANCE_KEYS + MODE_KEYS + ("holes",):
+                    if getattr(old, key) == getattr(preset, key):
+                        continue
+                    self.presets.set(row, key, getattr(preset, key))
+                    relayout = relayout or key not in APPEARANCE_KEYS
+                    if row != self.current_idx:
+                        continue
+                    if key in GEOMETRY_KEYS or key == "holes":
+                        self.notify("geometry")
+                    elif key in APPEARANCE_KEYS:
+                        self.notify("appearance")
+                    else:
+                        self.notify("geometry")
+                        self.notify("mode")
+                if relayout and self.pixel_boxes is not None:
+                    self.pixel_boxes[row] = self.layout_row(row)
+
+            if len(self.presets) and self.presets.names[self.current_idx] != current_name:
+                for kind in ("current", "geometry", "appearance", "mode"):
+                    self.notify(kind)
+
+    def to_dict(self):
+        data = {
+            "schema_version": SCHEMA_VERSION,
+            "preset_collection_name": self.collection_name,
+            "presets": self.presets.to_dicts(),
+        }
+        data.update(self.collection_extra)
+        return data
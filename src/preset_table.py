@@ -0,0 +1,330 @@
+from array import array
+from validator import PRESET_FIELDS, HOLE_FIELDS
+
+NUMBER_FIELDS = ("x", "y", "w", "h", "alpha")
+
+# Bits of the flags column, the binary format stores the same flags
+XY_ABS = 1
+WH_ABS = 2
+# Set when the number was an int, so it is handed out as one again
+INT_FLAGS = {key: 4 << i for i, key in enumerate(NUMBER_FIELDS)}
+
+# Stored fields, the optional holes last, then the fields outside the schema
+SLOTS = tuple(PRESET_FIELDS) + ("holes", "extra")
+# Keys of a preset dict that are not extra fields
+SCHEMA_KEYS = frozenset(PRESET_FIELDS).union(["holes"])
+
+
+def hole_tuples(holes):
+    """Hole dicts of a collection as (x, y, w, h) tuples"""
+    return tuple(tuple(hole[key] for key in HOLE_FIELDS) for hole in holes)
+
+
+def hole_dicts(holes):
+    return [dict(zip(HOLE_FIELDS, hole)) for hole in holes]
+
+
+def extra_fields(data, known):
+    """Fields of a dict outside known, written back so that a save loses nothing"""
+    return {key: value for key, value in data.items() if key not in known}
+
+
+class Preset:
+    """One preset, an unknown field is an error instead of a new key.
+
+    holes are the focus blocks besides the main one, (x, y, w, h) tuples in
+    the modes of the main block. extra holds the fields of the dict that
+    are not in the schema, as they were read.
+    """
+
+    __slots__ = SLOTS
+
+    def __init__(
+        self, preset_name, alpha, xy_abs, x, y, wh_abs, w, h, color, holes=(), extra=None
+    ):
+        self.preset_name = preset_name
+        self.alpha = alpha
+        self.xy_abs = xy_abs
+        self.x = x
+        self.y = y
+        self.wh_abs = wh_abs
+        self.w = w
+        self.h = h
+        self.color = color
+        self.holes = tuple(holes)
+        self.extra = extra or {}
+
+    @classmethod
+    def from_dict(cls, data):
+        """Preset of a collection dict, fields outside the schema go to extra"""
+        return cls(
+            **{key: data[key] for key in PRESET_FIELDS},
+            holes=hole_tuples(data.get("holes", ())),
+            extra=extra_fields(data, SCHEMA_KEYS),
+        )
+
+    def to_dict(self):
+        data = {key: getattr(self, key) for key in PRESET_FIELDS}
+        # Single block presets are written as before holes existed
+        if self.holes:
+            data["holes"] = hole_dicts(self.holes)
+        data.update(self.extra)
+        return data
+
+    def __eq__(self, other):
+        if not isinstance(other, Preset):
+            return NotImplemented
+        return all(getattr(self, key) == getattr(other, key) for key in SLOTS)
+
+    def __repr__(self):
+        return "Preset({})".format(
+            ", ".join("{}={!r}".format(key, getattr(self, key)) for key in SLOTS)
+        )
+
+
+class PresetTable:
+    """Presets stored column by column.
+
+    Numbers are kept in arrays, colors as indices into a table of the
+    distinct colors, booleans and the int-ness of numbers in a flags
+    column. Holes vary in number, they are a list of tuples, empty for
+    most rows. Fields outside the schema are a list of dicts, None for
+    rows without any. Rows come out as Preset records, whole columns as
+    arrays.
+    """
+
+    def __init__(self):
+        self.names = []
+        self.numbers = {key: array("d") for key in NUMBER_FIELDS}
+        self.flags = array("B")
+        self.color_idx = array("I")
+        self.colors = []
+        self.color_index = {}
+        self.holes = []
+        self.extra = []
+
+    @classmethod
+    def from_presets(cls, presets):
+        """Table of Preset records or collection dicts"""
+        table = cls()
+        for preset in presets:
+            table.append(preset)
+        return table
+
+    @classmethod
+    def from_dicts(cls, presets):
+        """Table of the presets of a collection dict, built column by column"""
+        table = cls()
+        table.names = [preset["preset_name"] for preset in presets]
+        flags = [
+            (XY_ABS if preset["xy_abs"] else 0) | (WH_ABS if preset["wh_abs"] else 0)
+            for preset in presets
+        ]
+        for key, flag in INT_FLAGS.items():
+            values = [preset[key] for preset in presets]
+            table.numbers[key] = array("d", values)
+            for row, value in enumerate(values):
+                if type(value) is int:
+                    flags[row] |= flag
+        table.flags = array("B", flags)
+        table.color_idx = array("I", (table.intern_color(preset["color"]) for preset in presets))
+        table.holes = [
+            hole_tuples(preset["holes"]) if "holes" in preset else () for preset in presets
+        ]
+        # Valid presets have every schema field, only longer ones have extra fields
+        size = len(PRESET_FIELDS)
+        table.extra = [
+            extra_fields(preset, SCHEMA_KEYS) if len(preset) > size + ("holes" in preset) else None
+            for preset in presets
+        ]
+        return table
+
+    def copy(self):
+        """Independent table, the columns are copied as they are"""
+        table = PresetTable()
+        table.names = list(self.names)
+        table.numbers = {key: column[:] for key, column in self.numbers.items()}
+        table.flags = self.flags[:]
+        table.color_idx = self.color_idx[:]
+        table.colors = list(self.colors)
+        table.color_index = dict(self.color_index)
+        table.holes = list(self.holes)
+        table.extra = list(self.extra)
+        return table
+
+    def __len__(self):
+        return len(self.names)
+
+    def __iter__(self):
+        return (self.row(idx) for idx in range(len(self.names)))
+
+    def __eq__(self, other):
+        if not isinstance(other, PresetTable):
+            return NotImplemented
+        return self.to_dicts() == other.to_dicts()
+
+    # Encoding of single fields
+
+    def intern_color(self, color):
+        idx = self.color_index.get(color)
+        if idx is None:
+            idx = self.color_index[color] = len(self.colors)
+            self.colors.append(color)
+        return idx
+
+    def number(self, idx, key):
+        value = self.numbers[key][idx]
+        return int(value) if self.flags[idx] & INT_FLAGS[key] else value
+
+    def encode_flags(self, preset):
+        flags = (XY_ABS if preset.xy_abs else 0) | (WH_ABS if preset.wh_abs else 0)
+        for key, flag in INT_FLAGS.items():
+            if type(getattr(preset, key)) is int:
+                flags |= flag
+        return flags
+
+    # Rows
+
+    def row(self, idx):
+        flags = self.flags[idx]
+        return Preset(
+            self.names[idx],
+            self.number(idx, "alpha"),
+            bool(flags & XY_ABS),
+            self.number(idx, "x"),
+            self.number(idx, "y"),
+            bool(flags & WH_ABS),
+            self.number(idx, "w"),
+            self.number(idx, "h"),
+            self.colors[self.color_idx[idx]],
+            self.holes[idx],
+            self.extra[idx],
+        )
+
+    def get(self, idx, key):
+        if key in self.numbers:
+            return self.number(idx, key)
+        if key == "preset_name":
+            return self.names[idx]
+        if key == "color":
+            return self.colors[self.color_idx[idx]]
+        if key == "xy_abs":
+            return bool(self.flags[idx] & XY_ABS)
+        if key == "wh_abs":
+            return bool(self.flags[idx] & WH_ABS)
+        if key == "holes":
+            return self.holes[idx]
+        if key == "extra":
+            return self.extra[idx] or {}
+        raise KeyError(key)
+
+    def set(self, idx, key, value):
+        if key in self.numbers:
+            self.numbers[key][idx] = value
+            if type(value) is int:
+                self.flags[idx] |= INT_FLAGS[key]
+            else:
+                self.flags[idx] &= ~INT_FLAGS[key] & 0xFF
+        elif key == "preset_name":
+            self.names[idx] = value
+        elif key == "color":
+            self.color_idx[idx] = self.intern_color(value)
+        elif key in ("xy_abs", "wh_abs"):
+            flag = XY_ABS if key == "xy_abs" else WH_ABS
+            if value:
+                self.flags[idx] |= flag
+            else:
+                self.flags[idx] &= ~flag & 0xFF
+        elif key == "holes":
+            self.holes[idx] = tuple(value)
+        elif key == "extra":
+            self.extra[idx] = dict(value) or None
+        else:
+            raise KeyError(key)
+
+    def insert(self, idx, preset):
+        if not isinstance(preset, Preset):
+            preset = Preset.from_dict(preset)
+        self.names.insert(idx, preset.preset_name)
+        for key, column in self.numbers.items():
+            column.insert(idx, getattr(preset, key))
+        self.flags.insert(idx, self.encode_flags(preset))
+        self.color_idx.insert(idx, self.intern_color(preset.color))
+        self.holes.insert(idx, preset.holes)
+        self.extra.insert(idx, dict(preset.extra) or None)
+
+    def append(self, preset):
+        self.insert(len(self.names), preset)
+
+    def pop(self, idx):
+        preset = self.row(idx)
+        del self.names[idx]
+        for column in self.numbers.values():
+            del column[idx]
+        del self.flags[idx]
+        del self.color_idx[idx]
+        del self.holes[idx]
+        del self.extra[idx]
+        return preset
+
+    # Columns
+
+    def column(self, key):
+        """Every value of a field, numbers as the stored floats"""
+        if key in self.numbers:
+            return self.numbers[key]
+        if key == "preset_name":
+            return self.names
+        if key == "color":
+            return [self.colors[idx] for idx in self.color_idx]
+        if key in ("xy_abs", "wh_abs"):
+            flag = XY_ABS if key == "xy_abs" else WH_ABS
+            return [bool(flags & flag) for flags in self.flags]
+        if key == "holes":
+            return self.holes
+        raise KeyError(key)
+
+    def values(self, key):
+        """Every number of a field with the type it was written with"""
+        flag = INT_FLAGS[key]
+        column = self.numbers[key]
+        int_rows = [flags & flag for flags in self.flags]
+        if all(int_rows):
+            return list(map(int, column))
+        if not any(int_rows):
+            return column.tolist()
+        return [int(value) if is_int else value for value, is_int in zip(column, int_rows)]
+
+    def to_dicts(self):
+        """Presets as in the JSON schema"""
+        colors = self.colors
+        presets = [
+            {
+                "preset_name": name,
+                "alpha": alpha,
+                "xy_abs": bool(flags & XY_ABS),
+                "x": x,
+                "y": y,
+                "wh_abs": bool(flags & WH_ABS),
+                "w": w,
+                "h": h,
+                "color": colors[color],
+            }
+            for name, alpha, flags, x, y, w, h, color in zip(
+                self.names,
+                self.values("alpha"),
+                self.flags,
+                self.values("x"),
+                self.values("y"),
+                self.values("w"),
+                self.values("h"),
+                self.color_idx,
+            )
+        ]
+        for preset, holes in zip(presets, self.holes):
+            if holes:
+                preset["holes"] = hole_dicts(holes)
+        for preset, extra in zip(presets, self.extra):
+            if extra:
+                preset.update(extra)
+        return presets
@@ -15,33 +15,68 @@ from PyQt5.QtWidgets import (
     QFileDialog,
     QMessageBox,
     QInputDialog,
+    QGroupBox,
 )
-from PyQt5.QtCore import Qt, QRect, QSettings
-from overlay import OverlayWindow
+from PyQt5.QtCore import Qt, QRect, QSettings, QTimer
+from overlay_manager import OverlayManager
+from preset_model import PresetModel
+from autosave import Autosave
 from PyQt5.QtGui import QKeySequence
-import json
-from validator import preset_validator
-from utils import hex_to_color
+import os
+from paint_engines import PAINT_ENGINES
+from strip_overlay import WINDOW_TOPOLOGIES
+from tracking import TrackingUnavailable
+from catalog_dialog import CatalogDialog
+from binary_collection import BINARY_EXTENSION
+from collection_file import (
+    CollectionError,
+    default_preset,
+    load_collection,
+    load_default_collection,
+)
+from metrics import stats
+
+BINARY_FILTER = "Binary Preset Collections (*{})".format(BINARY_EXTENSION)
+COLLECTION_FILTERS = ";;".join(
+    [
+        "Preset Collections (*.json *{})".format(BINARY_EXTENSION),
+        "JSON Files (*.json)",
+        BINARY_FILTER,
+        "All Files (*)",
+    ]
+)
+EXPORT_FILTERS = ";;".join(["JSON Files (*.json)", BINARY_FILTER, "All Files (*)"])
+# Tracking mode -> combobox label
+TRACKING_LABELS = {
+    "off": "Off",
+    "cursor": "Follow Cursor",
+    "window": "Follow Active Window",
+}
 
 
 class SettingsPanel(QMainWindow):
-    def __init__(self, overlay_window: OverlayWindow):
+    def __init__(self, overlay_manager: OverlayManager, model: PresetModel, autosave: Autosave):
         super().__init__()
 
-        if overlay_window == None:
-            self.overlay_window = None
+        self.model = model
+        self.autosave = autosave
+        # Messages shown once the autosave worker has written a file
+        self.write_messages = {}
+        self.autosave.saved.connect(self.on_collection_written)
+        self.autosave.failed.connect(self.on_collection_write_failed)
+        self.editing_xywh = None
+
+        if overlay_manager == None:
+            self.overlay_manager = None
         else:
-            self.overlay_window = overlay_window
+            self.overlay_manager = overlay_manager
 
         self.setWindowFlag(Qt.WindowStaysOnTopHint)
         self.setWindowTitle("Overlay Settings")
         self.setGeometry(50, 50, 400, 500)
 
-        # Settings
+        # Settings, the collection itself was loaded before the overlay was shown
         self.settings = QSettings("preset_collection_path", "")
-        self.load_settings()
-
-        self.current_preset_idx = 0
 
         layout = QVBoxLayout()
 
@@ -49,7 +84,7 @@ class SettingsPanel(QMainWindow):
         preset_collection_layout = QVBoxLayout()
         preset_collection_layout.addWidget(QLabel("Preset Collection Name:"))
         preset_collection_name_layout = QHBoxLayout()
-        self.current_preset_collection_label = QLabel(self.preset_collection_name)
+        self.current_preset_collection_label = QLabel(self.model.collection_name)
         preset_collection_name_layout.addWidget(self.current_preset_collection_label)
         self.rename_preset_collection_button = QPushButton("Rename")
         self.rename_preset_collection_button.clicked.connect(self.rename_preset_collection)
@@ -65,8 +100,11 @@ class SettingsPanel(QMainWindow):
         save_button.clicked.connect(self.save_preset_collection)
         export_button = QPushButton("Export Preset Collection")
         export_button.clicked.connect(self.export_preset_collection)
+        catalog_button = QPushButton("Browse Preset Collection Catalog")
+        catalog_button.clicked.connect(self.open_preset_collection_catalog)
         preset_collection_layout.addWidget(create_button)
         preset_collection_layout.addWidget(import_button)
+        preset_collection_layout.addWidget(catalog_button)
         preset_collection_layout.addWidget(save_button)
         preset_collection_layout.addWidget(export_button)
         layout.addLayout(preset_collection_layout)
@@ -74,8 +112,12 @@ class SettingsPanel(QMainWindow):
         # Preset Selection and Management
         preset_layout = QHBoxLayout()
         self.preset_combobox = QComboBox()
-        self.preset_combobox.addItems(self.get_preset_names())
-        self.preset_combobox.currentIndexChanged.connect(self.change_preset)
+        self.preset_combobox.setModel(self.model)
+        self.preset_combobox.setCurrentIndex(self.model.current_idx)
+        # Only choices of the user, a model reset would otherwise select row 0
+        self.preset_combobox.activated.connect(self.change_preset)
+        # A bound method, Qt drops the connection with the panel
+        self.model.modelReset.connect(self.on_model_reset)
         preset_layout.addWidget(self.preset_combobox)
         layout.addLayout(preset_layout)
 
@@ -99,7 +141,7 @@ class SettingsPanel(QMainWindow):
         self.alpha_slider = QSlider(Qt.Horizontal)
         self.alpha_slider.setMinimum(0)
         self.alpha_slider.setMaximum(255)
-        self.alpha_slider.setValue(150)
+        self.alpha_slider.setValue(self.model.current().alpha)
         self.alpha_slider.valueChanged.connect(self.update_alpha)
         transparency_layout.addWidget(self.alpha_slider)
         layout.addLayout(transparency_layout)
@@ -110,7 +152,17 @@ class SettingsPanel(QMainWindow):
 
         # Add block spinbox/ abs/rel settings
         self.init_block_setting_panel(layout)
-        self.init_block_spinbox_value()
+        self.sync_mode()
+
+        # Further focus blocks of the preset, dragged on the overlay
+        hole_layout = QHBoxLayout()
+        add_hole_button = QPushButton("Add Hole")
+        add_hole_button.clicked.connect(self.add_hole)
+        remove_hole_button = QPushButton("Remove Hole")
+        remove_hole_button.clicked.connect(self.remove_hole)
+        hole_layout.addWidget(add_hole_button)
+        hole_layout.addWidget(remove_hole_button)
+        layout.addLayout(hole_layout)
 
         # Show/Hide Focus Block
         self.show_focus_block_checkbox = QCheckBox("Show Focus Block")
@@ -120,18 +172,63 @@ class SettingsPanel(QMainWindow):
         )
         layout.addWidget(self.show_focus_block_checkbox)
 
+        self.animate_checkbox = QCheckBox("Animate Transitions")
+        self.animate_checkbox.setChecked(self.settings.value("animate_transitions", False, type=bool))
+        self.animate_checkbox.stateChanged.connect(self.update_animate_transitions)
+        layout.addWidget(self.animate_checkbox)
+
         self.toggle_size_adjustment_checkbox = QCheckBox("Toggle Size Adjustment Mode")
         self.toggle_size_adjustment_checkbox.setChecked(False)
         self.toggle_size_adjustment_checkbox.stateChanged.connect(
-            self.update_overlay_window_flag
+            self.update_size_adjustment
         )
         layout.addWidget(self.toggle_size_adjustment_checkbox)
 
+        # Paint engine selection, the saved engine was applied at startup
+        paint_engine_layout = QHBoxLayout()
+        paint_engine_layout.addWidget(QLabel("Paint Engine:"))
+        self.paint_engine_combobox = QComboBox()
+        self.paint_engine_combobox.addItems(list(PAINT_ENGINES))
+        if self.overlay_manager:
+            self.paint_engine_combobox.setCurrentText(self.overlay_manager.paint_engine_name)
+        self.paint_engine_combobox.currentTextChanged.connect(self.update_paint_engine)
+        paint_engine_layout.addWidget(self.paint_engine_combobox)
+        layout.addLayout(paint_engine_layout)
+
+        # Window topology, the saved one was applied at startup
+        topology_layout = QHBoxLayout()
+        topology_layout.addWidget(QLabel("Window Topology:"))
+        self.topology_combobox = QComboBox()
+        self.topology_combobox.addItems(list(WINDOW_TOPOLOGIES))
+        if self.overlay_manager:
+            self.topology_combobox.setCurrentText(self.overlay_manager.topology)
+        self.topology_combobox.currentTextChanged.connect(self.update_topology)
+        topology_layout.addWidget(self.topology_combobox)
+        layout.addLayout(topology_layout)
+
+        # Tracking, the saved mode was applied at startup
+        tracking_layout = QHBoxLayout()
+        tracking_layout.addWidget(QLabel("Tracking:"))
+        self.tracking_combobox = QComboBox()
+        for mode, label in TRACKING_LABELS.items():
+            self.tracking_combobox.addItem(label, mode)
+        if self.overlay_manager:
+            self.tracking_combobox.setCurrentText(
+                TRACKING_LABELS[self.overlay_manager.tracker.mode]
+            )
+        self.tracking_combobox.currentIndexChanged.connect(self.update_tracking)
+        tracking_layout.addWidget(self.tracking_combobox)
+        layout.addLayout(tracking_layout)
+
         # Color selection
         color_button = QPushButton("Select Overlay Color")
         color_button.clicked.connect(self.pick_color)
         layout.addWidget(color_button)
 
+        # Live stats, only when enabled
+        if stats.enabled:
+            self.init_stats_hud(layout)
+
         # Exit button
         exit_button = QPushButton("Exit")
         exit_button.clicked.connect(self.close_application)
@@ -143,14 +240,22 @@ class SettingsPanel(QMainWindow):
 
         self.init_shortcut()
 
+        if self.overlay_manager:
+            self.overlay_manager.screens_changed.connect(self.update_screens)
+            self.overlay_manager.visibility_changed.connect(self.sync_visibility)
+
+        # data -> widgets, the widgets never write back while being synced
+        self.model.geometry_changed.connect(self.sync_geometry)
+        self.model.appearance_changed.connect(self.sync_alpha)
+        self.model.mode_changed.connect(self.sync_mode)
+        self.model.current_changed.connect(self.sync_current_preset)
+        self.model.collection_name_changed.connect(
+            self.current_preset_collection_label.setText
+        )
+
     def init_block_setting_panel(self, layout: QVBoxLayout):
         self.xywh_split = [["x", "y"], ["w", "h"]]
-        self.xywh_range = {
-            "x": 3840,
-            "y": 2160,
-            "w": 3840,
-            "h": 2160,
-        }
+        self.update_xywh_range()
         self.xywh_name = {"x": "X", "y": "Y", "w": "Width", "h": "Height"}
 
         for first_idx, first in enumerate(["Position", "Size"]):
@@ -160,6 +265,7 @@ class SettingsPanel(QMainWindow):
             mode_layout = QHBoxLayout()
             absolute_checkbox = QCheckBox("Use Absolute {}".format(first))
             absolute_checkbox.setChecked(True)  # Default to absolute mode
+            absolute_checkbox.setObjectName(["xy_abs", "wh_abs"][first_idx])
             absolute_checkbox.stateChanged.connect(
                 lambda state, idx=first_idx: self.toggle_mode(state, idx)
             )
@@ -174,7 +280,7 @@ class SettingsPanel(QMainWindow):
                 )
                 spinbox = QDoubleSpinBox()
                 spinbox.setDecimals(2)
-                spinbox.setRange(0, self.xywh_range[second])  # Supports up to 4K width
+                spinbox.setRange(*self.xywh_range[second])
                 spinbox.valueChanged.connect(
                     lambda _, xywh=second: self.update_xywh_data(xywh)
                 )
@@ -185,54 +291,43 @@ class SettingsPanel(QMainWindow):
                 layout.addLayout(block_layout)
 
     def get_default_preset_collection(self, name):
-        if self.overlay_window == None:
-            return {
-                "preset_name": name,
-                "alpha": 150,
-                "x": 100,
-                "y": 100,
-                "w": 400,
-                "h": 400,
-                "xy_abs": True,
-                "wh_abs": True,
-                "color": "#000000",
-            }
-
-        else:
-            screen = self.overlay_window.screen().geometry()
-            return {
-                "preset_name": name,
-                "alpha": 150,
-                "x": screen.width() // 4,
-                "y": screen.height() // 4,
-                "w": screen.width() // 2,
-                "h": screen.height() // 2,
-                "xy_abs": True,
-                "wh_abs": True,
-                "color": "#000000",
-            }
-
-    def init_block_spinbox_value(self):
-        self.xywh = ["x", "y", "w", "h"]
-
-        # update every pair of values
-        for i in self.xywh:
-            self.block_spinbox[i].setValue(self.presets[self.current_preset_idx][i])
+        if self.overlay_manager == None:
+            return default_preset(name)
+        return default_preset(name, self.overlay_manager.primary_geometry())
+
+    def init_stats_hud(self, layout: QVBoxLayout):
+        stats_group = QGroupBox("Stats")
+        stats_layout = QVBoxLayout()
+        self.stats_label = QLabel()
+        self.stats_label.setStyleSheet("font-family: monospace")
+        self.stats_label.setTextInteractionFlags(Qt.TextSelectableByMouse)
+        stats_layout.addWidget(self.stats_label)
+        stats_group.setLayout(stats_layout)
+        layout.addWidget(stats_group)
+
+        self.stats_timer = QTimer(self)
+        self.stats_timer.timeout.connect(self.update_stats_hud)
+        self.stats_timer.start(1000)
+        self.update_stats_hud()
+
+    def update_stats_hud(self):
+        snapshot = stats.snapshot()
+        lines = [
+            "{}: {}".format(name, value) for name, value in sorted(snapshot["counters"].items())
+        ]
+        for name, summary in sorted(snapshot["timers"].items()):
+            lines.append(
+                "{}: n={} p50={:.2f}ms p95={:.2f}ms max={:.2f}ms".format(
+                    name, summary["count"], summary["p50_ms"], summary["p95_ms"], summary["max_ms"]
+                )
+            )
+        self.stats_label.setText("\n".join(lines) or "No samples yet")
 
     def init_shortcut(self):
         QShortcut(QKeySequence("Ctrl+Q"), self).activated.connect(
             self.close_application
         )
 
-    def get_preset_names(self):
-        if self.presets:
-            preset_names = []
-            for i in self.presets:
-                preset_names.append(i["preset_name"])
-            return preset_names
-        else:
-            return []
-
     def is_pos(self, xywh: str):
         return xywh == "x" or xywh == "y"
 
@@ -241,72 +336,68 @@ class SettingsPanel(QMainWindow):
             return 0
         return 1
 
-    def get_screen_pairs(self):
-        screen = self.overlay_window.primary_screen.geometry()
-        pair = {
-            "x": screen.width(),
-            "y": screen.height(),
-            "w": screen.width(),
-            "h": screen.height(),
+    # Range of the spinboxes in absolute mode, covers every screen
+    def update_xywh_range(self):
+        if self.overlay_manager:
+            desktop = self.overlay_manager.virtual_geometry()
+        else:
+            desktop = QRect(0, 0, 3840, 2160)
+        self.xywh_range = {
+            "x": (desktop.left(), desktop.right()),
+            "y": (desktop.top(), desktop.bottom()),
+            "w": (0, desktop.width()),
+            "h": (0, desktop.height()),
         }
-        return pair
 
-    def load_settings(self):
-        self.import_preset_collection(if_update=False)
-        if not hasattr(self, "preset_collection_name") or not hasattr(self, "presets"):
-            self.reset_settings()
+    def update_screens(self):
+        self.update_xywh_range()
+        for split_idx in range(2):
+            if self.absolute_checkbox[split_idx].isChecked():
+                for i in self.xywh_split[split_idx]:
+                    self.block_spinbox[i].setRange(*self.xywh_range[i])
 
     def reset_settings(self):
         self.settings.setValue("preset_collection_path", "")
-        self.preset_collection_name = "Untitiled"
-        self.presets = [self.get_default_preset_collection("default")]
+        load_default_collection(
+            self.model,
+            self.autosave,
+            self.overlay_manager.primary_geometry() if self.overlay_manager else None,
+        )
 
     def rename_preset_collection(self):
         new_preset_name, ok = QInputDialog.getText(
             self, "Rename Preset Collection", "Enter new preset collection name:"
         )
         if ok and new_preset_name.strip():
-            self.preset_collection_name = new_preset_name
-            self.update_preset_collection_name_label()
+            self.model.set_collection_name(new_preset_name)
 
     def create_preset_collection(self):
         self.reset_settings()
-        self.update_preset_collection_name_label()
-        self.update_preset_selection_combobox()
-        self.update_preset_combobox()
-        self.update_color()
 
     def import_preset_collection(self, if_update=True):
-        if self.settings.value("preset_collection_path"):
-            try:
-                with open(self.settings.value("preset_collection_path"), "r") as file:
-                    imported_data = json.load(file)
-                    validate_result = preset_validator(imported_data)
-                    if validate_result:
-                        self.preset_collection_name = imported_data["preset_collection_name"]
-                        self.presets = imported_data["presets"]
-                        if if_update:
-                            self.update_preset_collection_name_label()
-                            self.update_preset_selection_combobox()
-                            self.update_preset_combobox()
-                            self.update_color()
-                            QMessageBox.information(
-                                self,
-                                "Import Successful",
-                                "Preset collection have been imported successfully.",
-                            )
-                    else:
-                        QMessageBox.warning(
-                            self,
-                            "Import Failed",
-                            "The selected file does not contain valid preset collection.",
-                        )
-            except Exception as e:
-                QMessageBox.critical(
-                    self, "Error", f"An error occurred while importing preset collection: {e}"
-                )
-        else:
+        path = self.settings.value("preset_collection_path")
+        if not path:
             self.reset_settings()
+            return
+        try:
+            load_collection(self.model, self.autosave, path)
+        except CollectionError as e:
+            self.show_import_error(str(e))
+            return
+        except Exception as e:
+            QMessageBox.critical(
+                self, "Error", f"An error occurred while importing preset collection: {e}"
+            )
+            return
+        if if_update:
+            QMessageBox.information(
+                self,
+                "Import Successful",
+                "Preset collection have been imported successfully.",
+            )
+
+    def show_import_error(self, message):
+        QMessageBox.warning(self, "Import Failed", message)
 
     def import_preset_collection_dialog(self):
         options = QFileDialog.Options()
@@ -314,67 +405,61 @@ class SettingsPanel(QMainWindow):
             self,
             "Import Preset Collection",
             "",
-            "JSON Files (*.json);;All Files (*)",
+            COLLECTION_FILTERS,
             options=options,
         )
         if file_path:
             self.settings.setValue("preset_collection_path", file_path)
             self.import_preset_collection()
 
+    def open_preset_collection_catalog(self):
+        dialog = CatalogDialog(self, self.settings)
+        if dialog.exec_() == CatalogDialog.Accepted and dialog.selected_path:
+            self.settings.setValue("preset_collection_path", dialog.selected_path)
+            self.import_preset_collection(if_update=False)
+
     def save_preset_collection(self):
         if self.settings.value("preset_collection_path"):
-            try:
-                with open(self.settings.value("preset_collection_path"), "w") as file:
-                    json.dump(
-                        {"preset_collection_name": self.preset_collection_name, "presets": self.presets},
-                        file,
-                        indent=4,
-                    )
-                QMessageBox.information(
-                    self,
-                    "Save Successful",
-                    "Preset collection have been saved successfully.",
-                )
-            except Exception as e:
-                QMessageBox.critical(
-                    self, "Error", f"An error occurred while saving preset collection: {e}"
-                )
+            path = self.settings.value("preset_collection_path")
+            self.write_messages[path] = (
+                "Save Successful",
+                "Preset collection have been saved successfully.",
+            )
+            self.autosave.write(path, self.model.to_dict())
         else:
             self.export_preset_collection()
 
     def export_preset_collection(self):
         options = QFileDialog.Options()
-        file_path, _ = QFileDialog.getSaveFileName(
+        file_path, selected_filter = QFileDialog.getSaveFileName(
             self,
             "Export Preset Collection",
-            "{}.json".format(self.preset_collection_name),
-            "JSON Files (*.json);;All Files (*)",
+            "{}.json".format(self.model.collection_name),
+            EXPORT_FILTERS,
             options=options,
         )
         if file_path:
-            try:
-                with open(file_path, "w") as file:
-                    json.dump(
-                        {"preset_collection_name": self.preset_collection_name, "presets": self.presets},
-                        file,
-                        indent=4,
-                    )
-                QMessageBox.information(
-                    self,
-                    "Export Successful",
-                    "Preset collection have been exported successfully.",
-                )
-            except Exception as e:
-                QMessageBox.critical(
-                    self, "Error", f"An error occurred while exporting preset collection: {e}"
-                )
+            if selected_filter == BINARY_FILTER and not file_path.endswith(BINARY_EXTENSION):
+                file_path = os.path.splitext(file_path)[0] + BINARY_EXTENSION
+            self.write_messages[file_path] = (
+                "Export Successful",
+                "Preset collection have been exported successfully.",
+            )
+            self.autosave.write(file_path, self.model.to_dict())
 
-    def change_preset(self, index):
-        if not self.overlay_window:
-            return
+    def on_collection_written(self, path):
+        message = self.write_messages.pop(path, None)
+        if message:
+            QMessageBox.information(self, *message)
 
-        self.current_preset_idx = index
-        self.update_preset_combobox()
+    def on_collection_write_failed(self, path, error):
+        self.write_messages.pop(path, None)
+        QMessageBox.critical(
+            self, "Error", f"An error occurred while saving preset collection: {error}"
+        )
+
+    def change_preset(self, index):
+        self.model.set_current(index)
 
     def add_preset(self):
         new_preset_name, ok = QInputDialog.getText(
@@ -382,11 +467,10 @@ class SettingsPanel(QMainWindow):
         )
         if ok and new_preset_name.strip():
             # Check for duplicate
-            if new_preset_name.strip() in self.get_preset_names():
+            if self.model.has_name(new_preset_name.strip()):
                 QMessageBox.warning(self, "Duplicate Item", "This item already exists!")
             else:
-                self.presets.append(self.get_default_preset_collection(new_preset_name.strip()))
-                self.update_preset_selection_combobox()
+                self.model.add(self.get_default_preset_collection(new_preset_name.strip()))
 
     def rename_preset(self):
         new_preset_name, ok = QInputDialog.getText(
@@ -394,11 +478,10 @@ class SettingsPanel(QMainWindow):
         )
         if ok and new_preset_name.strip():
             # Check for duplicate
-            if new_preset_name.strip() in self.get_preset_names():
+            if self.model.has_name(new_preset_name.strip()):
                 QMessageBox.warning(self, "Duplicate Item", "This item already exists!")
             else:
-                self.presets[self.current_preset_idx]["preset_name"] = new_preset_name
-                self.update_preset_selection_combobox()
+                self.model.rename(self.model.current_idx, new_preset_name)
 
     def delete_preset(self):
         reply = QMessageBox.question(
@@ -410,151 +493,181 @@ class SettingsPanel(QMainWindow):
         )
 
         if reply == QMessageBox.Yes:
-            if len(self.presets) <= 1:
+            if len(self.model.presets) <= 1:
                 QMessageBox.warning(
                     self, "Last Preset remains", "Cannot delete the last preset."
                 )
-            elif self.current_preset_idx >= 0:
-                del self.presets[self.current_preset_idx]
-                self.update_preset_selection_combobox()
+            elif self.model.current_idx >= 0:
+                self.model.remove(self.model.current_idx)
             else:
                 QMessageBox.warning(
                     self, "No Item Selected", "Please select an item to delete."
                 )
 
-    def update_preset_collection_name_label(self):
-        self.current_preset_collection_label.setText(self.preset_collection_name)
-
-    def update_preset_selection_combobox(self):
-        self.preset_combobox.clear()
-        self.preset_combobox.addItems(self.get_preset_names())
-
-    def update_preset_combobox(self):
-        if self.presets:
-            presets = self.presets[self.current_preset_idx]
-
-            # Update abs/rel mode
-            self.absolute_checkbox[0].setChecked(presets["xy_abs"])
-            self.absolute_checkbox[1].setChecked(presets["wh_abs"])
-
-            # Update block value
-            self.update_xywh_spinbox()
-            self.update_overlay_block()
+    def add_hole(self):
+        # Small block near the top left of the screen, cascaded so holes do not stack
+        if self.overlay_manager:
+            screen = self.overlay_manager.primary_geometry()
+        else:
+            screen = QRect(0, 0, 1920, 1080)
+        offset = 32 * len(self.model.get("holes"))
+        self.model.add_hole(
+            QRect(
+                screen.x() + screen.width() // 16 + offset,
+                screen.y() + screen.height() // 16 + offset,
+                screen.width() // 8,
+                screen.height() // 8,
+            )
+        )
 
-            # Update transparency
-            self.update_alpha(presets["alpha"])
+    def remove_hole(self):
+        holes = len(self.model.get("holes"))
+        if holes:
+            self.model.remove_hole(holes)
 
-            # Update color
-            # self.pick_color()
+    def sync_current_preset(self, index):
+        self.preset_combobox.blockSignals(True)
+        self.preset_combobox.setCurrentIndex(index)
+        self.preset_combobox.blockSignals(False)
 
-            if self.overlay_window:
-                self.overlay_window.update()
+    def on_model_reset(self):
+        self.sync_current_preset(self.model.current_idx)
 
     def toggle_mode(self, state, split_idx):
-        if not self.overlay_window:
-            return
-
-        is_absolute = state == Qt.Checked
-
-        pair = self.get_screen_pairs()
-
-        if is_absolute:
-            # Switch to absolute mode
-            for i in self.xywh_split[split_idx]:
-                self.block_spinbox[i].setRange(0, self.xywh_range[i])
-                self.block_spinbox[i].setValue(self.presets[self.current_preset_idx][i])
-                self.unit_labels[i].setText("px")
-        else:
-            # Switch to relative mode
+        self.model.set_mode(**{["xy_abs", "wh_abs"][split_idx]: state == Qt.Checked})
+
+    # data -> abs/rel checkboxes, spinbox ranges and units
+    def sync_mode(self):
+        preset = self.model.current()
+        for split_idx, checkbox in enumerate(self.absolute_checkbox):
+            is_absolute = getattr(preset, checkbox.objectName())
+            checkbox.blockSignals(True)
+            checkbox.setChecked(is_absolute)
+            checkbox.blockSignals(False)
             for i in self.xywh_split[split_idx]:
-                percentage = (self.presets[self.current_preset_idx][i] / pair[i]) * 100
-                self.block_spinbox[i].setRange(0, 100)
-                self.block_spinbox[i].setValue(percentage)
-                self.unit_labels[i].setText("%")
-
-    def update_overlay_block(self):
-        new_rect = QRect(
-            self.presets[self.current_preset_idx]["x"],
-            self.presets[self.current_preset_idx]["y"],
-            self.presets[self.current_preset_idx]["w"],
-            self.presets[self.current_preset_idx]["h"],
-        )
-        self.overlay_window.focus_block = new_rect
-        self.overlay_window.update()
+                spinbox = self.block_spinbox[i]
+                spinbox.blockSignals(True)
+                if is_absolute:
+                    spinbox.setRange(*self.xywh_range[i])
+                    self.unit_labels[i].setText("px")
+                else:
+                    spinbox.setRange(0, 100)
+                    self.unit_labels[i].setText("%")
+                spinbox.blockSignals(False)
+        self.sync_geometry()
 
-    # spinbox -> data, and update overlay block
+    # spinbox -> data, the overlay follows the model
     def update_xywh_data(self, xywh):
-        if not self.overlay_window:
+        if stats.enabled:
+            stats.count("spinbox_value_changed")
+        if not self.overlay_manager:
             return
-        pair = self.get_screen_pairs()
         split_idx = self.is_pos_split_idx(xywh)
 
+        # Relative values are stored normalized
         if self.absolute_checkbox[split_idx].isChecked():
-            self.presets[self.current_preset_idx][xywh] = self.block_spinbox[
-                xywh
-            ].value()
+            value = self.block_spinbox[xywh].value()
         else:
-            self.presets[self.current_preset_idx][xywh] = pair[xywh] * (
-                self.block_spinbox[xywh].value() / 100
-            )
-        self.update_overlay_block()
-
-    # data -> spinbox, not update overlay block
-    def update_xywh_spinbox(self):
-        if not self.overlay_window:
+            value = self.block_spinbox[xywh].value() / 100
+
+        # The edited spinbox keeps what the user typed
+        self.editing_xywh = xywh
+        try:
+            self.model.update(**{xywh: value})
+        finally:
+            self.editing_xywh = None
+
+    # data -> spinbox, never writes back to the data
+    def sync_geometry(self, rect=None):
+        if not self.overlay_manager:
             return
-        pair = self.get_screen_pairs()
+        if stats.enabled:
+            stats.count("spinbox_sync")
+        preset = self.model.current()
         for split_idx in range(2):
             for i in self.xywh_split[split_idx]:
+                if i == self.editing_xywh:
+                    continue
+                spinbox = self.block_spinbox[i]
+                spinbox.blockSignals(True)
                 if self.absolute_checkbox[split_idx].isChecked():
-                    self.block_spinbox[i].setValue(
-                        self.presets[self.current_preset_idx][i]
-                    )
+                    spinbox.setValue(getattr(preset, i))
                 else:
-                    self.block_spinbox[i].setValue(
-                        self.presets[self.current_preset_idx][i] / pair[i] * 100
-                    )
+                    spinbox.setValue(getattr(preset, i) * 100)
+                spinbox.blockSignals(False)
 
-    def update_overlay_window_flag(self):
-        if not self.overlay_window:
+    def update_size_adjustment(self):
+        if not self.overlay_manager:
             return
-        flags = Qt.FramelessWindowHint | Qt.WindowStaysOnTopHint | Qt.SubWindow
-        if not self.toggle_size_adjustment_checkbox.isChecked():
-            flags |= Qt.WindowTransparentForInput
-        self.overlay_window.setWindowFlags(flags)
-        self.overlay_window.show()
+        self.overlay_manager.set_size_adjustment(
+            self.toggle_size_adjustment_checkbox.isChecked()
+        )
         # Raise the level of setting panel to prevent blocking
         self.raise_()
 
+    def update_paint_engine(self, name):
+        self.settings.setValue("paint_engine", name)
+        if self.overlay_manager:
+            self.overlay_manager.set_paint_engine(name)
+
+    def update_topology(self, name):
+        self.settings.setValue("topology", name)
+        if self.overlay_manager:
+            self.overlay_manager.set_topology(name)
+            # The new windows are stacked above the panel
+            self.raise_()
+
+    def update_tracking(self, index):
+        if not self.overlay_manager:
+            return
+        tracker = self.overlay_manager.tracker
+        mode = self.tracking_combobox.itemData(index)
+        try:
+            tracker.set_mode(mode)
+        except TrackingUnavailable as e:
+            QMessageBox.warning(self, "Tracking Unavailable", str(e))
+            self.tracking_combobox.blockSignals(True)
+            self.tracking_combobox.setCurrentText(TRACKING_LABELS[tracker.mode])
+            self.tracking_combobox.blockSignals(False)
+            return
+        self.settings.setValue("tracking", mode)
+
     def update_alpha(self, value):
-        self.presets[self.current_preset_idx]["alpha"] = value
-        if self.overlay_window:
-            self.overlay_window.overlay_color.setAlpha(value)
-            self.overlay_window.update()
+        self.model.update(alpha=value)
+
+    def sync_alpha(self, color):
+        self.alpha_slider.blockSignals(True)
+        self.alpha_slider.setValue(color.alpha())
+        self.alpha_slider.blockSignals(False)
 
     def update_focus_block_visibility(self, state):
-        if self.overlay_window:
-            self.overlay_window.show_focus_block = state == Qt.Checked
-            self.overlay_window.update()
-
-    def update_color(self):
-        if self.overlay_window:
-            color = hex_to_color(self.presets[self.current_preset_idx]["color"])
-            if color.isValid():
-                color.setAlpha(self.presets[self.current_preset_idx]["alpha"])
-                self.overlay_window.overlay_color = color
-                self.overlay_window.update()
+        if self.overlay_manager:
+            self.overlay_manager.set_focus_block_visible(state == Qt.Checked)
+
+    def sync_visibility(self, show):
+        self.show_focus_block_checkbox.blockSignals(True)
+        self.show_focus_block_checkbox.setChecked(show)
+        self.show_focus_block_checkbox.blockSignals(False)
+
+    def raise_panel(self):
+        """Bring the panel to the front, e.g. when the app was started again"""
+        self.showNormal()
+        self.raise_()
+        self.activateWindow()
+
+    def update_animate_transitions(self, state):
+        self.settings.setValue("animate_transitions", state == Qt.Checked)
+        if self.overlay_manager:
+            self.overlay_manager.animator.enabled = state == Qt.Checked
 
     def pick_color(self):
-        if self.overlay_window:
-            color = QColorDialog.getColor(self.overlay_window.overlay_color)
-            self.presets[self.current_preset_idx]["color"] = color.name()
-            if color.isValid():
-                color.setAlpha(self.presets[self.current_preset_idx]["alpha"])
-                self.overlay_window.overlay_color = color
-                self.overlay_window.update()
+        color = QColorDialog.getColor(self.model.color())
+        if color.isValid():
+            self.model.update(color=color.name())
 
     def close_application(self):
-        if self.overlay_window:
-            self.overlay_window.close()
+        if self.overlay_manager:
+            self.overlay_manager.close()
         self.close()
+        # Nothing may be left open in overlay-only mode
+        QApplication.quit()
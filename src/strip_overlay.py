@@ -0,0 +1,276 @@
+from PyQt5.QtWidgets import QApplication, QWidget
+from PyQt5.QtGui import QColor, QPainter, QPen, QRegion
+from PyQt5.QtCore import Qt, QObject, QPoint, QRect
+from overlay import OverlayWindow, painted_color, window_opacity_supported
+from paint_engines import HOLE_COLOR
+from metrics import stats
+
+TOPOLOGY_ENV = "FOCUS_FRAME_TOPOLOGY"
+DEFAULT_TOPOLOGY = "single"
+
+
+class StripWindow(QWidget):
+    """One band of the overlay, a window filled with the overlay color"""
+
+    def __init__(self, color, manager=None):
+        super().__init__()
+        self.manager = manager
+        self.setWindowFlags(
+            Qt.FramelessWindowHint
+            | Qt.WindowStaysOnTopHint
+            | Qt.SubWindow
+            | Qt.WindowTransparentForInput
+        )
+        self.setAttribute(Qt.WA_TranslucentBackground)
+        self.setAttribute(Qt.WA_ShowWithoutActivating)
+        self.color = QColor(color)
+        self.shown = True
+        # The alpha and hiding are left to the compositor where it can
+        self.window_opacity = window_opacity_supported()
+        if self.window_opacity:
+            self.apply_opacity()
+
+    def set_color(self, color: QColor):
+        if color.rgba() == self.color.rgba():
+            return
+        repaint = not self.window_opacity or color.rgb() != self.color.rgb()
+        self.color = QColor(color)
+        if self.window_opacity:
+            self.apply_opacity()
+        if repaint:
+            self.update()
+
+    def set_shown(self, shown: bool):
+        if shown != self.shown:
+            self.shown = shown
+            self.apply_opacity()
+
+    def apply_opacity(self):
+        if stats.enabled:
+            stats.count("opacity_change")
+        self.setWindowOpacity(self.color.alphaF() if self.shown else 0.0)
+
+    def paintEvent(self, event):
+        if stats.enabled:
+            stats.count("paint")
+        painter = QPainter(self)
+        painter.setCompositionMode(QPainter.CompositionMode_Source)
+        painter.fillRect(event.rect(), painted_color(self.color, self.window_opacity))
+        if self.manager and self.manager.latency_marks:
+            self.manager.frame_painted()
+
+
+class HandleWindow(OverlayWindow):
+    """Catches the drags of size adjustment mode over the focus blocks of one screen.
+
+    Covers the blocks on its screen plus the hit tolerance, so everything
+    else stays click-through. screen_origin is the window's own top left,
+    the drag code of OverlayWindow works unchanged.
+    """
+
+    def __init__(self, screen, manager):
+        super().__init__(screen, manager)
+        self.setWindowFlags(Qt.FramelessWindowHint | Qt.WindowStaysOnTopHint | Qt.SubWindow)
+        # Painted by paintEvent at its own alpha
+        self.set_window_opacity(False)
+
+    def place_on_screen(self):
+        # Placed by set_screen_blocks
+        pass
+
+    def set_screen_blocks(self, rects, screen_origin):
+        """Blocks in coordinates of the screen at screen_origin, False when none is on it"""
+        blocks = [rect.translated(screen_origin) for rect in rects]
+        screen = self.overlay_screen.geometry()
+        area = QRect()
+        for block in blocks:
+            if block.intersects(screen):
+                area = area.united(block)
+        if area.isEmpty():
+            return False
+        tolerance = self.hit_tol
+        area = area.adjusted(-tolerance, -tolerance, tolerance, tolerance).intersected(screen)
+        if self.pending_pos is not None:
+            # Queued mouse positions are relative to where the window was
+            self.pending_pos += self.screen_origin - area.topLeft()
+        self.screen_origin = area.topLeft()
+        if area != self.geometry():
+            self.setGeometry(area)
+        # Every block, so the indices agree with the manager's
+        self.set_focus_blocks([block.translated(-self.screen_origin) for block in blocks])
+        return True
+
+    def paintEvent(self, event):
+        # Nearly invisible, but the window system delivers the clicks
+        painter = QPainter(self)
+        painter.setCompositionMode(QPainter.CompositionMode_Source)
+        painter.fillRect(event.rect(), HOLE_COLOR)
+        outline = QColor(self.overlay_color)
+        outline.setAlpha(255)
+        painter.setPen(QPen(outline, 1, Qt.DashLine))
+        for block in self.focus_blocks:
+            painter.drawRect(block.adjusted(0, 0, -1, -1))
+
+
+class StripOverlay(QObject):
+    """Overlay of one screen as one window per band around the focus blocks.
+
+    Takes the place of an OverlayWindow. The bands are the rects of the
+    screen minus the blocks, four for a single block. Only the bands are
+    blended by the compositor and moving a block only resizes windows,
+    the band windows are kept and reused.
+    """
+
+    def __init__(self, screen=None, manager=None):
+        super().__init__()
+        self.manager = manager
+        self.overlay_screen = screen or QApplication.primaryScreen()
+        self.screen_origin = QPoint(0, 0)
+
+        self.focus_blocks = []
+        self.overlay_color = QColor(0, 0, 0, 150)
+        self.show_focus_block = True
+        self.visible = False
+        self.size_adjustment = False
+        self.hit_tol = 20
+
+        self.strips = []
+        # Shown strips, the rest of self.strips is hidden for reuse
+        self.strip_count = 0
+        self.handle = None
+        self.event_filters = []
+        self.window_opacity = window_opacity_supported()
+        self.place_on_screen()
+
+    @property
+    def focus_block(self):
+        return QRect(self.focus_blocks[0]) if self.focus_blocks else QRect(0, 0, 0, 0)
+
+    def place_on_screen(self):
+        self.screen_origin = self.overlay_screen.geometry().topLeft()
+        self.relayout()
+
+    def bands(self):
+        screen = QRect(QPoint(0, 0), self.overlay_screen.geometry().size())
+        holes = QRegion()
+        for block in self.focus_blocks:
+            holes = holes.united(block)
+        return QRegion(screen).subtracted(holes).rects()
+
+    def relayout(self):
+        """Fit the strip windows to the bands, unchanged strips are not touched"""
+        # With window opacity a hidden overlay keeps its strips, at opacity 0
+        shown = self.visible and (self.show_focus_block or self.window_opacity)
+        bands = self.bands() if shown else []
+        for idx, band in enumerate(bands):
+            if idx == len(self.strips):
+                strip = StripWindow(self.overlay_color, self.manager)
+                if self.window_opacity:
+                    strip.set_shown(self.show_focus_block)
+                for obj in self.event_filters:
+                    strip.installEventFilter(obj)
+                self.strips.append(strip)
+            strip = self.strips[idx]
+            geometry = band.translated(self.screen_origin)
+            if strip.geometry() != geometry:
+                if stats.enabled:
+                    stats.count("strip_resize")
+                strip.setGeometry(geometry)
+            if not strip.isVisible():
+                strip.show()
+        for strip in self.strips[len(bands) : self.strip_count]:
+            strip.hide()
+        self.strip_count = len(bands)
+        self.relayout_handle()
+
+    def relayout_handle(self):
+        if not self.size_adjustment or not self.visible:
+            if self.handle is not None:
+                self.handle.hide()
+            return
+        if self.handle is None:
+            self.handle = HandleWindow(self.overlay_screen, self.manager)
+            self.handle.set_hit_tolerance(self.hit_tol)
+        self.handle.overlay_color = QColor(self.overlay_color)
+        if self.handle.set_screen_blocks(self.focus_blocks, self.screen_origin):
+            if not self.handle.isVisible():
+                self.handle.show()
+                self.handle.raise_()
+        else:
+            self.handle.hide()
+
+    def set_focus_blocks(self, rects):
+        if rects == self.focus_blocks:
+            return False
+        self.focus_blocks = [QRect(rect) for rect in rects]
+        self.relayout()
+        return True
+
+    def set_focus_block(self, rect: QRect):
+        return self.set_focus_blocks([rect])
+
+    def set_overlay_color(self, color: QColor):
+        if color.rgba() == self.overlay_color.rgba():
+            return
+        self.overlay_color = QColor(color)
+        for strip in self.strips:
+            strip.set_color(color)
+
+    def set_show_focus_block(self, show: bool):
+        if show == self.show_focus_block:
+            return
+        self.show_focus_block = show
+        if self.window_opacity:
+            for strip in self.strips:
+                strip.set_shown(show)
+        else:
+            self.relayout()
+
+    def set_paint_engine(self, name):
+        # Strips are plain fills
+        pass
+
+    def set_hit_tolerance(self, tolerance):
+        self.hit_tol = tolerance
+        if self.handle is not None:
+            self.handle.set_hit_tolerance(tolerance)
+        self.relayout_handle()
+
+    def setWindowFlags(self, flags):
+        """Size adjustment mode shows the handle window, the strips stay click-through"""
+        self.size_adjustment = not flags & Qt.WindowTransparentForInput
+        self.relayout_handle()
+
+    def installEventFilter(self, obj):
+        self.event_filters.append(obj)
+        for strip in self.strips:
+            strip.installEventFilter(obj)
+
+    def removeEventFilter(self, obj):
+        if obj in self.event_filters:
+            self.event_filters.remove(obj)
+        for strip in self.strips:
+            strip.removeEventFilter(obj)
+
+    def show(self):
+        self.visible = True
+        self.relayout()
+
+    def close(self):
+        self.visible = False
+        self.relayout()
+        return True
+
+    def windows(self):
+        """Every window shown for this screen"""
+        windows = self.strips[: self.strip_count]
+        if self.handle is not None and self.handle.isVisible():
+            windows.append(self.handle)
+        return windows
+
+
+# Window topologies, each takes the screen and the manager
+WINDOW_TOPOLOGIES = {
+    "single": OverlayWindow,
+    "strips": StripOverlay,
+}
@@ -0,0 +1,209 @@
+import math
+import time
+from PyQt5.QtWidgets import QApplication
+from PyQt5.QtGui import QCursor
+from PyQt5.QtCore import Qt, QEvent, QObject, QRect, QTimer
+from metrics import stats
+
+TRACKING_MODES = ("off", "cursor", "window")
+TRACKING_ENV = "FOCUS_FRAME_TRACKING"
+
+# Poll once per frame while the target moves, backing off up to this while it is still
+MAX_POLL_INTERVAL_MS = 2000
+# Time constant of the smoothing filter, the block covers 63% of the way in this time
+SMOOTHING_TIME = 0.08
+# Closer than this to the target in pixels counts as arrived
+SETTLE_DISTANCE = 0.5
+
+
+class TrackingUnavailable(Exception):
+    """The tracking source cannot be used on this platform"""
+
+
+class CursorSource:
+    """Main block of the preset's size, centered on the mouse cursor"""
+
+    def __init__(self, overlay_manager):
+        self.overlay_manager = overlay_manager
+
+    def target(self):
+        rect = self.overlay_manager.model.geometry()
+        rect.moveCenter(QCursor.pos())
+        return rect
+
+
+class WindowSource(QObject):
+    """Geometry of the active X11 window, read through python-xlib"""
+
+    def __init__(self, overlay_manager):
+        super().__init__()
+        self.overlay_manager = overlay_manager
+        # Optional, only needed for this source
+        try:
+            from Xlib import X, display, error
+        except ImportError:
+            raise TrackingUnavailable("Following the active window needs python-xlib")
+        if QApplication.platformName() != "xcb":
+            raise TrackingUnavailable("Following the active window needs an X11 session")
+        try:
+            self.display = display.Display()
+        except error.DisplayError as e:
+            raise TrackingUnavailable(str(e))
+        self.any_property_type = X.AnyPropertyType
+        self.xlib_errors = (error.XError, error.ConnectionClosedError)
+        self.root = self.display.screen().root
+        self.active_window_atom = self.display.intern_atom("_NET_ACTIVE_WINDOW")
+        self.last_target = None
+        # Ids of our shown windows, dropped when one is shown or hidden
+        self.window_ids = None
+        QApplication.instance().installEventFilter(self)
+
+    def eventFilter(self, obj, event):
+        if event.type() in (QEvent.Show, QEvent.Hide) and obj.isWidgetType() and obj.isWindow():
+            self.window_ids = None
+        return False
+
+    def own_windows(self):
+        if self.window_ids is None:
+            # Only windows that exist, winId would create them for hidden menus and dialogs
+            self.window_ids = {
+                int(widget.windowHandle().winId())
+                for widget in QApplication.topLevelWidgets()
+                if widget.isVisible() and widget.windowHandle() is not None
+            }
+        return self.window_ids
+
+    def target(self):
+        """Last geometry of another program's window while one of ours is active"""
+        try:
+            prop = self.root.get_full_property(self.active_window_atom, self.any_property_type)
+            window_id = prop.value[0] if prop and len(prop.value) else 0
+            if window_id and window_id not in self.own_windows():
+                window = self.display.create_resource_object("window", window_id)
+                geometry = window.get_geometry()
+                origin = window.translate_coords(self.root, 0, 0)
+                # X11 reports device pixels
+                dpr = QApplication.primaryScreen().devicePixelRatio()
+                self.last_target = QRect(
+                    round(-origin.x / dpr),
+                    round(-origin.y / dpr),
+                    round(geometry.width / dpr),
+                    round(geometry.height / dpr),
+                )
+        except self.xlib_errors:
+            # The window was closed between the requests
+            pass
+        return self.last_target
+
+    def close(self):
+        QApplication.instance().removeEventFilter(self)
+        self.display.close()
+
+
+TRACKING_SOURCES = {
+    "cursor": CursorSource,
+    "window": WindowSource,
+}
+
+
+class Tracker(QObject):
+    """Moves the main block after the cursor or the active window.
+
+    The target is polled once per frame while it moves or the smoothed
+    block is still on its way, every still poll doubles the interval up to
+    MAX_POLL_INTERVAL_MS. Only the overlay follows, the preset is not
+    written.
+    """
+
+    def __init__(self, overlay_manager):
+        super().__init__()
+        self.overlay_manager = overlay_manager
+        self.mode = "off"
+        self.source = None
+
+        refresh_rate = QApplication.primaryScreen().refreshRate() or 60
+        self.frame_interval = max(1, int(1000 / refresh_rate))
+        self.interval = self.frame_interval
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setTimerType(Qt.PreciseTimer)
+        self.timer.timeout.connect(self.poll)
+
+        # Smoothed x, y, w, h as floats
+        self.box = None
+        self.target_box = None
+        self.last_poll = 0
+
+        # The cursor block takes the preset's size, edits are followed right away
+        overlay_manager.model.geometry_changed.connect(self.wake)
+
+    def set_mode(self, mode):
+        """Start following a source, raises TrackingUnavailable when it cannot be used"""
+        if mode == self.mode:
+            return
+        source = TRACKING_SOURCES[mode](self.overlay_manager) if mode != "off" else None
+        self.stop()
+        self.mode = mode
+        self.source = source
+        if source is not None:
+            self.box = None
+            self.interval = self.frame_interval
+            self.last_poll = time.perf_counter()
+            self.poll()
+
+    def stop(self):
+        self.timer.stop()
+        if self.source is not None and hasattr(self.source, "close"):
+            self.source.close()
+        self.source = None
+        self.mode = "off"
+        self.overlay_manager.set_tracked_block(None)
+
+    def poll(self):
+        now = time.perf_counter()
+        # After backing off the filter starts again from where it stood
+        dt = min(now - self.last_poll, self.frame_interval / 1000)
+        self.last_poll = now
+        if stats.enabled:
+            stats.count("tracking_poll")
+
+        target = self.source.target()
+        if target is None:
+            self.back_off()
+            return
+        target_box = (target.x(), target.y(), target.width(), target.height())
+        moved = target_box != self.target_box
+        self.target_box = target_box
+
+        if self.box is None:
+            # Jump to the first target
+            self.box = target_box
+        else:
+            # Exponential smoothing, independent of the poll interval
+            factor = 1 - math.exp(-dt / SMOOTHING_TIME)
+            self.box = tuple(
+                value + (goal - value) * factor for value, goal in zip(self.box, target_box)
+            )
+        settled = all(
+            abs(goal - value) < SETTLE_DISTANCE for value, goal in zip(self.box, target_box)
+        )
+        if settled:
+            self.box = target_box
+        self.overlay_manager.set_tracked_block(QRect(*(round(value) for value in self.box)))
+
+        if moved or not settled:
+            self.interval = self.frame_interval
+        else:
+            self.back_off()
+            return
+        self.timer.start(self.interval)
+
+    def wake(self, _=None):
+        """Poll on the next frame, e.g. after the preset changed"""
+        if self.source is not None:
+            self.interval = self.frame_interval
+            self.timer.start(self.interval)
+
+    def back_off(self):
+        self.interval = min(MAX_POLL_INTERVAL_MS, self.interval * 2)
+        self.timer.start(self.interval)
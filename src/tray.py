@@ -0,0 +1,37 @@
+from PyQt5.QtWidgets import QApplication, QAction, QMenu, QStyle, QSystemTrayIcon
+from PyQt5.QtCore import pyqtSignal
+
+
+class TrayIcon(QSystemTrayIcon):
+    """Tray icon of the overlay-only mode, the settings panel is opened from here"""
+
+    settings_requested = pyqtSignal()
+
+    def __init__(self, overlay_manager):
+        app = QApplication.instance()
+        super().__init__(app.style().standardIcon(QStyle.SP_DesktopIcon))
+        self.overlay_manager = overlay_manager
+        self.setToolTip("Focus Frame")
+
+        self.menu = QMenu()
+        self.menu.addAction("Settings", self.settings_requested.emit)
+        self.visible_action = QAction("Show Focus Block", self.menu)
+        self.visible_action.setCheckable(True)
+        self.visible_action.setChecked(overlay_manager.show_focus_block)
+        self.visible_action.toggled.connect(overlay_manager.set_focus_block_visible)
+        self.menu.addAction(self.visible_action)
+        self.menu.addSeparator()
+        self.menu.addAction("Quit", app.quit)
+        self.setContextMenu(self.menu)
+
+        overlay_manager.visibility_changed.connect(self.sync_visibility)
+        self.activated.connect(self.on_activated)
+
+    def on_activated(self, reason):
+        if reason in (QSystemTrayIcon.Trigger, QSystemTrayIcon.DoubleClick):
+            self.settings_requested.emit()
+
+    def sync_visibility(self, show):
+        self.visible_action.blockSignals(True)
+        self.visible_action.setChecked(show)
+        self.visible_action.blockSignals(False)
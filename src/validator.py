@@ -1,33 +1,232 @@
-from jsonschema import validate
+from collections import namedtuple
+
+# Version written by this build, files without a version are version 1
+SCHEMA_VERSION = 4
+
+PRESET_FIELDS = {
+    "preset_name": {"type": "string"},
+    "alpha": {"type": "number"},
+    "xy_abs": {"type": "boolean"},
+    "x": {"type": "number"},
+    "y": {"type": "number"},
+    "wh_abs": {"type": "boolean"},
+    "w": {"type": "number"},
+    "h": {"type": "number"},
+    "color": {"type": "string"},
+}
+
+# Further focus blocks of a preset, in the modes of its main block
+HOLE_FIELDS = ("x", "y", "w", "h")
+OPTIONAL_PRESET_FIELDS = {
+    "holes": {
+        "type": "array",
+        "items": {
+            "type": "object",
+            "properties": {key: {"type": "number"} for key in HOLE_FIELDS},
+            "required": list(HOLE_FIELDS),
+        },
+    },
+}
 
 schema = {
     "type": "object",
     "properties": {
-        "presets_name": {"type": "string"},
+        "schema_version": {"type": "integer"},
+        "preset_collection_name": {"type": "string"},
         "presets": {
             "type": "array",
+            # The model always has a current preset
+            "minItems": 1,
             "items": {
                 "type": "object",
-                "properties": {
-                    "preset_name": {"type": "string"},
-                    "alpha": {"type": "number"},
-                    "xy_abs": {"type": "boolean"},
-                    "x": {"type": "number"},
-                    "y": {"type": "number"},
-                    "wh_abs": {"type": "boolean"},
-                    "w": {"type": "number"},
-                    "h": {"type": "number"},
-                    "color": {"type": "string"},
-                },
+                "properties": dict(PRESET_FIELDS, **OPTIONAL_PRESET_FIELDS),
+                "required": list(PRESET_FIELDS),
             },
         },
     },
+    "required": ["preset_collection_name", "presets"],
+}
+# Keys of a collection dict that are not extra fields
+COLLECTION_FIELDS = frozenset(schema["properties"])
+
+# preset=None for errors of the collection itself
+ValidationIssue = namedtuple("ValidationIssue", ["preset", "field", "message"])
+
+# Defaults filled in for presets of older files
+PRESET_DEFAULTS = {
+    "alpha": 150,
+    "xy_abs": True,
+    "wh_abs": True,
+    "color": "#000000",
+}
+
+
+def migrate_v1(data):
+    """Version 1 files may use presets_name and lack optional fields"""
+    if "preset_collection_name" not in data and isinstance(data.get("presets_name"), str):
+        data["preset_collection_name"] = data.pop("presets_name")
+    presets = data.get("presets")
+    if isinstance(presets, list):
+        for preset in presets:
+            if isinstance(preset, dict) and not preset.keys() >= PRESET_DEFAULTS.keys():
+                for key, value in PRESET_DEFAULTS.items():
+                    preset.setdefault(key, value)
+
+
+def migrate_v2(data):
+    """Version 2 stored pixels in relative mode too, relative coordinates are normalized since"""
+    presets = data.get("presets")
+    if isinstance(presets, list):
+        for preset in presets:
+            if isinstance(preset, dict):
+                for mode in ("xy_abs", "wh_abs"):
+                    if preset.get(mode) is False:
+                        preset[mode] = True
+
+
+def migrate_v3(data):
+    """Version 4 added the optional holes, version 3 presets are valid as they are"""
+
+
+# version -> migration to version + 1
+MIGRATIONS = {
+    1: migrate_v1,
+    2: migrate_v2,
+    3: migrate_v3,
 }
 
 
-def preset_validator(preset):
-    try:
-        validate(instance=preset, schema=schema)
-        return True
-    except Exception:
+def migrate_collection(data):
+    """Upgrade a collection dict in place to SCHEMA_VERSION"""
+    if not isinstance(data, dict):
+        return data
+    version = data.get("schema_version", 1)
+    if not isinstance(version, int):
+        return data
+    while version < SCHEMA_VERSION and version in MIGRATIONS:
+        MIGRATIONS[version](data)
+        version += 1
+    data["schema_version"] = version
+    return data
+
+
+# Python types accepted for each JSON type, bool is not a number here
+PYTHON_TYPES = {
+    "number": {int, float},
+    "integer": {int},
+    "boolean": {bool},
+    "string": {str},
+}
+PRESET_CHECKS = [(key, PYTHON_TYPES[spec["type"]]) for key, spec in PRESET_FIELDS.items()]
+
+_compiled_validators = None
+
+
+def compiled_validators():
+    """jsonschema validators built once, only imported when a file is malformed.
+
+    One checks the collection without its presets, the other a single preset,
+    so only the presets that failed the fast path are looked at in detail.
+    """
+    global _compiled_validators
+    if _compiled_validators is None:
+        from jsonschema import Draft7Validator
+
+        collection_schema = dict(schema)
+        collection_schema["properties"] = dict(
+            schema["properties"], presets={"type": "array", "minItems": 1}
+        )
+        preset_schema = schema["properties"]["presets"]["items"]
+        for sub_schema in (collection_schema, preset_schema):
+            Draft7Validator.check_schema(sub_schema)
+        _compiled_validators = (Draft7Validator(collection_schema), Draft7Validator(preset_schema))
+    return _compiled_validators
+
+
+def is_preset_well_formed(preset):
+    if type(preset) is not dict:
+        return False
+    for key, types in PRESET_CHECKS:
+        if type(preset.get(key)) not in types:
+            return False
+    holes = preset.get("holes")
+    if holes is not None:
+        if type(holes) is not list:
+            return False
+        for hole in holes:
+            if type(hole) is not dict:
+                return False
+            for key in HOLE_FIELDS:
+                if type(hole.get(key)) not in PYTHON_TYPES["number"]:
+                    return False
+    return True
+
+
+def is_well_formed(data):
+    """Fast path, plain type checks without building any error objects"""
+    if type(data) is not dict:
+        return False
+    if type(data.get("preset_collection_name")) is not str:
         return False
+    version = data.get("schema_version", 1)
+    if type(version) is not int or version > SCHEMA_VERSION:
+        return False
+    presets = data.get("presets")
+    if type(presets) is not list or not presets:
+        return False
+    for preset in presets:
+        if not is_preset_well_formed(preset):
+            return False
+    return True
+
+
+def validate_collection(data):
+    """List of ValidationIssue, empty when the collection is valid"""
+    if is_well_formed(data):
+        return []
+
+    collection_validator, item_validator = compiled_validators()
+    issues = []
+    version = data.get("schema_version", 1) if isinstance(data, dict) else 1
+    if isinstance(version, int) and version > SCHEMA_VERSION:
+        issues.append(
+            ValidationIssue(
+                None,
+                "schema_version",
+                "version {} is newer than the supported {}".format(version, SCHEMA_VERSION),
+            )
+        )
+    for error in collection_validator.iter_errors(data):
+        path = list(error.absolute_path)
+        issues.append(ValidationIssue(None, path[0] if path else None, error.message))
+
+    presets = data.get("presets") if isinstance(data, dict) else None
+    if isinstance(presets, list):
+        for idx, preset in enumerate(presets):
+            if is_preset_well_formed(preset):
+                continue
+            for error in item_validator.iter_errors(preset):
+                path = list(error.absolute_path)
+                field = path[0] if path else None
+                if field is None and error.validator == "required":
+                    field = error.message.split("'")[1]
+                issues.append(ValidationIssue(idx, field, error.message))
+    return issues
+
+
+def describe_issue(data, issue):
+    if issue.preset is None:
+        where = "Collection"
+    else:
+        where = "Preset {}".format(issue.preset + 1)
+        try:
+            where += " ({})".format(data["presets"][issue.preset]["preset_name"])
+        except (KeyError, IndexError, TypeError):
+            pass
+    if issue.field is not None:
+        where += ", field '{}'".format(issue.field)
+    return "{}: {}".format(where, issue.message)
+
+
+def preset_validator(preset_collection):
+    return not validate_collection(preset_collection)
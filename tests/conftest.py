@@ -0,0 +1,25 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+# QSettings written by the code under test stay out of the user's config
+os.environ["XDG_CONFIG_HOME"] = tempfile.mkdtemp(prefix="focus-frame-tests-")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+
+@pytest.fixture(scope="session")
+def qapp():
+    from PyQt5.QtWidgets import QApplication
+
+    return QApplication.instance() or QApplication([])
+
+
+def make_preset(name, **fields):
+    from collection_file import default_preset
+
+    preset = default_preset(name)
+    preset.update(fields)
+    return preset
@@ -0,0 +1,83 @@
+import json
+
+from autosave import apply_entry, file_stamp, journal_path, replay_journal, write_atomic
+from conftest import make_preset
+
+
+def collection():
+    return {
+        "schema_version": 4,
+        "preset_collection_name": "c",
+        "presets": [make_preset("a"), make_preset("b")],
+    }
+
+
+def write_journal(path, entries, stamp=None):
+    with open(journal_path(path), "w") as file:
+        header = {"op": "base", "stamp": stamp if stamp is not None else file_stamp(path)}
+        file.write(json.dumps(header) + "\n")
+        for entry in entries:
+            file.write(entry if isinstance(entry, str) else json.dumps(entry) + "\n")
+
+
+def test_apply_entry_ops():
+    data = collection()
+    apply_entry(data, {"op": "set", "idx": 1, "fields": {"alpha": 9}})
+    apply_entry(data, {"op": "insert", "idx": 0, "preset": make_preset("z")})
+    apply_entry(data, {"op": "remove", "idx": 1})
+    apply_entry(data, {"op": "name", "name": "renamed"})
+    assert [preset["preset_name"] for preset in data["presets"]] == ["z", "b"]
+    assert data["presets"][1]["alpha"] == 9
+    assert data["preset_collection_name"] == "renamed"
+
+
+def test_replay_journal(tmp_path):
+    path = str(tmp_path / "c.json")
+    write_atomic(path, collection())
+    write_journal(
+        path,
+        [
+            {"op": "set", "idx": 0, "fields": {"x": 7}},
+            {"op": "insert", "idx": 2, "preset": make_preset("c")},
+        ],
+    )
+    data = collection()
+    assert replay_journal(data, path) == 2
+    assert data["presets"][0]["x"] == 7
+    assert [preset["preset_name"] for preset in data["presets"]] == ["a", "b", "c"]
+
+
+def test_replay_stops_at_torn_line(tmp_path):
+    path = str(tmp_path / "c.json")
+    write_atomic(path, collection())
+    write_journal(path, [{"op": "set", "idx": 0, "fields": {"x": 7}}, '{"op": "se'])
+    data = collection()
+    assert replay_journal(data, path) == 1
+    assert data["presets"][0]["x"] == 7
+
+
+def test_journal_of_another_file_version_is_ignored(tmp_path):
+    path = str(tmp_path / "c.json")
+    write_atomic(path, collection())
+    write_journal(path, [{"op": "set", "idx": 0, "fields": {"x": 7}}], stamp=[0, 0])
+    data = collection()
+    assert replay_journal(data, path) == 0
+    assert data == collection()
+
+
+def test_no_journal(tmp_path):
+    path = str(tmp_path / "c.json")
+    write_atomic(path, collection())
+    assert replay_journal(collection(), path) == 0
+
+
+def test_relative_edit_without_pixel_change_is_journaled(qapp):
+    from preset_model import PresetModel
+
+    model = PresetModel()
+    model.reset("c", [make_preset("a", xy_abs=False, x=0.25, y=0.25)])
+    edited = []
+    model.edited.connect(edited.append)
+    # Rounds to the same pixels, the stored value changed all the same
+    model.update(x=0.250001)
+    assert edited == [{"op": "set", "idx": 0, "fields": {"x": 0.250001}}]
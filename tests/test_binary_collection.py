@@ -0,0 +1,64 @@
+import pytest
+
+from binary_collection import BinaryCollection, BinaryFormatError, encode_collection
+from conftest import make_preset
+from preset_table import PresetTable
+
+
+def collection():
+    return {
+        "schema_version": 4,
+        "preset_collection_name": "binäry",
+        "presets": [
+            make_preset("a"),
+            make_preset("日本", alpha=99.5, color="#123456"),
+            make_preset(
+                "rel",
+                xy_abs=False,
+                x=0.25,
+                y=0.5,
+                holes=[{"x": 0.1, "y": 0.2, "w": 30, "h": 40}, {"x": 1, "y": 2, "w": 3, "h": 4}],
+            ),
+        ],
+    }
+
+
+@pytest.fixture
+def binary_path(tmp_path):
+    path = tmp_path / "c.ffpc"
+    path.write_bytes(encode_collection(collection()))
+    return str(path)
+
+
+def test_round_trip(binary_path):
+    with BinaryCollection(binary_path) as binary:
+        assert len(binary) == 3
+        assert binary.name == "binäry"
+        assert binary.to_collection() == collection()
+
+
+def test_to_table_matches_dicts(binary_path):
+    with BinaryCollection(binary_path) as binary:
+        table = binary.to_table()
+    assert table == PresetTable.from_dicts(collection()["presets"])
+    assert table.to_dicts() == collection()["presets"]
+    # Types survive, ints stay ints
+    assert type(table.to_dicts()[0]["x"]) is int
+    assert type(table.to_dicts()[2]["x"]) is float
+
+
+def test_damaged_file_is_rejected(binary_path):
+    with open(binary_path, "rb") as file:
+        data = bytearray(file.read())
+    data[-1] ^= 0xFF
+    with open(binary_path, "wb") as file:
+        file.write(data)
+    with pytest.raises(BinaryFormatError):
+        BinaryCollection(binary_path)
+
+
+def test_not_a_binary_collection(tmp_path):
+    path = tmp_path / "c.ffpc"
+    path.write_bytes(b"{}")
+    with pytest.raises(BinaryFormatError):
+        BinaryCollection(str(path))
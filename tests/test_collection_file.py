@@ -0,0 +1,95 @@
+import json
+
+import pytest
+
+from binary_collection import encode_collection
+from collection_file import CollectionError, load_collection
+from conftest import make_preset
+from validator import SCHEMA_VERSION
+
+
+@pytest.fixture
+def model(qapp):
+    from preset_model import PresetModel
+
+    model = PresetModel()
+    model.reset("c", [make_preset("a")])
+    return model
+
+
+@pytest.fixture
+def autosave():
+    from autosave import Autosave
+
+    autosave = Autosave()
+    yield autosave
+    autosave.close()
+
+
+def test_empty_collection_is_not_loaded(tmp_path, model, autosave):
+    path = tmp_path / "empty.json"
+    path.write_text(json.dumps({"preset_collection_name": "empty", "presets": []}))
+    with pytest.raises(CollectionError):
+        load_collection(model, autosave, str(path))
+    assert model.names() == ["a"]
+    assert model.geometry().width() > 0
+
+
+def test_reset_without_presets_keeps_the_model(model):
+    with pytest.raises(ValueError):
+        model.reset("empty", [])
+    assert model.collection_name == "c"
+    assert model.names() == ["a"]
+
+
+def write_binary(tmp_path, version, *presets):
+    path = tmp_path / "c.ffpc"
+    collection = {"schema_version": version, "preset_collection_name": "b", "presets": presets}
+    path.write_bytes(encode_collection(collection))
+    return str(path)
+
+
+def test_binary_collection_is_loaded(tmp_path, model, autosave):
+    path = write_binary(tmp_path, SCHEMA_VERSION, make_preset("x", x=30), make_preset("y"))
+    load_collection(model, autosave, path)
+    assert model.names() == ["x", "y"]
+    assert model.geometry().x() == 30
+
+
+def test_old_binary_collection_is_migrated(tmp_path, model, autosave):
+    # Version 2 kept pixels in relative mode
+    path = write_binary(tmp_path, 2, make_preset("old", xy_abs=False, x=960, y=540))
+    load_collection(model, autosave, path)
+    assert model.names() == ["old"]
+    assert model.to_dict()["presets"][0]["xy_abs"] is True
+    assert (model.geometry().x(), model.geometry().y()) == (960, 540)
+
+
+def test_newer_binary_collection_is_rejected(tmp_path, model, autosave):
+    path = write_binary(tmp_path, SCHEMA_VERSION + 5, make_preset("new"))
+    with pytest.raises(CollectionError, match="newer"):
+        load_collection(model, autosave, path)
+    assert model.names() == ["a"]
+
+
+def test_fields_outside_the_schema_are_written_back(tmp_path, model, autosave):
+    data = {
+        "schema_version": SCHEMA_VERSION,
+        "preset_collection_name": "j",
+        "app_id": "kept",
+        "presets": [make_preset("a", note="kept too"), make_preset("b")],
+    }
+    path = tmp_path / "c.json"
+    path.write_text(json.dumps(data))
+    load_collection(model, autosave, str(path))
+    model.update(x=5)
+    saved = model.to_dict()
+    assert saved["app_id"] == "kept"
+    assert saved["presets"][0]["note"] == "kept too"
+    assert "note" not in saved["presets"][1]
+
+
+def test_binary_format_refuses_fields_outside_the_schema():
+    collection = {"preset_collection_name": "b", "app_id": "x", "presets": [make_preset("a")]}
+    with pytest.raises(ValueError):
+        encode_collection(collection)
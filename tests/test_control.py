@@ -0,0 +1,116 @@
+import json
+
+import pytest
+
+from conftest import make_preset
+
+
+class FakeSocket:
+    """Takes the place of a QLocalSocket, replies are collected"""
+
+    def __init__(self):
+        self.incoming = b""
+        self.written = b""
+
+    def readAll(self):
+        data, self.incoming = self.incoming, b""
+        return data
+
+    def write(self, data):
+        self.written += data
+
+    def flush(self):
+        pass
+
+    def replies(self):
+        return [json.loads(line) for line in self.written.splitlines()]
+
+
+@pytest.fixture
+def server(qapp):
+    from autosave import Autosave
+    from control import ControlServer
+    from overlay_manager import OverlayManager
+    from preset_model import PresetModel
+
+    model = PresetModel()
+    manager = OverlayManager(model)
+    model.reset("c", [make_preset("a"), make_preset("b")])
+    autosave = Autosave()
+    server = ControlServer(model, manager, autosave)
+    yield server
+    autosave.close()
+    manager.close()
+
+
+def test_batch_is_applied(server):
+    reply = server.apply_batch(
+        [
+            {"cmd": "preset", "name": "b"},
+            {"cmd": "block", "x": 10, "y": 20},
+            {"cmd": "nudge", "dx": 5, "dy": -5},
+            {"cmd": "alpha", "value": 200},
+            {"cmd": "color", "value": "#102030"},
+            {"cmd": "visible", "value": False},
+        ]
+    )
+    assert reply == {"ok": True, "results": [{}] * 6}
+    model = server.model
+    assert model.get("preset_name") == "b"
+    assert (model.geometry().x(), model.geometry().y()) == (15, 15)
+    assert model.get("alpha") == 200
+    assert model.get("color") == "#102030"
+    assert server.overlay_manager.show_focus_block is False
+
+
+def test_state(server):
+    reply = server.apply_batch([{"cmd": "state"}])
+    state = reply["results"][0]
+    assert state["preset"] == "a"
+    assert state["presets"] == ["a", "b"]
+    assert state["holes"] == []
+
+
+@pytest.mark.parametrize(
+    "command, error",
+    [
+        ({"cmd": "bogus"}, "unknown command"),
+        ("preset", "unknown command"),
+        ({"cmd": "preset", "name": "missing"}, "no preset named"),
+        ({"cmd": "preset"}, "bad arguments"),
+        ({"cmd": "alpha", "value": 300}, "alpha must be"),
+        ({"cmd": "alpha", "value": "10"}, "alpha must be"),
+        ({"cmd": "color", "value": "not a color"}, "not a color"),
+        ({"cmd": "visible", "value": "yes"}, "visible takes"),
+        ({"cmd": "nudge", "dx": "far"}, "bad arguments"),
+        ({"cmd": "collection", "path": "/nonexistent/c.json"}, ""),
+    ],
+)
+def test_failing_command(server, command, error):
+    reply = server.apply_batch([command, {"cmd": "alpha", "value": 10}])
+    assert reply["ok"] is False
+    assert error in reply["results"][0]["error"]
+    # The other commands of the batch still apply
+    assert reply["results"][1] == {}
+    assert server.model.get("alpha") == 10
+
+
+def test_read_splits_lines(server):
+    socket = FakeSocket()
+    server.buffers[socket] = b""
+    socket.incoming = b'[{"cmd": "alpha", "value": 1}]\n{"cmd": "pres'
+    server.read(socket)
+    socket.incoming = b'et", "name": "b"}\nnot json\n\n'
+    server.read(socket)
+    replies = socket.replies()
+    assert [reply["ok"] for reply in replies] == [True, True, False]
+    assert replies[2]["error"].startswith("not JSON")
+    assert server.model.get("preset_name") == "b"
+
+
+def test_empty_collection_is_refused(server, tmp_path):
+    path = tmp_path / "empty.json"
+    path.write_text(json.dumps({"preset_collection_name": "empty", "presets": []}))
+    reply = server.apply_batch([{"cmd": "collection", "path": str(path)}, {"cmd": "state"}])
+    assert reply["ok"] is False
+    assert reply["results"][1]["presets"] == ["a", "b"]
@@ -0,0 +1,84 @@
+import pytest
+
+from conftest import make_preset
+
+
+@pytest.fixture
+def model(qapp):
+    from preset_model import PresetModel
+
+    model = PresetModel()
+    model.reset("c", [make_preset("a"), make_preset("b"), make_preset("c")])
+    return model
+
+
+def record(signal):
+    calls = []
+    signal.connect(lambda *args: calls.append(args))
+    return calls
+
+
+def test_reorder_keeps_current(model):
+    model.set_current(1)
+    resets = record(model.modelReset)
+    model.apply_collection("c", [make_preset("c"), make_preset("a"), make_preset("b")])
+    assert model.names() == ["c", "a", "b"]
+    assert model.get("preset_name") == "b"
+    assert len(resets) == 1
+
+
+def test_insert_and_remove_are_row_changes(model):
+    model.set_current(2)
+    inserted = record(model.rowsInserted)
+    removed = record(model.rowsRemoved)
+    resets = record(model.modelReset)
+    model.apply_collection("c", [make_preset("a"), make_preset("new"), make_preset("c")])
+    assert model.names() == ["a", "new", "c"]
+    assert model.get("preset_name") == "c"
+    assert (len(inserted), len(removed), len(resets)) == (1, 1, 0)
+
+
+def test_changed_fields_are_applied_in_place(model):
+    appearance = record(model.appearance_changed)
+    edited = record(model.edited)
+    model.apply_collection("renamed", [make_preset("a", alpha=42), make_preset("b"), make_preset("c")])
+    assert model.collection_name == "renamed"
+    assert model.get("alpha") == 42
+    assert len(appearance) == 1
+    # Taken from the file, not an edit to journal
+    assert edited == []
+
+
+def test_removed_current_falls_back(model):
+    model.set_current(2)
+    model.apply_collection("c", [make_preset("a"), make_preset("b")])
+    assert model.names() == ["a", "b"]
+    assert 0 <= model.current_idx < 2
+
+
+
+def test_fields_outside_the_schema_are_applied(model):
+    presets = [make_preset("a", note="new"), make_preset("b"), make_preset("c")]
+    model.apply_collection("c", presets, {"app_id": "x"})
+    assert model.to_dict()["presets"] == presets
+    assert model.to_dict()["app_id"] == "x"
+
+
+def rebuilt_index(model):
+    return {name: row for row, name in enumerate(model.names())}
+
+
+def test_name_index_follows_inserts_and_removes(model):
+    model.name_index()
+    model.remove(0)
+    assert model.name_rows == rebuilt_index(model)
+    model.insert_row(1, make_preset("x"))
+    model.insert_row(0, make_preset("c"))
+    assert model.name_rows == rebuilt_index(model)
+    model.remove(0)
+    assert model.name_index() == rebuilt_index(model)
+    assert model.row_of("c") == 2
+    # The indexed one of two presets of a name
+    model.insert_row(0, make_preset("x"))
+    model.remove(2)
+    assert model.name_index() == rebuilt_index(model)
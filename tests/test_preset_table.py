@@ -0,0 +1,36 @@
+from PyQt5.QtCore import QRect
+
+from conftest import make_preset
+from layout import ScreenLayout
+from preset_table import PresetTable
+
+
+def test_layout_table_matches_pixel_box():
+    screens = [QRect(0, 0, 1920, 1080), QRect(1920, 0, 2560, 1440)]
+    layout = ScreenLayout(screens[0], screens)
+    presets = [
+        make_preset("abs", x=2000.4, y=10.5, w=300, h=200.6),
+        make_preset("xy", xy_abs=False, x=0.25, y=0.5),
+        make_preset("wh", wh_abs=False, x=2100, w=0.5, h=0.25),
+        make_preset("both", xy_abs=False, wh_abs=False, x=0.1, y=0.1, w=0.2, h=0.2),
+    ]
+    for rows in (presets, presets[:1] * 3 + presets[1:2], presets[1:] * 2):
+        table = PresetTable.from_dicts(rows)
+        expected = [
+            layout.pixel_box(preset.x, preset.y, preset.w, preset.h, preset.xy_abs, preset.wh_abs)
+            for preset in table
+        ]
+        assert layout.layout_table(table) == expected
+
+
+def test_fields_outside_the_schema_are_kept():
+    presets = [make_preset("a", note="kept"), make_preset("b"), make_preset("c", tags=["x"])]
+    table = PresetTable.from_dicts(presets)
+    assert table.to_dicts() == presets
+    assert PresetTable.from_presets(presets).to_dicts() == presets
+    assert table.row(0).to_dict() == presets[0]
+
+    copy = table.copy()
+    copy.insert(1, copy.pop(0))
+    assert copy.to_dicts() == [presets[1], presets[0], presets[2]]
+    assert table.to_dicts() == presets
@@ -0,0 +1,45 @@
+import pytest
+from PyQt5.QtCore import QCoreApplication, QEvent, Qt
+
+from conftest import make_preset
+
+
+@pytest.fixture
+def model(qapp):
+    from preset_model import PresetModel
+
+    model = PresetModel()
+    model.reset("c", [make_preset("a"), make_preset("b")])
+    return model
+
+
+@pytest.fixture
+def autosave():
+    from autosave import Autosave
+
+    autosave = Autosave()
+    yield autosave
+    autosave.close()
+
+
+def test_reset_after_the_panel_is_deleted(model, autosave):
+    from settings import SettingsPanel
+
+    panel = SettingsPanel(None, model, autosave)
+    panel.setAttribute(Qt.WA_DeleteOnClose)
+    panel.show()
+    panel.close()
+    QCoreApplication.sendPostedEvents(None, QEvent.DeferredDelete)
+    del panel
+    model.reset("d", [make_preset("b"), make_preset("a")])
+    assert model.names() == ["b", "a"]
+
+
+def test_reset_keeps_the_current_preset_selected(model, autosave):
+    from settings import SettingsPanel
+
+    panel = SettingsPanel(None, model, autosave)
+    model.set_current(1)
+    model.reset("d", [make_preset("b"), make_preset("a")])
+    assert panel.preset_combobox.currentIndex() == model.current_idx
+    panel.close()
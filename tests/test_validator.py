@@ -0,0 +1,105 @@
+from conftest import make_preset
+from validator import SCHEMA_VERSION, migrate_collection, validate_collection
+
+
+def test_migrates_v1_to_current():
+    data = {
+        "presets_name": "old",
+        "presets": [{"preset_name": "a", "x": 1, "y": 2, "w": 3, "h": 4}],
+    }
+    migrate_collection(data)
+    assert data["schema_version"] == SCHEMA_VERSION
+    assert data["preset_collection_name"] == "old"
+    assert data["presets"][0]["alpha"] == 150
+    assert data["presets"][0]["xy_abs"] is True
+    assert data["presets"][0]["color"] == "#000000"
+    assert validate_collection(data) == []
+
+
+def test_migrates_v2_relative_pixels_to_absolute():
+    data = {
+        "schema_version": 2,
+        "preset_collection_name": "c",
+        "presets": [
+            {
+                "preset_name": "a",
+                "alpha": 100,
+                "xy_abs": False,
+                "x": 200,
+                "y": 100,
+                "wh_abs": False,
+                "w": 640,
+                "h": 480,
+                "color": "#101010",
+            }
+        ],
+    }
+    migrate_collection(data)
+    preset = data["presets"][0]
+    assert data["schema_version"] == SCHEMA_VERSION
+    assert preset["xy_abs"] is True and preset["wh_abs"] is True
+    assert (preset["x"], preset["w"]) == (200, 640)
+
+
+def test_v3_is_valid_without_holes():
+    data = {
+        "schema_version": 3,
+        "preset_collection_name": "c",
+        "presets": [
+            {
+                "preset_name": "a",
+                "alpha": 100,
+                "xy_abs": True,
+                "x": 0,
+                "y": 0,
+                "wh_abs": True,
+                "w": 10,
+                "h": 10,
+                "color": "#000000",
+            }
+        ],
+    }
+    migrate_collection(data)
+    assert data["schema_version"] == SCHEMA_VERSION
+    assert "holes" not in data["presets"][0]
+    assert validate_collection(data) == []
+
+
+def test_newer_version_is_rejected():
+    data = {
+        "schema_version": SCHEMA_VERSION + 1,
+        "preset_collection_name": "c",
+        "presets": [make_preset("a")],
+    }
+    migrate_collection(data)
+    issues = validate_collection(data)
+    assert [issue.field for issue in issues] == ["schema_version"]
+
+
+def test_malformed_hole_is_reported():
+    data = {
+        "schema_version": SCHEMA_VERSION,
+        "preset_collection_name": "c",
+        "presets": [
+            {
+                "preset_name": "a",
+                "alpha": 100,
+                "xy_abs": True,
+                "x": 0,
+                "y": 0,
+                "wh_abs": True,
+                "w": 10,
+                "h": 10,
+                "color": "#000000",
+                "holes": [{"x": 1, "y": 2, "w": 3}],
+            }
+        ],
+    }
+    issues = validate_collection(data)
+    assert issues and issues[0].preset == 0 and issues[0].field == "holes"
+
+
+def test_collection_without_presets_is_rejected():
+    data = {"schema_version": SCHEMA_VERSION, "preset_collection_name": "c", "presets": []}
+    issues = validate_collection(data)
+    assert [issue.field for issue in issues] == ["presets"]
@@ -0,0 +1,40 @@
+"""Convert preset collections between JSON and the binary format.
+
+The output format follows the extension of the output file:
+
+    python tools/convert_collection.py presets.json presets.ffpc
+    python tools/convert_collection.py presets.ffpc presets.json
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from autosave import write_atomic
+from collection_file import read_collection, CollectionError
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("input")
+    parser.add_argument("output")
+    args = parser.parse_args()
+
+    try:
+        collection, _ = read_collection(args.input)
+    except CollectionError as e:
+        sys.exit("{}: {}".format(args.input, e))
+    try:
+        write_atomic(args.output, collection)
+    except (OSError, ValueError) as e:
+        sys.exit("{}: {}".format(args.output, e))
+    print(
+        "{} presets, {} -> {} bytes".format(
+            len(collection["presets"]), os.path.getsize(args.input), os.path.getsize(args.output)
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()